@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import signal
+import threading
 import typing
 
 import fastapi
@@ -10,8 +12,14 @@ from ..core import conf
 from ..core import postgres
 from . import exceptions
 from . import middlewares
+from . import ratelimit
 from . import responses
+from . import revocations
+from . import security
 from . import v1
+from .services import epochs
+from .services import games
+from .services import tokens
 
 
 app = fastapi.FastAPI(
@@ -20,10 +28,14 @@ app = fastapi.FastAPI(
     version='0.0.1',
 )
 app.include_router(v1.api_router, prefix='/api/v1')
-app.add_middleware(middlewares.ClientIPMiddleware)
+app.add_middleware(
+    middlewares.ClientIPMiddleware, trusted_proxies=conf.api.trusted_proxies,
+)
+app.add_middleware(middlewares.IdentityMapMiddleware)
 
 
 logger = logging.getLogger(__name__)
+_service_tasks: typing.List[asyncio.Task] = []
 
 
 @app.get(
@@ -38,6 +50,53 @@ async def redirect_to_docs():
 async def startup():
     await postgres.connect(conf.postgres.uri)
 
+    await ratelimit.credentials.backend.connect()
+    await revocations.broadcast.channel.connect()
+
+    if conf.security.stateless_tokens:
+        await epochs.epochs.load()
+        _start_service(epochs.epochs)
+
+    # In the local mode the game host and its services run in this process
+    await games.client.connect()
+
+    _start_service(ratelimit.credentials)
+    _start_service(tokens.sweeper)
+    _start_service(revocations.broadcast)
+
+    _install_drain_handler()
+
+
+def _install_drain_handler():
+    """Drain the games on SIGTERM before the server closes the connections.
+
+    The server closes the websockets before the shutdown hooks run, so the
+    drain could not reach the clients from there. Once drained the server is
+    shut down with SIGINT, which is still handled by the server.
+    """
+    # Signals can only be handled by the main thread, e.g. not under the test client
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, lambda: asyncio.create_task(_drain_and_exit()),
+    )
+
+
+async def _drain_and_exit():
+    logger.info('Draining games before the shutdown')
+
+    try:
+        await games.drain()
+    finally:
+        signal.raise_signal(signal.SIGINT)
+
+
+def _start_service(service):
+    _service_tasks.append(asyncio.create_task(
+        _handle_service_exceptions(service.__class__, service.run()),
+    ))
+
 
 async def _handle_service_exceptions(cls: typing.Type, coro):
     try:
@@ -52,6 +111,18 @@ async def _handle_service_exceptions(cls: typing.Type, coro):
 
 @app.on_event('shutdown')
 async def shutdown():
+    for task in _service_tasks:
+        task.cancel()
+    await asyncio.gather(*_service_tasks, return_exceptions=True)
+    _service_tasks.clear()
+
+    # Drained on SIGTERM already, unless shut down some other way
+    await games.drain()
+    await games.client.close()
+
+    security.password_hasher.shutdown()
+    await ratelimit.credentials.backend.close()
+    await revocations.broadcast.channel.close()
     await postgres.disconnect()
 
 
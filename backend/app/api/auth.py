@@ -1,12 +1,18 @@
 import logging
+import typing
 
 import fastapi
+import fastapi.security.utils
 
+from ..core import conf
 from ..core import postgres
+from . import cache
 from . import exceptions
 from . import models
+from . import revocations
 from . import schemas
 from . import security
+from .services import epochs
 
 
 TokenTypeHint = schemas.TokenTypeHint
@@ -35,12 +41,39 @@ async def authenticate_user(email: str, password: str):
     if not user:
         raise auth_credentials_error
 
-    if not security.verify_password(password, user['password']):
+    if not await security.password_hasher.verify(password, user['password']):
         raise auth_credentials_error
 
     return user
 
 
+def _is_epoch_revoked(token_data: dict) -> bool:
+    # Tokens without the epoch were issued to be stored, not to be stateless
+    return epochs.epochs.is_revoked(token_data['cid'], token_data.get('ep', -1))
+
+
+async def _access_token_expires_at(token: str, token_data: dict) -> typing.Optional[float]:
+    """Return expiration time of the access token, or None if it was revoked.
+
+    Stateless tokens are checked against the revocation epoch of the user
+    and the broadcast revocations, the rest are looked up in the access
+    tokens table.
+    """
+    if conf.security.stateless_tokens:
+        if _is_epoch_revoked(token_data) or revocations.broadcast.is_revoked(token):
+            return None
+
+        return token_data['iat'] + conf.security.token_expires_in_seconds
+
+    stored_access_token = await models.token_get_access(token)
+    logger.debug(f'{stored_access_token = }')
+
+    if not stored_access_token:
+        return None
+
+    return stored_access_token.issued_at.timestamp() + stored_access_token.expires_in
+
+
 async def get_current_user(
     token: str = fastapi.Security(security.oauth2_scheme),
 ) -> schemas.UserCurrent:
@@ -49,16 +82,30 @@ async def get_current_user(
         'Could not validate credentials',
     )
 
-    client_id = security.extract_client_id_from_signed_token(token)
+    token_data = security.extract_access_token_data(token)
 
-    if client_id is None:
+    if token_data is None or token_data.get('cid') is None:
         raise unauthenticated_exception
 
+    client_id = token_data['cid']
+
+    if revocations.broadcast.is_revoked(token):
+        raise unauthenticated_exception
+
+    if conf.security.stateless_tokens and _is_epoch_revoked(token_data):
+        raise unauthenticated_exception
+
+    cached_user = cache.auth.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    # Taken before the lookup, so that a concurrent revocation wins
+    generation = cache.auth.generation(client_id)
+
     logger.debug(f'{token = }')
-    stored_access_token = await models.token_get_access(token)
-    logger.debug(f'{stored_access_token = }')
+    expires_at = await _access_token_expires_at(token, token_data)
 
-    if not stored_access_token:
+    if expires_at is None:
         raise unauthenticated_exception
 
     user = await models.user_get(client_id)
@@ -67,69 +114,119 @@ async def get_current_user(
     if user is None:
         raise unauthenticated_exception
 
-    return schemas.UserCurrent(**user.__dict__)
-
-
-async def obtain_token(user_id: int):
-    """Obtain new auth token."""
-
-    issued_access_token = security.issue_access_token(user_id=user_id)
+    current_user = schemas.UserCurrent.from_orm(user)
+    cache.auth.set(
+        token,
+        current_user,
+        generation,
+        expires_at=expires_at,
+    )
 
-    await models.token_store_access(issued_access_token)
+    return current_user
 
-    refresh_token = await models.token_get_refresh_by_client_id(user_id)
 
-    if refresh_token is None:
-        issued_refresh_token = security.issue_refresh_token(user_id=user_id)
+async def authenticate_websocket(
+    websocket: fastapi.WebSocket,
+    match_id: str,
+) -> typing.Optional[int]:
+    """Authenticate the game websocket handshake, returning the client id.
 
-        await models.token_store_refresh(issued_refresh_token)
+    Signed tickets are verified without touching the database, bearer tokens
+    (`Authorization` header or `token` query parameter) go through the regular
+    access token validation once per connection.
+    """
+    ticket = websocket.query_params.get('ticket')
+    if ticket:
+        return security.extract_client_id_from_ws_ticket(ticket, match_id)
 
-        refresh_token = issued_refresh_token.dict()
+    scheme, token = fastapi.security.utils.get_authorization_scheme_param(
+        websocket.headers.get('Authorization'),
+    )
+    if scheme.lower() != 'bearer':
+        token = websocket.query_params.get('token')
+
+    if not token:
+        return None
+
+    try:
+        user = await get_current_user(token)
+    except exceptions.HTTPUnauthenticatedException:
+        return None
+    finally:
+        # Do not hold the pooled connection for the whole socket lifetime
+        await postgres.remove_session()
+
+    return user.id
+
+
+async def obtain_token(user_id: int, token_epoch: typing.Optional[int] = None):
+    """Obtain new auth token.
+
+    The access token is stored and the refresh token is reused or issued
+    within a single statement. Stateless access tokens take the revocation
+    epoch loaded along with the user, if provided.
+    """
+
+    if conf.security.stateless_tokens:
+        if token_epoch is None:
+            await epochs.epochs.fetch(user_id)
+        else:
+            epochs.epochs.set(user_id, token_epoch)
+
+        issued_access_token = security.issue_access_token(
+            user_id, epoch=epochs.epochs.get(user_id),
+        )
+        _, refresh_token = await models.token_issue(
+            None, security.issue_refresh_token(user_id=user_id),
+        )
+    else:
+        issued_access_token = security.issue_access_token(user_id=user_id)
+        _, refresh_token = await models.token_issue(
+            issued_access_token, security.issue_refresh_token(user_id=user_id),
+        )
 
     return schemas.TokenGet(
         user_id=user_id,
         access_token=issued_access_token.token,
-        refresh_token=refresh_token.token,
+        refresh_token=refresh_token,
         expires_in=issued_access_token.expires_in,
         token_type=issued_access_token.token_type,
     )
 
 
 async def refresh_token(client_id: int, access_token: str, refresh_token: str):
-    """Refresh previously obtained token."""
+    """Refresh previously obtained token.
+
+    Both tokens are checked and the new access token is stored within a
+    single statement.
+    """
 
     logger.debug(f'{refresh_token = }')
 
     token_refresh_error = TokenRefreshError('Invalid token was provided')
 
-    stored_access_token = await models.token_get_access(access_token)
-    logger.debug(f'{stored_access_token.token = }')
-    if not stored_access_token:
+    access_token_data = security.extract_access_token_data(access_token)
+    logger.debug(f'{access_token_data = }')
+    if access_token_data is None or access_token_data.get('cid') != client_id:
         raise token_refresh_error
 
-    effective_client_id = security.extract_client_id_from_signed_token(access_token)
-    logger.debug(f'{effective_client_id = }')
-    if effective_client_id != client_id:
-        raise token_refresh_error
+    if conf.security.stateless_tokens:
+        token_epoch = await models.token_refresh_epoch(client_id, refresh_token)
+        if token_epoch is None:
+            raise token_refresh_error
 
-    stored_refresh_token = await models.token_get_refresh_by_client_id(
-        client_id,
-        refresh_token,
-    )
-    logger.debug(f'{stored_refresh_token.token = }')
-    if not stored_refresh_token:
-        raise token_refresh_error
+        epochs.epochs.set(client_id, token_epoch)
+        if (_is_epoch_revoked(access_token_data) or
+                revocations.broadcast.is_revoked(access_token)):
+            raise token_refresh_error
 
-    logger.debug(
-        'stored_refresh_token["token"] != refresh_token '
-        f'{stored_refresh_token.token != refresh_token}',
-    )
+        new_access_token = security.issue_access_token(client_id, epoch=token_epoch)
+    else:
+        new_access_token = security.issue_access_token(user_id=client_id)
 
-    if stored_refresh_token.token != refresh_token:
-        raise token_refresh_error
+        if not await models.token_refresh(access_token, refresh_token, new_access_token):
+            raise token_refresh_error
 
-    new_access_token = security.issue_access_token(user_id=client_id)
-    await models.token_store_access(new_access_token)
     logger.debug(f'{new_access_token = }')
 
     return schemas.TokenGet(
@@ -142,27 +239,53 @@ async def refresh_token(client_id: int, access_token: str, refresh_token: str):
 
 
 async def revoke_access_token(client_id: int, access_token: str):
-    """Revoke access token."""
+    """Revoke access token.
+
+    Stored tokens are revoked in the table, stateless ones are only recorded
+    by the broadcast revocations until they expire. Either way the revocation
+    is broadcast to every worker and the other user sessions stay valid.
+    """
 
     token_revoke_error = TokenRevocationError('Access token revocation error')
 
-    stored_access_token = await models.token_get_access(access_token)
-    if not stored_access_token:
+    access_token_data = security.extract_access_token_data(access_token)
+    if access_token_data is None or access_token_data.get('cid') != client_id:
         raise token_revoke_error
 
-    effective_client_id = security.extract_client_id_from_signed_token(access_token)
-    if effective_client_id != client_id:
+    expires_at = await _access_token_expires_at(access_token, access_token_data)
+    if expires_at is None:
         raise token_revoke_error
 
-    await models.token_revoke_access(access_token)
+    if not conf.security.stateless_tokens:
+        await models.token_revoke_access(access_token)
+
+    await revocations.broadcast.revoke_token(access_token, client_id, expires_at)
+
+
+async def _revoke_user_tokens(user_id: int):
+    epoch = None
+    if conf.security.stateless_tokens:
+        epoch = await epochs.epochs.bump(user_id)
+
+    await revocations.broadcast.revoke_user(user_id, epoch)
 
 
 async def revoke_refresh_token(client_id: int):
     """Revoke user's refresh token and all access tokens."""
 
-    async with postgres.get_session().transaction():
+    if conf.security.stateless_tokens:
         await models.token_revoke_refresh(client_id)
-        await models.token_revoke_access_all(client_id)
+    else:
+        await models.token_revoke_all(client_id)
+
+    await _revoke_user_tokens(client_id)
+
+
+async def deactivate_user(user_id: int):
+    """Deactivate the user, its tokens are no longer accepted."""
+
+    await models.user_deactivate(user_id)
+    await _revoke_user_tokens(user_id)
 
 
 async def revoke_token(token: str, token_type_hint: str, client_id: int):
@@ -174,12 +297,13 @@ async def revoke_token(token: str, token_type_hint: str, client_id: int):
     elif token_type_hint == TokenTypeHint.REFRESH_TOKEN:
         return await revoke_refresh_token(client_id=client_id)
 
-    access_token = await models.token_get_access(access_token=token)
-    if access_token:
+    access_token_data = security.extract_access_token_data(token)
+    if (access_token_data is not None and
+            await _access_token_expires_at(token, access_token_data) is not None):
         return await revoke_access_token(client_id=client_id, access_token=token)
 
     refresh_token = await models.token_get_refresh(token)
-    if refresh_token and refresh_token['client_id'] == client_id:
+    if refresh_token and refresh_token.user_id == client_id:
         return await revoke_refresh_token(client_id=client_id)
 
     raise TokenRevocationError('Invalid token type')
@@ -0,0 +1,91 @@
+import time
+import typing
+
+import cacheout
+
+from ..core import conf
+from . import schemas
+
+
+class AuthCache:
+    """Validated access tokens mapped to their users.
+
+    An entry lives no longer than the TTL and the remaining token lifetime.
+    Users have a generation bumped on every invalidation, entries of older
+    generations are ignored, so that revoking all the user tokens does not
+    have to look for them and a validation racing with the revocation can
+    not cache a revoked token.
+
+    A generation is kept for the TTL after the last bump only: by then every
+    entry cached before the bump has expired, so it can not come back valid.
+
+    The cache is per process, invalidations made by other processes are
+    noticed once the entries expire.
+
+    >>> cache = AuthCache(maxsize=10, ttl_seconds=60)
+    >>> user = schemas.UserCurrent(id=1, email='a@b.c', phone='1', password='Passw0rd!')
+    >>> generation = cache.generation(user.id)
+    >>> cache.set('token', user, generation, expires_at=time.time() + 600)
+    >>> cache.get('token').id
+    1
+    >>> cache.invalidate_user(user.id)
+    >>> cache.get('token') is None
+    True
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._tokens = cacheout.Cache(maxsize=maxsize, ttl=ttl_seconds)
+        # No size bound, evicting a generation early would revive the older entries
+        self._generations = cacheout.Cache(maxsize=0, ttl=ttl_seconds)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def generation(self, user_id: int) -> int:
+        """Return the user generation, take it before validating the token."""
+        return self._generations.get(user_id, default=0)
+
+    def get(self, token: str) -> typing.Optional[schemas.UserCurrent]:
+        entry = self._tokens.get(token)
+
+        if entry is None:
+            return None
+
+        user, generation = entry
+        if generation != self.generation(user.id):
+            self._tokens.delete(token)
+            return None
+
+        return user
+
+    def set(
+        self,
+        token: str,
+        user: schemas.UserCurrent,
+        generation: int,
+        expires_at: float,
+    ):
+        ttl = min(self.ttl_seconds, expires_at - time.time())
+
+        if ttl <= 0 or generation != self.generation(user.id):
+            return
+
+        self._tokens.set(token, (user, generation), ttl=ttl)
+
+    def invalidate_token(self, token: str, user_id: int):
+        self._tokens.delete(token)
+        # Validation of the token may be in flight, keep it from being cached
+        self.invalidate_user(user_id)
+
+    def invalidate_user(self, user_id: int):
+        self._generations.set(user_id, self.generation(user_id) + 1)
+
+    def clear(self):
+        self._tokens.clear()
+
+
+auth = AuthCache(
+    maxsize=conf.security.auth_cache_size,
+    ttl_seconds=conf.security.auth_cache_ttl_seconds,
+)
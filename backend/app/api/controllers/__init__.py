@@ -1,12 +1,45 @@
 from .dummy import dummy_list  # noqa: F401
+from .games import GameAPIResponseNotFound  # noqa: F401
+from .games import GameJoinAPIResponseBadRequest  # noqa: F401
+from .games import GameJoinBadRequestStatus  # noqa: F401
+from .games import GameNotFoundStatus  # noqa: F401
+from .games import game_dispatch  # noqa: F401
+from .games import game_join  # noqa: F401
+from .games import game_session  # noqa: F401
+from .games import game_spectate  # noqa: F401
+from .games import game_ticket_issue  # noqa: F401
+from .leaderboard import LeaderboardAPIResponseNotFound  # noqa: F401
+from .leaderboard import LeaderboardNotFoundStatus  # noqa: F401
+from .leaderboard import leaderboard_entry  # noqa: F401
+from .leaderboard import leaderboard_page  # noqa: F401
+from .lobby import lobby_page  # noqa: F401
+from .matches import ReplayAPIResponseNotFound  # noqa: F401
+from .matches import ReplayExportAPIResponseBadRequest  # noqa: F401
+from .matches import ReplayExportBadRequestStatus  # noqa: F401
+from .matches import ReplayNotFoundStatus  # noqa: F401
+from .matches import match_replay  # noqa: F401
+from .matches import matches_replay_export  # noqa: F401
+from .matchmaking import MatchmakingAPIResponseBadRequest  # noqa: F401
+from .matchmaking import MatchmakingBadRequestStatus  # noqa: F401
+from .matchmaking import matchmaking_dequeue  # noqa: F401
+from .matchmaking import matchmaking_enqueue  # noqa: F401
+from .matchmaking import matchmaking_stats  # noqa: F401
+from .matchmaking import matchmaking_status  # noqa: F401
+from .stats import PlayerStatsAPIResponseNotFound  # noqa: F401
+from .stats import PlayerStatsNotFoundStatus  # noqa: F401
+from .stats import player_stats_get  # noqa: F401
+from .token import CredentialsAPIResponseTooManyRequests  # noqa: F401
+from .token import CredentialsTooManyRequestsStatus  # noqa: F401
 from .token import TokenObtainAPIResponseUnauthenticated  # noqa: F401
 from .token import TokenObtainUnauthenticatedStatus  # noqa: F401
 from .token import TokenRefreshAPIResponseBadRequest  # noqa: F401
 from .token import TokenRefreshBadRequestStatus  # noqa: F401
 from .token import TokenRevokeAPIResponseBadRequest  # noqa: F401
 from .token import TokenRevokeBadRequestStatus  # noqa: F401
+from .token import password_hashing_stats  # noqa: F401
 from .token import token_obtain  # noqa: F401
 from .token import token_refresh  # noqa: F401
 from .token import token_revoke  # noqa: F401
 from .users import user_create  # noqa: F401
+from .users import user_deactivate  # noqa: F401
 from .users import UserInvalidResponse  # noqa: F401
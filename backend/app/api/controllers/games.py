@@ -0,0 +1,193 @@
+import json
+import logging
+import typing
+
+import fastapi
+import starlette.status
+import starlette.websockets
+
+from ... import gamehost
+from ...core import conf
+from ...websocket_manager import managers
+from .. import exceptions
+from .. import responses
+from .. import schemas
+from .. import security
+from ..services import games
+
+
+logger = logging.getLogger(__name__)
+
+
+class GameNotFoundStatus(responses.Status):
+    GAME_NOT_FOUND = 'game_not_found'
+
+
+class GameAPIResponseNotFound(responses.APIResponseNotFound):
+    status: GameNotFoundStatus
+
+
+class GameJoinBadRequestStatus(responses.Status):
+    GAME_NOT_OPEN = 'game_not_open'
+
+
+class GameJoinAPIResponseBadRequest(responses.APIResponseBadRequest):
+    status: GameJoinBadRequestStatus
+
+
+async def _match_player_state(match_id: str, user_id: int) -> dict:
+    try:
+        state = await games.call('state', match_id=match_id, user_id=user_id)
+    except gamehost.GameHostError:
+        state = None
+
+    if state is None or state['hand'] is None:
+        raise exceptions.HTTPNotFoundException(
+            'Match is not found among the user matches',
+            status=GameNotFoundStatus.GAME_NOT_FOUND,
+        )
+
+    return state
+
+
+async def game_ticket_issue(current_user: schemas.UserCurrent, match_id: str):
+    await _match_player_state(match_id, current_user.id)
+
+    return schemas.GameTicket(
+        ticket=security.issue_ws_ticket(current_user.id, match_id),
+        expires_in=conf.security.ws_ticket_expires_in_seconds,
+    )
+
+
+async def game_join(current_user: schemas.UserCurrent, match_id: str):
+    """Take a seat of the match, the game host announces the new state to the room."""
+    try:
+        await games.call('join', match_id=match_id, user_id=current_user.id)
+    except gamehost.GameHostError as e:
+        if e.code == 'game_not_open':
+            raise exceptions.HTTPBadRequestException(
+                str(e),
+                status=GameJoinBadRequestStatus.GAME_NOT_OPEN,
+            )
+
+        raise exceptions.HTTPNotFoundException(
+            'Match is not found',
+            status=GameNotFoundStatus.GAME_NOT_FOUND,
+        )
+
+    return schemas.GameTicket(
+        ticket=security.issue_ws_ticket(current_user.id, match_id),
+        expires_in=conf.security.ws_ticket_expires_in_seconds,
+    )
+
+
+async def game_dispatch(
+    match_id: str,
+    connection: managers.Connection,
+    raw_message: str,
+    notifier: managers.GameSessionsManager = managers.notifier,
+):
+    """Pass the player message to the game host.
+
+    Supported messages are `{"action": "play", "card": {...}, "new_color": ...}`
+    and `{"action": "draw"}`, no database access is made. The move result
+    reaches the room as the game host event.
+    """
+    try:
+        message = json.loads(raw_message)
+        action = message['action']
+    except (ValueError, TypeError, KeyError):
+        await notifier.send(connection, {'type': 'error', 'detail': 'Malformed message'})
+        return
+
+    if action == 'play' and message.get('card'):
+        move = {'card': message['card'], 'new_color': message.get('new_color')}
+    elif action == 'draw':
+        move = {}
+    else:
+        await notifier.send(
+            connection, {'type': 'error', 'detail': f'Unsupported action: {action!r}'},
+        )
+        return
+
+    try:
+        await games.client.call('play', match_id=match_id, user_id=connection.user_id, **move)
+    except (gamehost.GameHostError, ConnectionError) as e:
+        await notifier.send(connection, {'type': 'error', 'detail': str(e)})
+
+
+def _close_code(e: Exception) -> int:
+    if isinstance(e, ConnectionError) or getattr(e, 'code', None) == 'unavailable':
+        return starlette.status.WS_1012_SERVICE_RESTART
+
+    return starlette.status.WS_1008_POLICY_VIOLATION
+
+
+async def game_session(
+    websocket: fastapi.WebSocket,
+    match_id: str,
+    user_id: int,
+    last_seq: typing.Optional[int] = None,
+    notifier: managers.GameSessionsManager = managers.notifier,
+):
+    try:
+        state = await games.client.call('state', match_id=match_id, user_id=user_id)
+    except (gamehost.GameHostError, ConnectionError) as e:
+        await websocket.close(code=_close_code(e))
+        return
+
+    if state['hand'] is None:
+        await websocket.close(code=starlette.status.WS_1008_POLICY_VIOLATION)
+        return
+
+    connection = await notifier.connect(
+        websocket, match_id, user_id=user_id, last_seq=last_seq,
+    )
+
+    try:
+        # Events emitted before the connection joined the room are in this one
+        state = await games.client.call('state', match_id=match_id, user_id=user_id)
+        notifier.advance_seq(match_id, state['seq'])
+
+        if not connection.resumed:
+            await notifier.send(connection, {
+                'type': 'state',
+                'seq': state['seq'],
+                'data': state['state'],
+            })
+
+        await notifier.send(connection, {'type': 'hand', 'data': state['hand']})
+
+        while True:
+            raw_message = await websocket.receive_text()
+            await game_dispatch(match_id, connection, raw_message, notifier)
+    except (gamehost.GameHostError, ConnectionError) as e:
+        await websocket.close(code=_close_code(e))
+    except starlette.websockets.WebSocketDisconnect:
+        logger.debug(f'Player {user_id} disconnected from {match_id!r}')
+    finally:
+        notifier.remove(connection, match_id)
+
+
+async def game_spectate(
+    websocket: fastapi.WebSocket,
+    match_id: str,
+    notifier: managers.GameSessionsManager = managers.notifier,
+):
+    connection = await notifier.connect_spectator(websocket, match_id)
+
+    try:
+        # Fetched once connected, so no event slips in between
+        state = await games.client.call('state', match_id=match_id)
+        # Delivered after the spectator delay like any other snapshot
+        notifier.publish_spectator_state(match_id, state['state'])
+
+        # Spectators have nothing to say, keep reading to notice the disconnect
+        while True:
+            await websocket.receive_text()
+    except (gamehost.GameHostError, ConnectionError) as e:
+        await websocket.close(code=_close_code(e))
+    except starlette.websockets.WebSocketDisconnect:
+        logger.debug(f'Spectator disconnected from {match_id!r}')
+    finally:
+        notifier.remove_spectator(connection, match_id)
@@ -0,0 +1,40 @@
+from ... import gamehost
+from .. import exceptions
+from .. import responses
+from .. import schemas
+from ..services import games
+
+
+class LeaderboardNotFoundStatus(responses.Status):
+    PLAYER_NOT_RANKED = 'player_not_ranked'
+
+
+class LeaderboardAPIResponseNotFound(responses.APIResponseNotFound):
+    status: LeaderboardNotFoundStatus
+
+
+async def leaderboard_page(period: schemas.LeaderboardPeriod, offset: int, limit: int):
+    page = await games.call(
+        'leaderboard_page', period=period.value, offset=offset, limit=limit,
+    )
+
+    return schemas.LeaderboardPage(
+        period=period,
+        total=page['total'],
+        entries=[
+            schemas.LeaderboardEntry(rank=rank, user_id=user_id, score=score)
+            for rank, user_id, score in page['entries']
+        ],
+    )
+
+
+async def leaderboard_entry(period: schemas.LeaderboardPeriod, user_id: int):
+    try:
+        entry = await games.call('leaderboard_entry', period=period.value, user_id=user_id)
+    except gamehost.GameHostError as e:
+        raise exceptions.HTTPNotFoundException(
+            str(e),
+            status=LeaderboardNotFoundStatus.PLAYER_NOT_RANKED,
+        )
+
+    return schemas.LeaderboardEntry(user_id=user_id, **entry)
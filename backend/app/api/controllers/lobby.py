@@ -0,0 +1,27 @@
+import typing
+
+import fastapi
+import starlette.status
+
+from .. import exceptions
+from ..services import games
+
+
+async def lobby_page(
+    page: int,
+    if_none_match: typing.Optional[str] = None,
+) -> fastapi.Response:
+    """Serve the pre-serialized lobby page, no per-game work is made."""
+    result = await games.call('lobby_page', page=page, if_none_match=if_none_match)
+    headers = {'ETag': result['etag']}
+
+    if not result['modified']:
+        return fastapi.Response(
+            status_code=starlette.status.HTTP_304_NOT_MODIFIED,
+            headers=headers,
+        )
+
+    if result['content'] is None:
+        raise exceptions.HTTPNotFoundException('Lobby page is not found')
+
+    return fastapi.Response(result['content'], media_type='application/json', headers=headers)
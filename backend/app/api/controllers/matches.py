@@ -0,0 +1,141 @@
+import datetime
+import json
+import typing
+import zlib
+
+import fastapi
+
+from ...core import conf
+from ...core import postgres
+from .. import exceptions
+from .. import models
+from .. import responses
+
+
+class ReplayNotFoundStatus(responses.Status):
+    REPLAY_NOT_FOUND = 'replay_not_found'
+
+
+class ReplayAPIResponseNotFound(responses.APIResponseNotFound):
+    status: ReplayNotFoundStatus
+
+
+class ReplayExportBadRequestStatus(responses.Status):
+    EXPORT_PERIOD_INVALID = 'export_period_invalid'
+    EXPORT_PERIOD_TOO_LONG = 'export_period_too_long'
+
+
+class ReplayExportAPIResponseBadRequest(responses.APIResponseBadRequest):
+    status: ReplayExportBadRequestStatus
+
+
+def _json_default(value: typing.Any):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+async def _gzip_ndjson(records: typing.AsyncIterator[dict]) -> typing.AsyncIterator[bytes]:
+    """Encode the records as gzip compressed JSON lines, chunk by chunk."""
+    compressor = zlib.compressobj(conf.replays.compression_level, zlib.DEFLATED, 31)
+
+    async for record in records:
+        chunk = compressor.compress(
+            json.dumps(record, default=_json_default).encode() + b'\n',
+        )
+        # Compressor holds the data back until a deflate block is complete
+        if chunk:
+            yield chunk
+
+    yield compressor.flush()
+
+
+def _move_record(row: typing.Mapping) -> dict:
+    return {
+        'type': 'move',
+        'match_id': row['match_id'],
+        'move_number': row['move_number'],
+        'player_id': row['player_id'],
+        'card': row['card'],
+        'hand_size': row['hand_size'],
+        'played_at': row['played_at'],
+    }
+
+
+async def _replay_records(match_id: str) -> typing.AsyncIterator[dict]:
+    # Streaming runs in a task of its own, so the request scoped session can not be used
+    async with postgres.new_session() as session:
+        result = await models.game_moves_stream(session, match_id, conf.replays.yield_per)
+
+        async for row in result.mappings():
+            yield _move_record(row)
+
+
+async def _export_records(
+    user_id: int,
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> typing.AsyncIterator[dict]:
+    async with postgres.new_session() as session:
+        result = await models.finished_game_moves_stream(
+            session, user_id, since, until, conf.replays.yield_per,
+        )
+
+        match_id = None
+        async for row in result.mappings():
+            if row['match_id'] != match_id:
+                match_id = row['match_id']
+                yield {
+                    'type': 'match',
+                    'match_id': match_id,
+                    'player_ids': row['player_ids'],
+                    'winner_id': row['winner_id'],
+                    'started_at': row['started_at'],
+                    'finished_at': row['finished_at'],
+                }
+
+            yield _move_record(row)
+
+
+def _attachment(filename: str) -> dict:
+    return {'Content-Disposition': f'attachment; filename="{filename}"'}
+
+
+async def match_replay(match_id: str) -> fastapi.responses.StreamingResponse:
+    if not await models.game_moves_exist(match_id):
+        raise exceptions.HTTPNotFoundException(
+            'Match has no recorded moves',
+            status=ReplayNotFoundStatus.REPLAY_NOT_FOUND,
+        )
+
+    return fastapi.responses.StreamingResponse(
+        _gzip_ndjson(_replay_records(match_id)),
+        media_type='application/octet-stream',
+        headers=_attachment(f'{match_id}.ndjson.gz'),
+    )
+
+
+async def matches_replay_export(
+    user_id: int,
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> fastapi.responses.StreamingResponse:
+    """Export the matches the user has played, a period at most `export_max_days` long."""
+    if since >= until:
+        raise exceptions.HTTPBadRequestException(
+            'Export period should end after it starts',
+            status=ReplayExportBadRequestStatus.EXPORT_PERIOD_INVALID,
+        )
+
+    if until - since > datetime.timedelta(days=conf.replays.export_max_days):
+        raise exceptions.HTTPBadRequestException(
+            f'Export period should not exceed {conf.replays.export_max_days} days',
+            status=ReplayExportBadRequestStatus.EXPORT_PERIOD_TOO_LONG,
+        )
+
+    return fastapi.responses.StreamingResponse(
+        _gzip_ndjson(_export_records(user_id, since, until)),
+        media_type='application/octet-stream',
+        headers=_attachment(f'replays-{since:%Y%m%d%H%M}-{until:%Y%m%d%H%M}.ndjson.gz'),
+    )
@@ -0,0 +1,42 @@
+from ... import gamehost
+from .. import exceptions
+from .. import responses
+from .. import schemas
+from ..services import games
+
+
+class MatchmakingBadRequestStatus(responses.Status):
+    ALREADY_IN_MATCH = 'already_in_match'
+
+
+class MatchmakingAPIResponseBadRequest(responses.APIResponseBadRequest):
+    status: MatchmakingBadRequestStatus
+
+
+async def matchmaking_status(current_user: schemas.UserCurrent) -> schemas.MatchmakingStatus:
+    return schemas.MatchmakingStatus(
+        **await games.call('matchmaking_status', user_id=current_user.id),
+    )
+
+
+async def matchmaking_enqueue(current_user: schemas.UserCurrent):
+    try:
+        status = await games.call('matchmaking_enqueue', user_id=current_user.id)
+    except gamehost.GameHostError as e:
+        if e.code != 'already_in_match':
+            raise
+
+        raise exceptions.HTTPBadRequestException(
+            str(e),
+            status=MatchmakingBadRequestStatus.ALREADY_IN_MATCH,
+        )
+
+    return schemas.MatchmakingStatus(**status)
+
+
+async def matchmaking_dequeue(current_user: schemas.UserCurrent):
+    await games.call('matchmaking_dequeue', user_id=current_user.id)
+
+
+async def matchmaking_stats():
+    return schemas.MatchmakingStats(**await games.call('matchmaking_stats'))
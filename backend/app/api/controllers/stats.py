@@ -0,0 +1,51 @@
+import collections
+
+from ...uno import enums
+from .. import exceptions
+from .. import models
+from .. import responses
+from .. import schemas
+from ..services import games
+
+
+class PlayerStatsNotFoundStatus(responses.Status):
+    PLAYER_STATS_NOT_FOUND = 'player_stats_not_found'
+
+
+class PlayerStatsAPIResponseNotFound(responses.APIResponseNotFound):
+    status: PlayerStatsNotFoundStatus
+
+
+async def player_stats_get(user_id: int) -> schemas.PlayerStatsGet:
+    stored = await models.player_stats_get(user_id)
+    # Increments not checkpointed yet, so the stats are up to date
+    pending = await games.call('stats_pending', user_id=user_id)
+
+    if stored is None and pending is None:
+        raise exceptions.HTTPNotFoundException(
+            'Player has no stats yet',
+            status=PlayerStatsNotFoundStatus.PLAYER_STATS_NOT_FOUND,
+        )
+
+    counters = collections.Counter(pending)
+    if stored is not None:
+        counters.update({
+            counter: getattr(stored, counter) for counter in models.stats.COUNTERS
+        })
+
+    colors = {color: counters[f'{color.value.lower()}_played'] for color in enums.CardColors}
+    most_played_color = max(colors, key=colors.get)
+
+    return schemas.PlayerStatsGet(
+        user_id=user_id,
+        games=counters['games'],
+        wins=counters['wins'],
+        moves=counters['moves'],
+        cards_played=counters['cards_played'],
+        cards_drawn=counters['cards_drawn'],
+        plus_fours_dealt=counters['plus_fours_dealt'],
+        average_hand_size=(
+            counters['hand_size_total'] / counters['moves'] if counters['moves'] else None
+        ),
+        most_played_color=most_played_color if colors[most_played_color] else None,
+    )
@@ -1,7 +1,11 @@
+import math
+
 from .. import auth
 from .. import exceptions
+from .. import ratelimit
 from .. import responses
 from .. import schemas
+from .. import security
 
 
 class TokenObtainUnauthenticatedStatus(responses.Status):
@@ -16,6 +20,29 @@ class TokenRevokeBadRequestStatus(responses.Status):
     TOKEN_REVOKE_ERROR = 'token_revoke_error'
 
 
+class CredentialsTooManyRequestsStatus(responses.Status):
+    PASSWORD_HASHING_BUSY = 'password_hashing_busy'
+    RATE_LIMITED = 'rate_limited'
+
+
+class CredentialsAPIResponseTooManyRequests(responses.APIResponseTooManyRequests):
+    status: CredentialsTooManyRequestsStatus
+
+
+def password_hashing_busy() -> exceptions.HTTPTooManyRequestsException:
+    return exceptions.HTTPTooManyRequestsException(
+        'Too many passwords are being checked, retry later',
+        status=CredentialsTooManyRequestsStatus.PASSWORD_HASHING_BUSY,
+    )
+
+
+def rate_limited(e: ratelimit.RateLimited) -> exceptions.HTTPTooManyRequestsException:
+    return exceptions.HTTPTooManyRequestsException(
+        f'Too many attempts, retry in {math.ceil(e.retry_after)} seconds',
+        status=CredentialsTooManyRequestsStatus.RATE_LIMITED,
+    )
+
+
 class TokenObtainAPIResponseUnauthenticated(responses.APIResponseUnauthenticated):
     status: TokenObtainUnauthenticatedStatus
 
@@ -29,6 +56,11 @@ class TokenRevokeAPIResponseBadRequest(responses.APIResponseBadRequest):
 
 
 async def token_obtain(email: str, password: str, client_ip: str):
+    try:
+        await ratelimit.credentials.hit(ip=client_ip, email=email.lower())
+    except ratelimit.RateLimited as e:
+        raise rate_limited(e) from e
+
     try:
         user = await auth.authenticate_user(email, password)
     except auth.AuthCredentialsError as e:
@@ -36,8 +68,10 @@ async def token_obtain(email: str, password: str, client_ip: str):
             'Could not authenticate user with provided credentials',
             status=TokenObtainUnauthenticatedStatus.TOKEN_INVALID_CREDENTIALS,
         ) from e
+    except security.PasswordHasherBusy as e:
+        raise password_hashing_busy() from e
 
-    return await auth.obtain_token(user['id'])
+    return await auth.obtain_token(user['id'], token_epoch=user['token_epoch'])
 
 
 async def token_refresh(
@@ -66,3 +100,15 @@ async def token_revoke(
             detail='Token revoke error',
             status=TokenRevokeBadRequestStatus.TOKEN_REVOKE_ERROR,
         ) from e
+
+
+async def password_hashing_stats():
+    hasher = security.password_hasher
+
+    return schemas.PasswordHashingStats(
+        pending=hasher.pending,
+        queue_wait_p50=hasher.queue_wait_percentile(50),
+        queue_wait_p99=hasher.queue_wait_percentile(99),
+        hash_time_p50=hasher.hash_time_percentile(50),
+        hash_time_p99=hasher.hash_time_percentile(99),
+    )
@@ -1,7 +1,11 @@
-from .. import responses
+from .. import auth
+from .. import exceptions
 from .. import models
+from .. import ratelimit
+from .. import responses
 from .. import schemas
-from .. import exceptions
+from .. import security
+from . import token
 
 
 class UserInvalidDataStatus(responses.Status):
@@ -12,7 +16,12 @@ class UserInvalidResponse(responses.APIResponseBadRequest):
     status: UserInvalidDataStatus
 
 
-async def user_create(user: schemas.UserRegistration):
+async def user_create(user: schemas.UserRegistration, client_ip: str):
+    try:
+        await ratelimit.credentials.hit(ip=client_ip, email=user.email)
+    except ratelimit.RateLimited as e:
+        raise token.rate_limited(e) from e
+
     try:
         return await models.user_create(user)
     except models.user.UserAlreadyExists as e:
@@ -20,3 +29,9 @@ async def user_create(user: schemas.UserRegistration):
             'User with such email or password already exists',
             status=UserInvalidDataStatus.USER_INVALID_DATA,
         ) from e
+    except security.PasswordHasherBusy as e:
+        raise token.password_hashing_busy() from e
+
+
+async def user_deactivate(current_user: schemas.UserCurrent):
+    await auth.deactivate_user(current_user.id)
@@ -1,5 +1,6 @@
 import abc
 import dataclasses
+import ipaddress
 import typing
 
 import fastapi
@@ -12,6 +13,8 @@ import starlette.routing
 import starlette.status
 import starlette.types
 
+from . import models
+
 
 @dataclasses.dataclass
 class RequestMeta:
@@ -77,26 +80,87 @@ class Middleware(
         return response
 
 
-def get_client_ip(headers: typing.Dict):
-    if 'X-Real-Ip' in headers:
-        client_ip = headers.get('X-Real-Ip')
-    elif 'X-Forwarded-For' in headers:
-        client_ip = headers.get('X-Forwarded-For').split(',')[0]
-    else:
-        return None
+IPNetwork = typing.Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
 
+def _parse_ip(value: str) -> typing.Optional[str]:
     try:
-        pydantic.IPvAnyAddress.validate(client_ip)
+        pydantic.IPvAnyAddress.validate(value.strip())
     except pydantic.errors.IPvAnyAddressError:
-        client_ip = None
+        return None
+
+    return value.strip()
+
 
-    return client_ip
+def _is_trusted(ip: str, trusted_proxies: typing.Sequence[IPNetwork]) -> bool:
+    address = ipaddress.ip_address(ip)
+    return any(address in network for network in trusted_proxies)
+
+
+def get_client_ip(
+    headers: typing.Mapping[str, str],
+    peer_ip: typing.Optional[str],
+    trusted_proxies: typing.Sequence[IPNetwork] = (),
+) -> typing.Optional[str]:
+    """Return the client address, forwarded headers are honoured from trusted proxies only.
+
+    `X-Real-Ip` is set by the proxy itself. `X-Forwarded-For` is appended to
+    by every hop, the client may put anything in front, so the right-most
+    address which is not a trusted proxy is taken.
+
+    >>> proxies = [ipaddress.ip_network('10.0.0.0/8')]
+    >>> headers = {'X-Forwarded-For': '1.1.1.1, 2.2.2.2, 10.0.0.2'}
+    >>> get_client_ip(headers, '10.0.0.1', proxies)
+    '2.2.2.2'
+    >>> get_client_ip(headers, '3.3.3.3', proxies)
+    '3.3.3.3'
+    """
+    # Peers which are not IP addresses (e.g. unix sockets) can not be proxies either
+    if not peer_ip or _parse_ip(peer_ip) is None or not _is_trusted(peer_ip, trusted_proxies):
+        return peer_ip
+
+    if 'X-Real-Ip' in headers:
+        return _parse_ip(headers['X-Real-Ip']) or peer_ip
+
+    forwarded_ips = headers.get('X-Forwarded-For', '').split(',')
+
+    for forwarded_ip in reversed(forwarded_ips):
+        client_ip = _parse_ip(forwarded_ip)
+        if client_ip is None:
+            # Whatever is left of a malformed entry was not appended by a trusted hop
+            break
+        if not _is_trusted(client_ip, trusted_proxies):
+            return client_ip
+
+    return peer_ip
 
 
 class ClientIPMiddleware(starlette.middleware.base.BaseHTTPMiddleware):
+    def __init__(
+        self, app: starlette.types.ASGIApp, trusted_proxies: typing.Sequence[str] = (),
+    ):
+        super().__init__(app)
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies
+        ]
+
     async def dispatch(
         self, request: fastapi.Request, call_next: typing.Callable,
     ) -> fastapi.responses.StreamingResponse:
-        request.state.client_ip = get_client_ip(request.headers)
+        request.state.client_ip = get_client_ip(
+            request.headers,
+            request.client.host if request.client is not None else None,
+            self.trusted_proxies,
+        )
 
         return await call_next(request)
+
+
+class IdentityMapMiddleware(starlette.middleware.base.BaseHTTPMiddleware):
+    """Scopes the identity map of the loaded users to the request."""
+
+    async def dispatch(
+        self, request: fastapi.Request, call_next: typing.Callable,
+    ) -> fastapi.responses.StreamingResponse:
+        with models.user_identity_map():
+            return await call_next(request)
@@ -1,15 +1,43 @@
 from ._base import Base  # noqa: F401
+from .game import GameMove  # noqa: F401
+from .game import Match  # noqa: F401
+from .game import finished_game_moves_stream  # noqa: F401
+from .game import game_moves_chunk  # noqa: F401
+from .game import game_moves_exist  # noqa: F401
+from .game import game_moves_insert  # noqa: F401
+from .game import game_moves_stream  # noqa: F401
+from .game import match_wins_since  # noqa: F401
+from .game import matches_chunk  # noqa: F401
+from .game import matches_insert  # noqa: F401
+from .rating import PlayerRating  # noqa: F401
+from .rating import player_ratings_add  # noqa: F401
+from .rating import player_ratings_list  # noqa: F401
+from .stats import PlayerStats  # noqa: F401
+from .stats import player_stats_get  # noqa: F401
+from .stats import player_stats_increment  # noqa: F401
+from .stats import player_stats_reset  # noqa: F401
+from .token import token_access_sweep  # noqa: F401
 from .token import token_get_access  # noqa: F401
 from .token import token_get_refresh  # noqa: F401
 from .token import token_get_refresh_by_client_id  # noqa: F401
+from .token import token_issue  # noqa: F401
+from .token import token_refresh  # noqa: F401
+from .token import token_refresh_epoch  # noqa: F401
+from .token import token_refresh_sweep  # noqa: F401
 from .token import token_revoke_access  # noqa: F401
 from .token import token_revoke_access_all  # noqa: F401
+from .token import token_revoke_all  # noqa: F401
 from .token import token_revoke_refresh  # noqa: F401
 from .token import token_store_access  # noqa: F401
 from .token import token_store_refresh  # noqa: F401
 from .user import User  # noqa: F401
 from .user import user_create  # noqa: F401
+from .user import user_deactivate  # noqa: F401
 from .user import user_delete_all  # noqa: F401
 from .user import user_get  # noqa: F401
 from .user import user_list  # noqa: F401
 from .user import user_get_by_email  # noqa: F401
+from .user import user_identity_map  # noqa: F401
+from .user import user_token_epoch_bump  # noqa: F401
+from .user import user_token_epoch_get  # noqa: F401
+from .user import user_token_epochs_list  # noqa: F401
@@ -0,0 +1,183 @@
+import datetime
+import typing
+
+import sqlalchemy
+import sqlalchemy.dialects.postgresql
+from sqlalchemy.ext import asyncio as sqlalchemy_async
+
+from ...core import postgres
+from . import Base
+
+
+class GameMove(Base):
+    """Move history, range partitioned by month of `played_at`.
+
+    Unique constraints of a partitioned table have to include the partition
+    key, so the primary key and the move number constraint include it too.
+    """
+
+    __tablename__ = 'game_moves'
+    __table_args__ = (
+        sqlalchemy.UniqueConstraint(
+            'match_id', 'move_number', 'played_at',
+            name='uq_game_moves_match_id_move_number',
+        ),
+        sqlalchemy.Index('ix_game_moves_played_at', 'played_at', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (played_at)'},
+    )
+
+    # Identity columns are not supported by partitioned tables, the sequence is used
+    id = sqlalchemy.Column(
+        sqlalchemy.BigInteger(),
+        primary_key=True,
+        server_default=sqlalchemy.text("nextval('game_moves_id_seq')"),
+    )
+    match_id = sqlalchemy.Column(sqlalchemy.Text(), nullable=False)
+    move_number = sqlalchemy.Column(sqlalchemy.Integer(), nullable=False)
+    player_id = sqlalchemy.Column(sqlalchemy.Integer(), nullable=False)
+    # Played card along with the chosen color, null for drawing a card
+    card = sqlalchemy.Column(sqlalchemy.dialects.postgresql.JSONB(), nullable=True)
+    # Cards left in the player hand after the move, null for moves stored before
+    hand_size = sqlalchemy.Column(sqlalchemy.Integer(), nullable=True)
+    played_at = sqlalchemy.Column(
+        sqlalchemy.DateTime(timezone=True),
+        primary_key=True,
+        server_default=sqlalchemy.text('now()'),
+    )
+
+
+class Match(Base):
+    """Finished matches, range partitioned by month of `finished_at`."""
+
+    __tablename__ = 'matches'
+    __table_args__ = (
+        sqlalchemy.Index('ix_matches_finished_at', 'finished_at', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (finished_at)'},
+    )
+
+    match_id = sqlalchemy.Column(sqlalchemy.Text(), primary_key=True)
+    player_ids = sqlalchemy.Column(
+        sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.Integer()),
+        nullable=False,
+    )
+    winner_id = sqlalchemy.Column(sqlalchemy.Integer(), nullable=True)
+    moves_count = sqlalchemy.Column(sqlalchemy.Integer(), nullable=False)
+    started_at = sqlalchemy.Column(sqlalchemy.DateTime(timezone=True), nullable=False)
+    finished_at = sqlalchemy.Column(sqlalchemy.DateTime(timezone=True), primary_key=True)
+
+
+async def _insert_ignoring_conflicts(model: typing.Type[Base], rows: typing.List[dict]):
+    query = sqlalchemy.dialects.postgresql.insert(model).values(
+        rows,
+    ).on_conflict_do_nothing()
+
+    session = postgres.get_session()
+    try:
+        await session.execute(query)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+async def game_moves_insert(moves: typing.List[dict]):
+    """Insert the moves with a single statement, already stored moves are skipped."""
+    await _insert_ignoring_conflicts(GameMove, moves)
+
+
+async def matches_insert(matches: typing.List[dict]):
+    """Insert the matches with a single statement, already stored matches are skipped."""
+    await _insert_ignoring_conflicts(Match, matches)
+
+
+async def match_wins_since(since: datetime.datetime) -> typing.List[typing.Tuple[int, int]]:
+    """Return `(winner_id, wins)` of the matches finished since the time."""
+    query = sqlalchemy.select(
+        Match.winner_id, sqlalchemy.func.count(),
+    ).filter(
+        Match.finished_at >= since,
+        Match.winner_id.isnot(None),
+    ).group_by(Match.winner_id)
+
+    result = await postgres.get_session().execute(query)
+    return result.all()
+
+
+async def game_moves_chunk(after_id: int, limit: int) -> typing.List[sqlalchemy.engine.Row]:
+    """Return the moves following the id in the id order, for keyset pagination.
+
+    Plain rows are returned, so that no objects pile up in the session.
+    """
+    query = sqlalchemy.select(GameMove.__table__).filter(
+        GameMove.id > after_id,
+    ).order_by(GameMove.id).limit(limit)
+
+    result = await postgres.get_session().execute(query)
+    return result.all()
+
+
+async def matches_chunk(after_match_id: str, limit: int) -> typing.List[sqlalchemy.engine.Row]:
+    """Return the matches following the match id in the match id order."""
+    query = sqlalchemy.select(Match.__table__).filter(
+        Match.match_id > after_match_id,
+    ).order_by(Match.match_id).limit(limit)
+
+    result = await postgres.get_session().execute(query)
+    return result.all()
+
+
+def _move_rows_query():
+    return sqlalchemy.select(
+        GameMove.match_id,
+        GameMove.move_number,
+        GameMove.player_id,
+        GameMove.card,
+        GameMove.hand_size,
+        GameMove.played_at,
+    )
+
+
+async def game_moves_exist(match_id: str) -> bool:
+    query = sqlalchemy.select(GameMove.id).filter(GameMove.match_id == match_id).limit(1)
+
+    result = await postgres.get_session().execute(query)
+    return result.first() is not None
+
+
+async def game_moves_stream(
+    session: sqlalchemy_async.AsyncSession,
+    match_id: str,
+    yield_per: int,
+) -> sqlalchemy_async.AsyncResult:
+    """Stream the moves of the match in the play order with a server side cursor."""
+    query = _move_rows_query().filter(
+        GameMove.match_id == match_id,
+    ).order_by(GameMove.move_number).execution_options(yield_per=yield_per)
+
+    return await session.stream(query)
+
+
+async def finished_game_moves_stream(
+    session: sqlalchemy_async.AsyncSession,
+    user_id: int,
+    since: datetime.datetime,
+    until: datetime.datetime,
+    yield_per: int,
+) -> sqlalchemy_async.AsyncResult:
+    """Stream the moves of the user matches finished within the period, match by match."""
+    query = _move_rows_query().add_columns(
+        Match.player_ids,
+        Match.winner_id,
+        Match.started_at,
+        Match.finished_at,
+    ).join(
+        Match, Match.match_id == GameMove.match_id,
+    ).filter(
+        Match.finished_at >= since,
+        Match.finished_at < until,
+        Match.player_ids.contains([user_id]),
+    ).order_by(
+        GameMove.match_id, GameMove.move_number,
+    ).execution_options(yield_per=yield_per)
+
+    return await session.stream(query)
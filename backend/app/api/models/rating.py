@@ -0,0 +1,74 @@
+import typing
+
+import sqlalchemy
+import sqlalchemy.dialects.postgresql
+
+from ...core import postgres
+from . import Base
+
+
+class PlayerRating(Base):
+    __tablename__ = 'player_ratings'
+
+    user_id = sqlalchemy.Column(
+        sqlalchemy.Integer(),
+        sqlalchemy.ForeignKey('users.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    rating = sqlalchemy.Column(sqlalchemy.Float(), nullable=False)
+    games = sqlalchemy.Column(sqlalchemy.Integer(), nullable=False, server_default='0')
+    updated_at = sqlalchemy.Column(
+        sqlalchemy.DateTime(timezone=True),
+        nullable=False,
+        server_default=sqlalchemy.text('now()'),
+    )
+
+
+async def player_ratings_list() -> typing.List[typing.Tuple[int, float, int]]:
+    """Return `(user_id, rating, games)` of every rated player."""
+    query = sqlalchemy.select(PlayerRating.user_id, PlayerRating.rating, PlayerRating.games)
+
+    result = await postgres.get_session().execute(query)
+    return result.all()
+
+
+async def player_ratings_add(
+    changes: typing.List[dict],
+    default_rating: float,
+) -> typing.List[typing.Tuple[int, float, int]]:
+    """Add the rating deltas and the games to the stored ones with a single statement.
+
+    Changes are `{'user_id', 'rating_delta', 'games', 'updated_at'}`, unrated
+    players start from the default rating. Every process only adds its own
+    changes, so none of them overwrites the others. Return `(user_id, rating,
+    games)` as stored, including the changes made by the other processes.
+    """
+    query = sqlalchemy.dialects.postgresql.insert(PlayerRating).values([
+        {
+            'user_id': change['user_id'],
+            'rating': default_rating + change['rating_delta'],
+            'games': change['games'],
+            'updated_at': change['updated_at'],
+        }
+        for change in changes
+    ])
+    query = query.on_conflict_do_update(
+        index_elements=[PlayerRating.user_id],
+        set_={
+            # Inserted rating is the default one moved by the delta
+            'rating': PlayerRating.rating + query.excluded.rating - default_rating,
+            'games': PlayerRating.games + query.excluded.games,
+            'updated_at': query.excluded.updated_at,
+        },
+    ).returning(PlayerRating.user_id, PlayerRating.rating, PlayerRating.games)
+
+    session = postgres.get_session()
+    try:
+        result = await session.execute(query)
+        stored = result.all()
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    return stored
@@ -0,0 +1,95 @@
+import typing
+
+import sqlalchemy
+import sqlalchemy.dialects.postgresql
+from sqlalchemy.ext import asyncio as sqlalchemy_async
+
+from ...core import postgres
+from . import Base
+
+
+COUNTERS = (
+    'games',
+    'wins',
+    'moves',
+    'cards_played',
+    'cards_drawn',
+    'plus_fours_dealt',
+    # Sum of the hand sizes after every move, for the average hand size
+    'hand_size_total',
+    'blue_played',
+    'green_played',
+    'red_played',
+    'yellow_played',
+    'black_played',
+)
+
+
+def _counter_column():
+    return sqlalchemy.Column(sqlalchemy.BigInteger(), nullable=False, server_default='0')
+
+
+class PlayerStats(Base):
+    """Player counters, maintained incrementally by the stats aggregator."""
+
+    __tablename__ = 'player_stats'
+
+    user_id = sqlalchemy.Column(sqlalchemy.Integer(), primary_key=True)
+    games = _counter_column()
+    wins = _counter_column()
+    moves = _counter_column()
+    cards_played = _counter_column()
+    cards_drawn = _counter_column()
+    plus_fours_dealt = _counter_column()
+    hand_size_total = _counter_column()
+    blue_played = _counter_column()
+    green_played = _counter_column()
+    red_played = _counter_column()
+    yellow_played = _counter_column()
+    black_played = _counter_column()
+    updated_at = sqlalchemy.Column(
+        sqlalchemy.DateTime(timezone=True),
+        nullable=False,
+        server_default=sqlalchemy.text('now()'),
+    )
+
+
+async def player_stats_get(user_id: int) -> typing.Optional[PlayerStats]:
+    return await postgres.get_session().get(PlayerStats, user_id)
+
+
+async def player_stats_increment(
+    increments: typing.List[dict],
+    session: typing.Optional[sqlalchemy_async.AsyncSession] = None,
+):
+    """Add the counters to the stored ones with a single statement.
+
+    The caller passing the session is responsible for committing it.
+    """
+    query = sqlalchemy.dialects.postgresql.insert(PlayerStats).values(increments)
+    query = query.on_conflict_do_update(
+        index_elements=[PlayerStats.user_id],
+        set_={
+            **{
+                counter: getattr(PlayerStats, counter) + getattr(query.excluded, counter)
+                for counter in COUNTERS
+            },
+            'updated_at': query.excluded.updated_at,
+        },
+    )
+
+    if session is not None:
+        await session.execute(query)
+        return
+
+    session = postgres.get_session()
+    try:
+        await session.execute(query)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+async def player_stats_reset(session: sqlalchemy_async.AsyncSession):
+    await session.execute(sqlalchemy.delete(PlayerStats))
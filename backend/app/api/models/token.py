@@ -1,3 +1,6 @@
+import datetime
+import typing
+
 import sqlalchemy
 import sqlalchemy.dialects
 import sqlalchemy.orm
@@ -6,6 +9,7 @@ from ...core import postgres
 from ...core import times
 from .. import schemas
 from . import Base
+from .user import User
 
 
 class AccessToken(Base):
@@ -14,6 +18,7 @@ class AccessToken(Base):
     user_id = sqlalchemy.Column(
         sqlalchemy.Integer(),
         sqlalchemy.ForeignKey('users.id'),
+        index=True,
         nullable=False,
     )
     token = sqlalchemy.Column(
@@ -111,8 +116,9 @@ async def token_get_access(access_token: str) -> AccessToken:
 
 
 async def token_get_refresh(refresh_token: str) -> RefreshToken:
-    query = token_access_query().filter(
-        RefreshToken.token == refresh_token and RefreshToken.is_revoked is False,
+    query = token_refresh_query().filter(
+        RefreshToken.token == refresh_token,
+        RefreshToken.is_revoked == False,
     )
 
     session = postgres.get_session()
@@ -176,25 +182,198 @@ async def token_revoke_access(access_token: str):
     await session.commit()
 
 
-async def token_revoke_access_all(client_id: int):
-    revoked_at = times.utcnow()
+def _insert_values_if(
+    model: typing.Type[Base],
+    token: typing.Union[schemas.AccessTokenInternal, schemas.RefreshTokenInternal],
+    condition: sqlalchemy.sql.ColumnElement,
+):
+    """Insert the token only if the condition holds, returning the inserted token."""
+    values = token.dict()
+    columns = model.__table__.c
+
+    return sqlalchemy.insert(model).from_select(
+        list(values),
+        sqlalchemy.select(*(
+            sqlalchemy.literal(value, columns[name].type) for name, value in values.items()
+        )).where(condition),
+    ).returning(model.token)
+
+
+async def token_issue(
+    access_token: typing.Optional[schemas.AccessTokenInternal],
+    refresh_token: schemas.RefreshTokenInternal,
+) -> typing.Tuple[typing.Optional[str], str]:
+    """Store the access token and the refresh token within a single statement.
+
+    The refresh token is stored only if the user has no valid one, otherwise
+    the valid one is returned instead. Stateless access tokens, passed as None,
+    are not stored.
+
+    Return the stored access token and the refresh token of the user.
+    """
+    existing_refresh = sqlalchemy.select(RefreshToken.token).filter(
+        RefreshToken.user_id == refresh_token.user_id,
+        RefreshToken.is_revoked == False,
+    ).limit(1).cte('existing_refresh')
+    issued_refresh = _insert_values_if(
+        RefreshToken, refresh_token, ~existing_refresh.select().exists(),
+    ).cte('issued_refresh')
+
+    columns = [
+        sqlalchemy.func.coalesce(
+            existing_refresh.select().scalar_subquery(),
+            issued_refresh.select().scalar_subquery(),
+        ).label('refresh_token'),
+    ]
+
+    if access_token is not None:
+        stored_access = sqlalchemy.dialects.postgresql.insert(AccessToken).values(
+            **access_token.dict(),
+        ).on_conflict_do_nothing(
+            constraint='uq_accesstokens_token',
+        ).returning(AccessToken.token).cte('stored_access')
+
+        columns.append(stored_access.select().scalar_subquery().label('access_token'))
 
-    query = sqlalchemy.update(AccessToken).where(
-        AccessToken.client_id == client_id,
+    session = postgres.get_session()
+    row = (await session.execute(sqlalchemy.select(*columns))).one()
+    await session.commit()
+
+    return row._mapping.get('access_token'), row.refresh_token
+
+
+async def token_refresh(
+    access_token: str,
+    refresh_token: str,
+    new_access_token: schemas.AccessTokenInternal,
+) -> bool:
+    """Store the new access token if the user tokens are valid, within a single statement."""
+    valid_tokens = sqlalchemy.select(AccessToken.token).join(
+        RefreshToken, RefreshToken.user_id == AccessToken.user_id,
+    ).filter(
+        AccessToken.token == access_token,
+        AccessToken.user_id == new_access_token.user_id,
+        AccessToken.is_revoked == False,
+        RefreshToken.token == refresh_token,
+        RefreshToken.is_revoked == False,
+    )
+    issued_access = _insert_values_if(
+        AccessToken, new_access_token, valid_tokens.exists(),
+    ).cte('issued_access')
+
+    session = postgres.get_session()
+    issued = (await session.execute(issued_access.select())).scalar_one_or_none()
+    await session.commit()
+
+    return issued is not None
+
+
+async def token_refresh_epoch(user_id: int, refresh_token: str) -> typing.Optional[int]:
+    """Return the revocation epoch of the active user if the refresh token is valid."""
+    query = sqlalchemy.select(User.token_epoch).join(
+        RefreshToken, RefreshToken.user_id == User.id,
+    ).filter(
+        User.id == user_id,
+        User.is_active == True,
+        RefreshToken.token == refresh_token,
+        RefreshToken.is_revoked == False,
+    )
+
+    result = await postgres.get_session().execute(query)
+    return result.scalar_one_or_none()
+
+
+def _revoke_access_all_query(user_id: int, revoked_at: datetime.datetime):
+    return sqlalchemy.update(AccessToken).where(
+        AccessToken.user_id == user_id,
+        AccessToken.is_revoked == False,
+    ).values(is_revoked=True, revoked_at=revoked_at)
+
+
+def _revoke_refresh_query(user_id: int, revoked_at: datetime.datetime):
+    return sqlalchemy.update(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        RefreshToken.is_revoked == False,
     ).values(is_revoked=True, revoked_at=revoked_at)
 
+
+async def token_revoke_access_all(user_id: int):
     session = postgres.get_session()
-    await session.execute(query)
+    await session.execute(_revoke_access_all_query(user_id, times.utcnow()))
+    await session.commit()
+
+
+async def token_revoke_refresh(user_id: int):
+    session = postgres.get_session()
+    await session.execute(_revoke_refresh_query(user_id, times.utcnow()))
     await session.commit()
 
 
-async def token_revoke_refresh(client_id: int):
+async def token_revoke_all(user_id: int):
+    """Revoke the refresh token and all the access tokens of the user at once."""
     revoked_at = times.utcnow()
 
-    query = sqlalchemy.update(RefreshToken).where(
-        RefreshToken.client_id == client_id,
-    ).values(is_revoked=True, revoked_at=revoked_at)
+    session = postgres.get_session()
+    await session.execute(_revoke_refresh_query(user_id, revoked_at))
+    await session.execute(_revoke_access_all_query(user_id, revoked_at))
+    await session.commit()
 
+
+async def _token_sweep_page(
+    model: typing.Type[Base],
+    sweepable: sqlalchemy.sql.ColumnElement,
+    after_token: str,
+    limit: int,
+) -> typing.Tuple[typing.Optional[str], int]:
     session = postgres.get_session()
-    await session.execute(query)
+
+    page = (await session.execute(
+        sqlalchemy.select(model.token).filter(
+            model.token > after_token,
+        ).order_by(model.token).limit(limit),
+    )).scalars().all()
+
+    if not page:
+        return None, 0
+
+    result = await session.execute(
+        sqlalchemy.delete(model).where(
+            model.token.in_(page),
+            sweepable,
+        ).execution_options(synchronize_session=False),
+    )
     await session.commit()
+
+    return page[-1], result.rowcount
+
+
+async def token_access_sweep(
+    after_token: str,
+    limit: int,
+    now: datetime.datetime,
+) -> typing.Tuple[typing.Optional[str], int]:
+    """Delete expired and revoked tokens among the page of tokens following the token.
+
+    Return the last token of the page to continue after, None past the last
+    page, and the amount of deleted tokens.
+    """
+    expires_at = AccessToken.issued_at + (
+        AccessToken.expires_in * sqlalchemy.literal_column("interval '1 second'")
+    )
+
+    return await _token_sweep_page(
+        AccessToken,
+        sqlalchemy.or_(AccessToken.is_revoked == True, expires_at < now),
+        after_token,
+        limit,
+    )
+
+
+async def token_refresh_sweep(
+    after_token: str,
+    limit: int,
+) -> typing.Tuple[typing.Optional[str], int]:
+    """Delete revoked tokens among the page of tokens following the token."""
+    return await _token_sweep_page(
+        RefreshToken, RefreshToken.is_revoked == True, after_token, limit,
+    )
@@ -1,3 +1,5 @@
+import contextlib
+import contextvars
 import logging
 import typing
 
@@ -32,58 +34,162 @@ class User(Base):
     phone = sqlalchemy.Column(sqlalchemy.Text(), nullable=False, unique=True)
     password = sqlalchemy.Column(sqlalchemy.Text(), nullable=False)
     is_active = sqlalchemy.Column(sqlalchemy.Boolean(), default=True, nullable=False)
+    # Stateless access tokens issued before the current epoch are revoked
+    token_epoch = sqlalchemy.Column(
+        sqlalchemy.Integer(),
+        nullable=False,
+        server_default='0',
+    )
+
+
+# Users already loaded within the request, keyed by ('id', id) and ('email', email)
+_identity_map: contextvars.ContextVar[typing.Optional[dict]] = contextvars.ContextVar(
+    'users_identity_map', default=None,
+)
+
+
+@contextlib.contextmanager
+def user_identity_map():
+    """Scope within which a loaded user is returned again without a query.
+
+    Only the plain rows are kept, so the users are not bound to the session
+    and hold no ORM state. Writes to a user drop it from the map.
+    """
+    token = _identity_map.set({})
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+def _remember_user(user: sqlalchemy.engine.Row):
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map[('id', user.id)] = user
+        identity_map[('email', user.email)] = user
+
+
+def _forget_user(user_id: int):
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return
+
+    user = identity_map.pop(('id', user_id), None)
+    if user is not None:
+        identity_map.pop(('email', user.email), None)
+
+
+def _lookup_user(key: typing.Tuple[str, typing.Any]) -> typing.Optional[sqlalchemy.engine.Row]:
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return None
+
+    return identity_map.get(key)
 
 
 def user_query():
     return sqlalchemy.select(User)
 
 
+def user_rows_query():
+    """Select the user columns only, rows come out without the ORM state."""
+    return sqlalchemy.select(*User.__table__.columns)
+
+
 async def user_create(
     user: schemas.UserRegistration,
-):
-    password_hash = security.compute_password_hash(user.password)
+) -> dict:
+    password_hash = await security.password_hasher.hash(user.password)
     user_data = user.dict()
     user_data['password'] = password_hash
 
-    user = User(
+    # Created row is returned by the insert itself, no refresh query
+    query = sqlalchemy.insert(User).values(
         **user_data,
-    )
+    ).returning(*User.__table__.columns)
 
     session = postgres.get_session()
-    async with session.begin():
-        try:
-            session.add(user)
-            await session.commit()
+    try:
+        result = await session.execute(query)
+        created_user = result.one()
+        await session.commit()
 
-        except sqlalchemy.exc.IntegrityError as e:
-            await session.rollback()
-            # check for subclass of IntegrityConstraintViolationError
-            # 23 stands for sqlstate = '23000'
-            if e.orig.sqlstate.startswith('23'):
-                raise UserAlreadyExists from e
-            raise e
+    except sqlalchemy.exc.IntegrityError as e:
+        await session.rollback()
+        # check for subclass of IntegrityConstraintViolationError
+        # 23 stands for sqlstate = '23000'
+        if e.orig.sqlstate.startswith('23'):
+            raise UserAlreadyExists from e
+        raise e
 
-    await session.refresh(user)
-    return user.__dict__
+    return dict(created_user._mapping)
 
 
 async def user_get(
     user_id: int,
-) -> typing.Optional[User]:
-    query = user_query().filter(
+) -> typing.Optional[sqlalchemy.engine.Row]:
+    user = _lookup_user(('id', user_id))
+    if user is not None:
+        return user
+
+    query = user_rows_query().filter(
         User.id == user_id,
         User.is_active == True,
     )
 
     result = await postgres.get_session().execute(query)
-    user = result.scalars().first()
+    user = result.first()
 
     if not user:
         return None
 
+    _remember_user(user)
     return user
 
 
+async def user_deactivate(user_id: int):
+    _forget_user(user_id)
+
+    query = sqlalchemy.update(User).where(
+        User.id == user_id,
+    ).values(is_active=False)
+
+    session = postgres.get_session()
+    await session.execute(query)
+    await session.commit()
+
+
+async def user_token_epoch_get(user_id: int) -> typing.Optional[int]:
+    query = sqlalchemy.select(User.token_epoch).where(User.id == user_id)
+
+    result = await postgres.get_session().execute(query)
+    return result.scalar_one_or_none()
+
+
+async def user_token_epoch_bump(user_id: int) -> typing.Optional[int]:
+    _forget_user(user_id)
+
+    query = sqlalchemy.update(User).where(
+        User.id == user_id,
+    ).values(
+        token_epoch=User.token_epoch + 1,
+    ).returning(User.token_epoch)
+
+    session = postgres.get_session()
+    result = await session.execute(query)
+    await session.commit()
+
+    return result.scalar_one_or_none()
+
+
+async def user_token_epochs_list() -> typing.List[typing.Tuple[int, int]]:
+    """Return epochs of the users who ever had their tokens revoked."""
+    query = sqlalchemy.select(User.id, User.token_epoch).where(User.token_epoch > 0)
+
+    result = await postgres.get_session().execute(query)
+    return [tuple(row) for row in result]
+
+
 async def user_delete_all():
     await postgres.get_session().execute(sqlalchemy.delete(User))
 
@@ -148,19 +254,23 @@ async def user_list():
 #
 #
 #
-async def user_get_by_email(email: str):
-    query = user_query().where(
-        User.email == email.lower(),
+async def user_get_by_email(email: str) -> typing.Optional[dict]:
+    email = email.lower()
+
+    user = _lookup_user(('email', email))
+    if user is not None:
+        return dict(user._mapping)
+
+    query = user_rows_query().where(
+        User.email == email,
         User.is_active == True,
     )
 
-    users = await postgres.get_session().execute(query)
-
-    (user,) = users.first()
+    result = await postgres.get_session().execute(query)
+    user = result.first()
 
     if not user:
         return None
 
-    return {
-        **user.__dict__,
-    }
+    _remember_user(user)
+    return dict(user._mapping)
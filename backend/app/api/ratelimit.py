@@ -0,0 +1,208 @@
+import asyncio
+import dataclasses
+import logging
+import time
+import typing
+
+from ..core import conf
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Raises when the bucket of a rate limited key is empty."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'Rate limited, retry after {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    capacity: float
+    refill_per_second: float
+
+
+class TokenBucket:
+    """Bucket refilled lazily on every take, no timers involved.
+
+    >>> bucket = TokenBucket(capacity=2, now=0)
+    >>> bucket.take(2, 1, now=0), bucket.take(2, 1, now=0), bucket.take(2, 1, now=0)
+    (0, 0, 1.0)
+    >>> bucket.take(2, 1, now=1.5)
+    0
+    >>> bucket.full_at
+    3.0
+    """
+
+    __slots__ = ('tokens', 'updated_at', 'full_at')
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated_at = now
+        self.full_at = now
+
+    def take(self, capacity: float, refill_per_second: float, now: float) -> float:
+        """Take a token, return 0 or the seconds to wait for the next one."""
+        tokens = min(capacity, self.tokens + (now - self.updated_at) * refill_per_second)
+        self.updated_at = now
+
+        if tokens < 1:
+            self.tokens = tokens
+            return (1 - tokens) / refill_per_second
+
+        self.tokens = tokens - 1
+        self.full_at = now + (capacity - self.tokens) / refill_per_second
+        return 0
+
+
+class LocalBackend:
+    """Buckets of the current process, full buckets are swept away."""
+
+    def __init__(self):
+        self._buckets: typing.Dict[str, TokenBucket] = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(capacity, now)
+
+        return bucket.take(capacity, refill_per_second, now)
+
+    def sweep(self, now: typing.Optional[float] = None) -> int:
+        """Drop the buckets refilled to the capacity, they equal the missing ones."""
+        if now is None:
+            now = time.monotonic()
+
+        idle = [key for key, bucket in self._buckets.items() if bucket.full_at <= now]
+        for key in idle:
+            del self._buckets[key]
+
+        return len(idle)
+
+
+# Same refill as TokenBucket, atomically on the server shared by the workers
+_REDIS_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_second = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_per_second)
+
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / refill_per_second
+else
+    tokens = tokens - 1
+end
+
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill_per_second) + 1)
+
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by the workers, so that the limits hold across them.
+
+    Idle buckets expire on their own once refilled.
+    """
+
+    def __init__(self, uri: str, prefix: str = 'ratelimit:'):
+        self.uri = uri
+        self.prefix = prefix
+        self._redis = None
+        self._script_sha: typing.Optional[str] = None
+
+    async def connect(self):
+        import aioredis
+
+        self._redis = await aioredis.create_redis_pool(self.uri)
+        self._script_sha = await self._redis.script_load(_REDIS_TAKE_SCRIPT)
+
+    async def close(self):
+        if self._redis is not None:
+            self._redis.close()
+            await self._redis.wait_closed()
+            self._redis = None
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        wait = await self._redis.evalsha(
+            self._script_sha,
+            keys=[self.prefix + key],
+            args=[capacity, refill_per_second, time.time()],
+        )
+        return float(wait)
+
+    def sweep(self, now: typing.Optional[float] = None) -> int:
+        return 0
+
+
+class RateLimiter:
+    """Token buckets per rule and key, e.g. per client IP and per account."""
+
+    def __init__(
+        self,
+        backend: typing.Union[LocalBackend, RedisBackend],
+        rules: typing.Dict[str, Rule],
+        sweep_interval_seconds: float,
+    ):
+        self.backend = backend
+        self.rules = rules
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+    async def hit(self, **keys: typing.Optional[str]):
+        """Take a token for every given key of the rules, missing keys are skipped."""
+        retry_after = 0
+
+        for rule_name, key in keys.items():
+            if key is None:
+                continue
+
+            rule = self.rules[rule_name]
+            retry_after = max(retry_after, await self.backend.take(
+                f'{rule_name}:{key}', rule.capacity, rule.refill_per_second,
+            ))
+
+        if retry_after:
+            raise RateLimited(retry_after)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            swept = self.backend.sweep()
+            if swept:
+                logger.debug(f'Swept {swept} idle rate limit buckets')
+
+
+def _build_backend(name: str) -> typing.Union[LocalBackend, RedisBackend]:
+    if name == 'redis':
+        return RedisBackend(conf.redis.uri)
+
+    return LocalBackend()
+
+
+credentials = RateLimiter(
+    _build_backend(conf.ratelimit.backend),
+    rules={
+        'ip': Rule(**conf.ratelimit.ip),
+        'email': Rule(**conf.ratelimit.email),
+    },
+    sweep_interval_seconds=conf.ratelimit.sweep_interval_seconds,
+)
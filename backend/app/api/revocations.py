@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+import typing
+
+from ..core import conf
+from ..core import postgres
+from . import cache
+from .services import epochs
+
+
+logger = logging.getLogger(__name__)
+
+
+def token_key(token: str) -> str:
+    """Digest identifying the token, the token itself never leaves the worker."""
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    """Set membership with false positives only, in a fixed amount of memory.
+
+    >>> bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    >>> bloom.add('a')
+    >>> 'a' in bloom, 'b' in bloom
+    (True, False)
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(math.ceil(self.size / 8))
+
+    def _positions(self, key: str) -> typing.Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+
+        # Double hashing derives the positions from two hashes
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevokedTokens:
+    """Keys of the revoked tokens until the tokens would have expired anyway.
+
+    The optional Bloom filter answers for the tokens never revoked without
+    the set lookup, it is rebuilt on sweep to forget the expired keys.
+
+    >>> revoked = RevokedTokens()
+    >>> revoked.add('key', expires_at=10)
+    >>> 'key' in revoked, 'other' in revoked
+    (True, False)
+    >>> revoked.sweep(now=11)
+    1
+    >>> 'key' in revoked
+    False
+    """
+
+    def __init__(
+        self,
+        bloom_capacity: typing.Optional[int] = None,
+        bloom_error_rate: float = 0.001,
+    ):
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self._expires_at: typing.Dict[str, float] = {}
+        self._bloom = self._build_bloom()
+
+    def __len__(self):
+        return len(self._expires_at)
+
+    def _build_bloom(self) -> typing.Optional[BloomFilter]:
+        if not self.bloom_capacity:
+            return None
+
+        bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        for key in self._expires_at:
+            bloom.add(key)
+
+        return bloom
+
+    def add(self, key: str, expires_at: float):
+        self._expires_at[key] = max(expires_at, self._expires_at.get(key, 0))
+        if self._bloom is not None:
+            self._bloom.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        if self._bloom is not None and key not in self._bloom:
+            return False
+
+        return key in self._expires_at
+
+    def sweep(self, now: typing.Optional[float] = None) -> int:
+        if now is None:
+            now = time.time()
+
+        expired = [key for key, expires_at in self._expires_at.items() if expires_at <= now]
+        for key in expired:
+            del self._expires_at[key]
+
+        if expired:
+            self._bloom = self._build_bloom()
+
+        return len(expired)
+
+
+OnSubscribed = typing.Optional[typing.Callable[[], typing.Awaitable[None]]]
+
+
+class LocalChannel:
+    """Channel delivering the messages within the process, for a single worker and tests."""
+
+    def __init__(self):
+        self._subscribers: typing.List[asyncio.Queue] = []
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, message: dict):
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+    async def revoked_tokens(self) -> typing.List[typing.Tuple[str, float]]:
+        # Nothing is lost within the process, the revoked set is complete
+        return []
+
+    async def listen(self, on_subscribed: OnSubscribed = None) -> typing.AsyncIterator[dict]:
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            if on_subscribed is not None:
+                await on_subscribed()
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
+
+
+class RedisChannel:
+    """Channel over redis pub/sub, delivering the messages to every worker.
+
+    Pub/sub does not keep the messages, so the revoked tokens are also kept
+    in a sorted set scored by the expiry time. Workers which lost the
+    subscription read them back from there.
+    """
+
+    def __init__(self, uri: str, name: str):
+        self.uri = uri
+        self.name = name
+        self.tokens_key = f'{name}:tokens'
+        self._redis = None
+
+    async def connect(self):
+        import aioredis
+
+        self._redis = await aioredis.create_redis_pool(self.uri)
+
+    async def close(self):
+        if self._redis is not None:
+            self._redis.close()
+            await self._redis.wait_closed()
+            self._redis = None
+
+    async def publish(self, message: dict):
+        if message['type'] == 'token':
+            await self._redis.zadd(self.tokens_key, message['expires_at'], message['key'])
+            await self._redis.zremrangebyscore(self.tokens_key, max=time.time())
+
+        await self._redis.publish(self.name, json.dumps(message))
+
+    async def revoked_tokens(self) -> typing.List[typing.Tuple[str, float]]:
+        return await self._redis.zrangebyscore(
+            self.tokens_key, min=time.time(), withscores=True, encoding='utf-8',
+        )
+
+    async def listen(self, on_subscribed: OnSubscribed = None) -> typing.AsyncIterator[dict]:
+        # Subscription holds its connection, keep it apart from the pool
+        import aioredis
+
+        connection = await aioredis.create_redis(self.uri)
+        try:
+            (channel,) = await connection.subscribe(self.name)
+            if on_subscribed is not None:
+                await on_subscribed()
+            async for data in channel.iter():
+                yield json.loads(data)
+        finally:
+            connection.close()
+            await connection.wait_closed()
+
+
+class RevocationBroadcast:
+    """Spreads the revocations to every worker over the channel.
+
+    Revoked access tokens are kept in the revoked set checked on every
+    request. Revocations of all the user tokens update the user epoch and
+    invalidate the cached validations of the user.
+
+    A failed subscription is made again after a growing interval. Messages
+    published meanwhile are missed, so once subscribed the revoked tokens
+    and the epochs are loaded again and the cached validations dropped.
+    """
+
+    def __init__(
+        self,
+        channel: typing.Union[LocalChannel, RedisChannel],
+        revoked: RevokedTokens,
+        sweep_interval_seconds: float,
+        reconnect_interval_seconds: float = 1,
+        reconnect_max_interval_seconds: float = 30,
+    ):
+        self.channel = channel
+        self.revoked = revoked
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.reconnect_interval_seconds = reconnect_interval_seconds
+        self.reconnect_max_interval_seconds = reconnect_max_interval_seconds
+        self._retry_interval = reconnect_interval_seconds
+
+    def is_revoked(self, token: str) -> bool:
+        return token_key(token) in self.revoked
+
+    def apply(self, message: dict):
+        cache.auth.invalidate_user(message['user_id'])
+
+        if message['type'] == 'token':
+            self.revoked.add(message['key'], message['expires_at'])
+        elif message.get('epoch') is not None:
+            epochs.epochs.set(message['user_id'], message['epoch'])
+
+    async def _publish(self, message: dict):
+        # Applied at once, not to wait for the own message to come back
+        self.apply(message)
+        try:
+            await self.channel.publish(message)
+        except Exception as e:
+            logger.exception(f'Revocation publish failed: {e!r}')
+
+    async def revoke_token(self, token: str, user_id: int, expires_at: float):
+        await self._publish({
+            'type': 'token',
+            'key': token_key(token),
+            'user_id': user_id,
+            'expires_at': expires_at,
+        })
+
+    async def revoke_user(self, user_id: int, epoch: typing.Optional[int] = None):
+        await self._publish({'type': 'user', 'user_id': user_id, 'epoch': epoch})
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            self.revoked.sweep()
+
+    async def resync(self):
+        """Catch up with the revocations published while not subscribed."""
+        for key, expires_at in await self.channel.revoked_tokens():
+            self.revoked.add(key, expires_at)
+
+        if conf.security.stateless_tokens:
+            try:
+                await epochs.epochs.load()
+            finally:
+                await postgres.remove_session()
+
+        cache.auth.clear()
+
+    async def _on_subscribed(self):
+        await self.resync()
+        # Caught up, the next failure is retried at the initial interval
+        self._retry_interval = self.reconnect_interval_seconds
+
+    async def _listen(self):
+        async for message in self.channel.listen(on_subscribed=self._on_subscribed):
+            try:
+                self.apply(message)
+            except Exception as e:
+                logger.exception(f'Invalid revocation message {message!r}: {e!r}')
+
+    async def run(self):
+        sweep_task = asyncio.create_task(self._sweep())
+        try:
+            while True:
+                try:
+                    await self._listen()
+                    logger.warning('Revocation channel subscription has ended')
+                except Exception as e:
+                    logger.exception(f'Revocation channel failed: {e!r}')
+
+                await asyncio.sleep(self._retry_interval)
+                self._retry_interval = min(
+                    self._retry_interval * 2, self.reconnect_max_interval_seconds,
+                )
+        finally:
+            sweep_task.cancel()
+
+
+def _build_channel(name: str) -> typing.Union[LocalChannel, RedisChannel]:
+    if name == 'redis':
+        return RedisChannel(conf.redis.uri, conf.revocations.redis_channel)
+
+    return LocalChannel()
+
+
+broadcast = RevocationBroadcast(
+    _build_channel(conf.revocations.channel),
+    RevokedTokens(
+        bloom_capacity=conf.revocations.bloom_capacity,
+        bloom_error_rate=conf.revocations.bloom_error_rate,
+    ),
+    sweep_interval_seconds=conf.revocations.sweep_interval_seconds,
+    reconnect_interval_seconds=conf.revocations.reconnect_interval_seconds,
+    reconnect_max_interval_seconds=conf.revocations.reconnect_max_interval_seconds,
+)
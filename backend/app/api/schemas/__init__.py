@@ -1,6 +1,18 @@
 from .dummy import DummyList  # noqa: F401
 from .dummy import Pong  # noqa: F401
+from .game import GameTicket  # noqa: F401
+from .leaderboard import LeaderboardEntry  # noqa: F401
+from .leaderboard import LeaderboardPage  # noqa: F401
+from .leaderboard import LeaderboardPeriod  # noqa: F401
+from .lobby import LobbyGame  # noqa: F401
+from .lobby import LobbyGameStatus  # noqa: F401
+from .lobby import LobbyPage  # noqa: F401
+from .matchmaking import MatchmakingState  # noqa: F401
+from .matchmaking import MatchmakingStats  # noqa: F401
+from .matchmaking import MatchmakingStatus  # noqa: F401
+from .stats import PlayerStatsGet  # noqa: F401
 from .token import AccessTokenInternal  # noqa: F401
+from .token import PasswordHashingStats  # noqa: F401
 from .token import RefreshTokenInternal  # noqa: F401
 from .token import TokenGet  # noqa: F401
 from .token import TokenTypeHint  # noqa: F401
@@ -0,0 +1,9 @@
+import pydantic
+
+
+class GameTicket(pydantic.BaseModel):
+    ticket: pydantic.StrictStr
+    expires_in: pydantic.StrictInt
+
+    class Config:
+        extra = 'forbid'
@@ -0,0 +1,22 @@
+import enum
+import typing
+
+import pydantic
+
+
+class LeaderboardPeriod(str, enum.Enum):
+    ALL = 'all'
+    MONTH = 'month'
+
+
+class LeaderboardEntry(pydantic.BaseModel):
+    rank: pydantic.StrictInt
+    user_id: pydantic.StrictInt
+    # Rating for the all time leaderboard, wins for the monthly one
+    score: float
+
+
+class LeaderboardPage(pydantic.BaseModel):
+    period: LeaderboardPeriod
+    total: pydantic.StrictInt
+    entries: typing.List[LeaderboardEntry]
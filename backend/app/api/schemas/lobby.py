@@ -0,0 +1,23 @@
+import enum
+import typing
+
+import pydantic
+
+
+class LobbyGameStatus(str, enum.Enum):
+    OPEN = 'open'
+    RUNNING = 'running'
+
+
+class LobbyGame(pydantic.BaseModel):
+    match_id: pydantic.StrictStr
+    players: pydantic.StrictInt
+    max_players: pydantic.StrictInt
+    status: LobbyGameStatus
+
+
+class LobbyPage(pydantic.BaseModel):
+    version: pydantic.StrictInt
+    page: pydantic.StrictInt
+    pages: pydantic.StrictInt
+    games: typing.List[LobbyGame]
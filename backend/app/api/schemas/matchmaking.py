@@ -0,0 +1,31 @@
+import enum
+import typing
+
+import pydantic
+
+
+class MatchmakingState(str, enum.Enum):
+    IDLE = 'idle'
+    QUEUED = 'queued'
+    MATCHED = 'matched'
+
+    def __str__(self):
+        return str(self.value)
+
+
+class MatchmakingStatus(pydantic.BaseModel):
+    state: MatchmakingState
+    match_id: typing.Optional[pydantic.StrictStr] = None
+
+    class Config:
+        extra = 'forbid'
+
+
+class MatchmakingStats(pydantic.BaseModel):
+    waiting: pydantic.StrictInt
+    queue_time_p50: typing.Optional[float] = None
+    queue_time_p90: typing.Optional[float] = None
+    queue_time_p99: typing.Optional[float] = None
+
+    class Config:
+        extra = 'forbid'
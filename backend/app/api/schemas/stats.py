@@ -0,0 +1,17 @@
+import typing
+
+import pydantic
+
+from ...uno import enums
+
+
+class PlayerStatsGet(pydantic.BaseModel):
+    user_id: pydantic.StrictInt
+    games: pydantic.StrictInt
+    wins: pydantic.StrictInt
+    moves: pydantic.StrictInt
+    cards_played: pydantic.StrictInt
+    cards_drawn: pydantic.StrictInt
+    plus_fours_dealt: pydantic.StrictInt
+    average_hand_size: typing.Optional[float]
+    most_played_color: typing.Optional[enums.CardColors]
@@ -52,3 +52,14 @@ class AccessTokenInternal(TokenBase, TokenInternalInfo):
 class RefreshTokenInternal(TokenBase, TokenInternalInfo):
     class Config:
         extra = 'forbid'
+
+
+class PasswordHashingStats(pydantic.BaseModel):
+    pending: pydantic.StrictInt
+    queue_wait_p50: typing.Optional[float] = None
+    queue_wait_p99: typing.Optional[float] = None
+    hash_time_p50: typing.Optional[float] = None
+    hash_time_p99: typing.Optional[float] = None
+
+    class Config:
+        extra = 'forbid'
@@ -45,6 +45,7 @@ class UserCurrent(UserGet):
 
     class Config:
         extra = 'ignore'
+        orm_mode = True
 
 
 class UserCurrentGet(UserGet):
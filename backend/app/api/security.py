@@ -1,8 +1,13 @@
+import asyncio
 import base64
+import collections
+import concurrent.futures
+import functools
 import hashlib
 import hmac
 import json
 import secrets
+import time
 import typing
 
 import bcrypt
@@ -23,6 +28,10 @@ oauth2_scheme = fastapi.security.OAuth2PasswordBearer(
 _BCRYPT_SALT_ROUNDS = 12
 _BCRYPT_SALT_PREFIX = b'2b'
 
+# Single key, or keys ordered from the current signing key to the oldest accepted one
+SecretKey = typing.Union[str, typing.Sequence[str]]
+SECRET_KEYS = (conf.security.secret_key, *conf.security.previous_secret_keys)
+
 
 class InvalidToken(Exception):
     """Raises if invalid token was provided."""
@@ -32,6 +41,10 @@ class InvalidData(Exception):
     """Raises if invalid data was provided."""
 
 
+class PasswordHasherBusy(Exception):
+    """Raises when too many passwords are already waiting to be hashed."""
+
+
 def compute_password_hash(password: str) -> str:
     """Compute hash for provided password."""
     return bcrypt.hashpw(
@@ -51,15 +64,103 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+def _percentile(samples: typing.Iterable[float], percentile: float) -> typing.Optional[float]:
+    samples = sorted(samples)
+    if not samples:
+        return None
+
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded thread pool.
+
+    Bcrypt takes a good fraction of a second of CPU, run in the event loop it
+    would stall every request and websocket of the worker. Bcrypt releases
+    the GIL while hashing, so threads are enough. Calls beyond the pending
+    limit are rejected rather than queued without bound.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, samples: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+
+        # Seconds spent waiting for a free worker and hashing, recent calls only
+        self.queue_waits = collections.deque(maxlen=samples)
+        self.hash_times = collections.deque(maxlen=samples)
+
+        self._executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def _timed(self, enqueued_at: float, fn: typing.Callable, *args):
+        started_at = time.perf_counter()
+        self.queue_waits.append(started_at - enqueued_at)
+        try:
+            return fn(*args)
+        finally:
+            self.hash_times.append(time.perf_counter() - started_at)
+
+    async def _run(self, fn: typing.Callable, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy(f'{self.pending} passwords are already pending')
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='password-hasher',
+            )
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, time.perf_counter(), fn, *args,
+            )
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(compute_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def queue_wait_percentile(self, percentile: float) -> typing.Optional[float]:
+        return _percentile(self.queue_waits, percentile)
+
+    def hash_time_percentile(self, percentile: float) -> typing.Optional[float]:
+        return _percentile(self.hash_times, percentile)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=conf.security.password_hasher_workers,
+    max_pending=conf.security.password_hasher_max_pending,
+)
+
+
 def gen_random_token(nbytes: int = 32) -> str:
     """Generate URL-safe string with n bytes of randomness."""
     return secrets.token_urlsafe(nbytes)
 
 
-def get_signer(secret_key: str, salt: str):
-    """Return preconfigured signer with sane defaults."""
+def _secret_keys(secret_key: SecretKey) -> typing.Tuple[str, ...]:
+    if isinstance(secret_key, str):
+        return (secret_key,)
+
+    return tuple(secret_key)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_signer(
+    secret_keys: typing.Tuple[str, ...],
+    salt: str,
+) -> itsdangerous.URLSafeTimedSerializer:
     return itsdangerous.URLSafeTimedSerializer(
-        secret_key,
+        # Signer takes the last key to sign and tries all of them to verify
+        list(reversed(secret_keys)),
         salt=salt,
         signer_kwargs={
             'key_derivation': 'hmac',
@@ -68,9 +169,19 @@ def get_signer(secret_key: str, salt: str):
     )
 
 
+def get_signer(secret_key: SecretKey, salt: str) -> itsdangerous.URLSafeTimedSerializer:
+    """Return preconfigured signer with sane defaults.
+
+    Signers are built once per keys and salt. The first key signs, the rest
+    are still accepted, so that the keys can rotate without invalidating the
+    issued tokens.
+    """
+    return _build_signer(_secret_keys(secret_key), salt)
+
+
 def sign_token(
     token_data: dict,
-    secret_key: str,
+    secret_key: SecretKey,
     salt: str = 'token',
 ) -> str:
     """Sign provided token data."""
@@ -81,7 +192,7 @@ def sign_token(
 
 def unsign_token(
     token: str,
-    secret_key: str,
+    secret_key: SecretKey,
     expires_in: int,
     salt: str = 'token',
 ) -> dict:
@@ -93,9 +204,21 @@ def unsign_token(
         raise InvalidToken
 
 
+def extract_access_token_data(
+    token: str,
+    secret_key: SecretKey = SECRET_KEYS,
+    expires_in: int = conf.security.token_expires_in_seconds,
+) -> typing.Optional[dict]:
+    """Return payload of the access token if its signature is valid and not expired."""
+    try:
+        return unsign_token(token, secret_key, expires_in)
+    except InvalidToken:
+        return None
+
+
 def extract_client_id_from_signed_token(
     token: str,
-    secret_key: str = conf.security.secret_key,
+    secret_key: SecretKey = SECRET_KEYS,
     expires_in: int = conf.security.token_expires_in_seconds,
 ) -> typing.Optional[int]:
     """Extract client id from token, preliminarily validating the token signature."""
@@ -107,13 +230,27 @@ def extract_client_id_from_signed_token(
 
 def issue_access_token(
     user_id: int,
-    secret_key: str = conf.security.secret_key,
+    secret_key: SecretKey = SECRET_KEYS,
     expires_in: int = conf.security.token_expires_in_seconds,
+    epoch: typing.Optional[int] = None,
 ) -> schemas.AccessTokenInternal:
-    """Issue access token."""
+    """Issue access token.
+
+    Provided revocation epoch of the user makes the token stateless: it carries
+    the issue time and the epoch, and is verified without being stored. A random
+    id tells apart the stateless tokens issued within the same second, so that
+    one of them can be revoked alone.
+    """
     issued_at = times.utcnow()
+    token_data = {'cid': user_id}
+
+    if epoch is not None:
+        token_data['iat'] = int(issued_at.timestamp())
+        token_data['ep'] = epoch
+        token_data['jti'] = secrets.token_urlsafe(8)
+
     signed_token = sign_token(
-        token_data={'cid': user_id},
+        token_data=token_data,
         secret_key=secret_key,
     )
 
@@ -127,6 +264,37 @@ def issue_access_token(
     )
 
 
+def issue_ws_ticket(
+    user_id: int,
+    match_id: str,
+    secret_key: SecretKey = SECRET_KEYS,
+) -> str:
+    """Issue short-lived ticket authenticating the game websocket handshake."""
+    return sign_token(
+        token_data={'cid': user_id, 'mid': match_id},
+        secret_key=secret_key,
+        salt='ws-ticket',
+    )
+
+
+def extract_client_id_from_ws_ticket(
+    ticket: str,
+    match_id: str,
+    secret_key: SecretKey = SECRET_KEYS,
+    expires_in: int = conf.security.ws_ticket_expires_in_seconds,
+) -> typing.Optional[int]:
+    """Extract client id from the websocket ticket issued for the match."""
+    try:
+        ticket_data = unsign_token(ticket, secret_key, expires_in, salt='ws-ticket')
+    except InvalidToken:
+        return None
+
+    if ticket_data.get('mid') != match_id:
+        return None
+
+    return ticket_data.get('cid')
+
+
 def issue_refresh_token(user_id: int) -> schemas.RefreshTokenInternal:
     """Issue refresh token."""
 
@@ -163,23 +331,44 @@ def sign_payload(
     return signed_payload, signature
 
 
-def encrypt(payload: dict, secret_key: str) -> bytes:
-    secret_key_hashed = base64.urlsafe_b64encode(
-        hashlib.sha256(secret_key.encode()).digest(),
-    )
-    return cryptography.fernet.Fernet(secret_key_hashed).encrypt(
-        itsdangerous.Serializer(secret_key_hashed).dumps(
-            payload,
-        ).encode('utf-8'),
+def _hash_secret_key(secret_key: str) -> bytes:
+    return base64.urlsafe_b64encode(hashlib.sha256(secret_key.encode()).digest())
+
+
+@functools.lru_cache(maxsize=None)
+def _build_cipher(
+    secret_keys: typing.Tuple[str, ...],
+) -> typing.Tuple[cryptography.fernet.MultiFernet, itsdangerous.Serializer]:
+    hashed_keys = [_hash_secret_key(secret_key) for secret_key in secret_keys]
+
+    return (
+        cryptography.fernet.MultiFernet([
+            cryptography.fernet.Fernet(hashed_key) for hashed_key in hashed_keys
+        ]),
+        itsdangerous.Serializer(list(reversed(hashed_keys))),
     )
 
 
-def decrypt(data: bytes, secret_key: str, ttl: typing.Optional[int] = None) -> typing.Dict:
+def get_cipher(
+    secret_key: SecretKey,
+) -> typing.Tuple[cryptography.fernet.MultiFernet, itsdangerous.Serializer]:
+    """Return cipher and serializer built once per keys, the first key encrypts."""
+    return _build_cipher(_secret_keys(secret_key))
+
+
+def encrypt(payload: dict, secret_key: SecretKey) -> bytes:
+    fernet, serializer = get_cipher(secret_key)
+
+    return fernet.encrypt(serializer.dumps(payload).encode('utf-8'))
+
+
+def decrypt(
+    data: bytes,
+    secret_key: SecretKey,
+    ttl: typing.Optional[int] = None,
+) -> typing.Dict:
+    fernet, serializer = get_cipher(secret_key)
     try:
-        secret_key_hashed = base64.urlsafe_b64encode(
-            hashlib.sha256(secret_key.encode()).digest(),
-        )
-        data = cryptography.fernet.Fernet(secret_key_hashed).decrypt(data, ttl)
-        return itsdangerous.Serializer(secret_key_hashed).loads(data)
+        return serializer.loads(fernet.decrypt(data, ttl))
     except (cryptography.fernet.InvalidToken, itsdangerous.BadData):
         raise InvalidData
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import typing
+
+from ...core import conf
+from ...core import postgres
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenEpochs:
+    """Revocation epochs of the users, kept in memory for stateless tokens.
+
+    Access tokens carry the epoch of their user at the issue time, bumping the
+    epoch revokes every token issued before. Only the users who ever had their
+    tokens revoked are present, the rest are at the epoch 0.
+
+    >>> epochs = TokenEpochs(reload_interval_seconds=30)
+    >>> epochs.is_revoked(1, 0)
+    False
+    >>> epochs.set(1, 2)
+    >>> epochs.is_revoked(1, 1), epochs.is_revoked(1, 2)
+    (True, False)
+    >>> epochs.set(1, 1)
+    >>> epochs.get(1)
+    2
+    """
+
+    def __init__(self, reload_interval_seconds: float):
+        self.reload_interval_seconds = reload_interval_seconds
+        self._epochs: typing.Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._epochs)
+
+    def get(self, user_id: int) -> int:
+        return self._epochs.get(user_id, 0)
+
+    def set(self, user_id: int, epoch: int):
+        # Epochs only grow, a stale reload must not resurrect revoked tokens
+        if epoch > self.get(user_id):
+            self._epochs[user_id] = epoch
+
+    def is_revoked(self, user_id: int, epoch: int) -> bool:
+        return epoch < self.get(user_id)
+
+    async def fetch(self, user_id: int) -> int:
+        """Return the stored user epoch, tokens are issued with it."""
+        epoch = await models.user_token_epoch_get(user_id) or 0
+        self.set(user_id, epoch)
+        return self.get(user_id)
+
+    async def bump(self, user_id: int) -> int:
+        epoch = await models.user_token_epoch_bump(user_id)
+        if epoch is not None:
+            self.set(user_id, epoch)
+        return self.get(user_id)
+
+    async def load(self):
+        for user_id, epoch in await models.user_token_epochs_list():
+            self.set(user_id, epoch)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval_seconds)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.exception(f'Token epochs reload failed: {e!r}')
+            finally:
+                await postgres.remove_session()
+
+
+epochs = TokenEpochs(reload_interval_seconds=conf.security.token_epochs_reload_seconds)
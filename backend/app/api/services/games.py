@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import typing
+
+import starlette.status
+
+from ... import gamehost
+from ... import uno
+from ...core import conf
+from ...websocket_manager import managers
+from .. import exceptions
+from . import handoff
+from . import leaderboard
+from . import lobby
+from . import matchmaking
+from . import moves
+from . import partitions
+from . import sessions
+from . import stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class GameHost:
+    """Game engines along with the services fed by the game signals.
+
+    Everything the API processes need of the games is served by the
+    operations, so the host runs either in-process or in the game host
+    process behind `GameHostClient` alike. The operations return plain data
+    and raise `GameHostError` with the code the controllers map to responses.
+    """
+
+    def __init__(self, engines: gamehost.GameEngines, game_handoff: handoff.Handoff):
+        self.engines = engines
+        self.handoff = game_handoff
+        self.operations: typing.Dict[str, typing.Callable[..., typing.Any]] = {
+            'create': self._accepting(engines.create),
+            'join': self._accepting(engines.join),
+            'play': self._accepting(engines.play),
+            'state': self._accepting(engines.state),
+            'evict': engines.evict,
+            'lobby_page': self.lobby_page,
+            'matchmaking_status': self.matchmaking_status,
+            'matchmaking_enqueue': self._accepting(self.matchmaking_enqueue),
+            'matchmaking_dequeue': self.matchmaking_dequeue,
+            'matchmaking_stats': self.matchmaking_stats,
+            'leaderboard_page': self.leaderboard_page,
+            'leaderboard_entry': self.leaderboard_entry,
+            'stats_pending': self.stats_pending,
+        }
+        self._tasks: typing.List[asyncio.Task] = []
+
+    def _accepting(self, operation: typing.Callable[..., typing.Any]):
+        # Games saved by the drain would miss whatever happens after
+        def wrapper(**kwargs):
+            if self.handoff.draining:
+                raise gamehost.GameHostError('Server is restarting', code='unavailable')
+            return operation(**kwargs)
+
+        return wrapper
+
+    async def start(self):
+        await leaderboard.service.rebuild()
+
+        if conf.handoff.enabled:
+            self.handoff.adopt()
+
+        for service in (
+            partitions.maintainer,
+            self.engines,
+            matchmaking.service,
+            sessions.janitor,
+            moves.writer,
+            moves.matches_writer,
+            leaderboard.service,
+            stats.aggregator,
+        ):
+            self._tasks.append(asyncio.create_task(self._run_service(service)))
+
+    async def _run_service(self, service):
+        try:
+            await service.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f'Exception raised in {service.__class__.__name__!r} service: {e!r}')
+            raise
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if conf.handoff.enabled:
+            self.handoff.drain()
+
+        # Moves buffered since the last flush would be lost otherwise
+        await moves.writer.flush()
+        await moves.matches_writer.flush()
+        await leaderboard.service.flush()
+        await stats.aggregator.checkpoint()
+
+    def lobby_page(self, page: int, if_none_match: typing.Optional[str] = None) -> dict:
+        """Return the page along with its entity tag, no content if the tag matches."""
+        etag = lobby.index.etag
+
+        if if_none_match is not None and lobby.etag_matches(if_none_match, etag):
+            return {'etag': etag, 'modified': False, 'content': None}
+
+        content = lobby.index.page(page)
+
+        return {
+            'etag': etag,
+            'modified': True,
+            'content': content.decode() if content is not None else None,
+        }
+
+    def matchmaking_status(self, user_id: int) -> dict:
+        if user_id in matchmaking.queue:
+            return {'state': 'queued', 'match_id': None}
+
+        match_id = matchmaking.queue.assignments.get(user_id)
+        if match_id is not None:
+            return {'state': 'matched', 'match_id': match_id}
+
+        return {'state': 'idle', 'match_id': None}
+
+    def matchmaking_enqueue(self, user_id: int) -> dict:
+        if uno.get_player_game(user_id) is not None:
+            raise gamehost.GameHostError(
+                'User is already seated in an active match', code='already_in_match',
+            )
+
+        matchmaking.queue.enqueue(user_id, leaderboard.service.rating(user_id))
+
+        return self.matchmaking_status(user_id)
+
+    def matchmaking_dequeue(self, user_id: int) -> bool:
+        return matchmaking.queue.dequeue(user_id)
+
+    def matchmaking_stats(self) -> dict:
+        queue = matchmaking.queue
+
+        return {
+            'waiting': len(queue),
+            'queue_time_p50': queue.queue_time_percentile(50),
+            'queue_time_p90': queue.queue_time_percentile(90),
+            'queue_time_p99': queue.queue_time_percentile(99),
+        }
+
+    def _board(self, period: str) -> leaderboard.Leaderboard:
+        if period == 'month':
+            return leaderboard.service.current_period_wins()
+
+        return leaderboard.service.ratings
+
+    def leaderboard_page(self, period: str, offset: int, limit: int) -> dict:
+        board = self._board(period)
+
+        return {'total': len(board), 'entries': board.top(offset, limit)}
+
+    def leaderboard_entry(self, period: str, user_id: int) -> dict:
+        board = self._board(period)
+        rank = board.rank(user_id)
+
+        if rank is None:
+            raise gamehost.GameHostError(
+                'Player is not ranked on the leaderboard', code='player_not_ranked',
+            )
+
+        return {'rank': rank, 'score': board.score(user_id)}
+
+    def stats_pending(self, user_id: int) -> typing.Optional[dict]:
+        """Return the stats increments of the player not checkpointed yet."""
+        pending = stats.aggregator.counters.get(user_id)
+        return dict(pending) if pending is not None else None
+
+
+async def call(op: str, **args) -> typing.Any:
+    """Call the game host operation, responding with 503 while the host is unavailable."""
+    try:
+        return await client.call(op, **args)
+    except ConnectionError as e:
+        raise exceptions.HTTPTemprorarilyUnavailableException(str(e))
+    except gamehost.GameHostError as e:
+        if e.code == 'unavailable':
+            raise exceptions.HTTPTemprorarilyUnavailableException(str(e))
+        raise
+
+
+async def drain(notifier: managers.GameSessionsManager = managers.notifier):
+    """Save the games hosted in-process and close the game connections with 1012.
+
+    Runs on SIGTERM ahead of the server shutdown, which would close the
+    connections first. The clients reconnect to the next worker, which has
+    adopted the games by then, or to any other worker in the host mode.
+    """
+    if conf.gamehost.mode == 'local' and conf.handoff.enabled:
+        host.handoff.drain()
+
+    try:
+        await asyncio.wait_for(
+            notifier.close_connections(starlette.status.WS_1012_SERVICE_RESTART),
+            conf.handoff.drain_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        logger.warning('Closing game connections timed out')
+
+
+async def _on_event(
+    event: str,
+    data: dict,
+    notifier: managers.GameSessionsManager = managers.notifier,
+):
+    """Deliver the game host event to the rooms of this process."""
+    match_id = data['match_id']
+
+    if event == 'evicted':
+        notifier.close_room(match_id)
+        return
+
+    # Nobody of the match is connected to this process
+    if match_id not in notifier.rooms:
+        return
+
+    state = data['state']
+    # Turn has passed to the next player, so the state is latency-critical
+    await notifier.push(
+        {'type': 'state', 'data': state}, match_id, urgent=event == 'move', seq=data['seq'],
+    )
+    notifier.publish_spectator_state(match_id, state)
+
+    for player_id, hand in data.get('hands', {}).items():
+        await notifier.send_to_user(match_id, player_id, {'type': 'hand', 'data': hand})
+
+
+engines = gamehost.GameEngines(
+    turn_timeout_seconds=conf.gamehost.turn_timeout_seconds,
+    timer_interval_seconds=conf.gamehost.timer_interval_seconds,
+)
+host = GameHost(
+    engines,
+    handoff.Handoff(
+        handoff.FileHandoffStore(conf.handoff.path),
+        engines,
+        adopt_budget_seconds=conf.handoff.adopt_budget_seconds,
+    ),
+)
+
+if conf.gamehost.mode == 'local':
+    client = gamehost.LocalGameHostClient(host, on_event=_on_event)
+else:
+    client = gamehost.GameHostClient(
+        conf.gamehost.socket_path,
+        on_event=_on_event,
+        reconnect_interval_seconds=conf.gamehost.reconnect_interval_seconds,
+    )
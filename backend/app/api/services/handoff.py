@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import pathlib
+import time
+import typing
+import uuid
+
+from ... import gamehost
+from ... import uno
+
+
+logger = logging.getLogger(__name__)
+
+
+class FileHandoffStore:
+    """Live games handed off between worker processes through a local directory.
+
+    Every draining worker writes its own file, adopting worker claims a file
+    by renaming it, so concurrently starting workers never adopt the same game.
+    """
+
+    suffix = '.json'
+
+    def __init__(self, path: typing.Union[str, pathlib.Path]):
+        self.path = pathlib.Path(path)
+
+    def save(self, games: typing.List[dict]):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        name = f'{os.getpid()}-{uuid.uuid4().hex}'
+        tmp_path = self.path / f'{name}.tmp'
+        tmp_path.write_text(json.dumps({'saved_at': time.time(), 'games': games}))
+        # Rename is atomic, so half written files are never adopted
+        tmp_path.rename(self.path / f'{name}{self.suffix}')
+
+    def claim(self, budget_seconds: float) -> typing.List[dict]:
+        """Take the games handed off within the budget, the stale ones are discarded."""
+        if not self.path.is_dir():
+            return []
+
+        games = []
+
+        for path in sorted(self.path.glob(f'*{self.suffix}')):
+            claimed_path = path.with_suffix(f'.claimed-{os.getpid()}')
+            try:
+                path.rename(claimed_path)
+            except FileNotFoundError:
+                continue
+
+            try:
+                handoff = json.loads(claimed_path.read_text())
+            except ValueError as e:
+                logger.error(f'Discarding malformed handoff {path.name}: {e!r}')
+                continue
+            finally:
+                claimed_path.unlink(missing_ok=True)
+
+            age = time.time() - handoff['saved_at']
+            if age > budget_seconds:
+                logger.warning(
+                    f'Discarding {len(handoff["games"])} games handed off {age:.0f}s ago',
+                )
+                continue
+
+            games.extend(handoff['games'])
+
+        return games
+
+
+class Handoff:
+    """Saves live games on shutdown and adopts them on startup.
+
+    The sequence numbers of the matches are saved along, so the events of the
+    adopted games continue the numbering and clients may resume.
+    """
+
+    def __init__(
+        self,
+        store: FileHandoffStore,
+        engines: gamehost.GameEngines,
+        adopt_budget_seconds: float,
+    ):
+        self.store = store
+        self.engines = engines
+        self.adopt_budget_seconds = adopt_budget_seconds
+        self.draining = False
+
+    def drain(self) -> int:
+        """Stop accepting moves and matches, save the live games."""
+        if self.draining:
+            # Saved already on SIGTERM, nothing has changed since
+            return 0
+
+        self.draining = True
+
+        live_games = [game for game in uno.list_games() if game.is_active]
+        self.store.save([
+            {'game': game.to_dict(), 'seq': self.engines.seq(game.match_id)}
+            for game in live_games
+        ])
+        logger.info(f'Handed off {len(live_games)} live games')
+
+        return len(live_games)
+
+    def adopt(self) -> int:
+        """Resume the games handed off by the previous host."""
+        adopted = 0
+
+        for handoff in self.store.claim(self.adopt_budget_seconds):
+            try:
+                match_id = handoff['game']['match_id']
+                # Set first, the restored game announces its state with the next one
+                self.engines.set_seq(match_id, handoff['seq'])
+                uno.UnoGame.restore(handoff['game'])
+            except (KeyError, ValueError) as e:
+                logger.error(f'Failed to adopt handed off game: {e!r}')
+                continue
+
+            adopted += 1
+
+        if adopted:
+            logger.info(f'Adopted {adopted} handed off games')
+
+        return adopted
@@ -0,0 +1,289 @@
+import asyncio
+import datetime
+import logging
+import typing
+
+import backoff
+import sortedcontainers
+import sqlalchemy.exc
+
+from ... import uno
+from ...core import conf
+from ...core import times
+from ...uno import signals
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying, other database errors would fail the same way again
+_TRANSIENT_ERRORS = (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError, OSError)
+
+
+def elo_update(
+    ratings: typing.Dict[int, float],
+    winner_id: int,
+    k_factor: float,
+) -> typing.Dict[int, float]:
+    """Return new ratings after the match, the winner beats every other player.
+
+    Every pair of the winner and a loser is rated as a separate game with
+    the K-factor split among the losers, so the ratings sum is preserved.
+
+    >>> elo_update({1: 1500, 2: 1500}, winner_id=1, k_factor=32)
+    {1: 1516.0, 2: 1484.0}
+    >>> new = elo_update({1: 1500, 2: 1500, 3: 1500}, winner_id=3, k_factor=32)
+    >>> new[3], new[1]
+    (1516.0, 1492.0)
+    """
+    k_factor = k_factor / max(1, len(ratings) - 1)
+    new_ratings = dict(ratings)
+
+    for user_id, rating in ratings.items():
+        if user_id == winner_id:
+            continue
+
+        expected = 1 / (1 + 10 ** ((rating - ratings[winner_id]) / 400))
+        delta = k_factor * (1 - expected)
+        new_ratings[winner_id] += delta
+        new_ratings[user_id] -= delta
+
+    return new_ratings
+
+
+class Leaderboard:
+    """Scores kept ordered for O(log n) rank lookups and top pages.
+
+    Ties are ordered by the user id.
+
+    >>> board = Leaderboard()
+    >>> board.update(1, 1500)
+    >>> board.update(2, 1600)
+    >>> board.update(3, 1550)
+    >>> board.rank(3), board.top(0, 2)
+    (2, [(1, 2, 1600), (2, 3, 1550)])
+    >>> board.update(3, 1400)
+    >>> board.rank(3), len(board)
+    (3, 3)
+    >>> board.remove(1)
+    >>> board.rank(2), len(board)
+    (1, 2)
+    """
+
+    def __init__(self):
+        self._scores: typing.Dict[int, float] = {}
+        self._order = sortedcontainers.SortedList()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, user_id: int):
+        return user_id in self._scores
+
+    def score(self, user_id: int) -> typing.Optional[float]:
+        return self._scores.get(user_id)
+
+    def update(self, user_id: int, score: float):
+        previous = self._scores.get(user_id)
+        if previous is not None:
+            self._order.remove((-previous, user_id))
+
+        self._scores[user_id] = score
+        self._order.add((-score, user_id))
+
+    def remove(self, user_id: int):
+        score = self._scores.pop(user_id, None)
+        if score is not None:
+            self._order.remove((-score, user_id))
+
+    def load(self, scores: typing.Iterable[typing.Tuple[int, float]]):
+        """Replace the scores, sorting them at once."""
+        self._scores = dict(scores)
+        self._order = sortedcontainers.SortedList(
+            (-score, user_id) for user_id, score in self._scores.items()
+        )
+
+    def rank(self, user_id: int) -> typing.Optional[int]:
+        """Return the 1-based rank of the user, None if the user is not ranked."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+
+        return self._order.index((-score, user_id)) + 1
+
+    def top(self, offset: int, limit: int) -> typing.List[typing.Tuple[int, int, float]]:
+        """Return `(rank, user_id, score)` of the page."""
+        return [
+            (offset + index + 1, user_id, -score)
+            for index, (score, user_id) in enumerate(self._order[offset:offset + limit])
+        ]
+
+
+class RatingService:
+    """Rates the players on finished matches and keeps the leaderboards.
+
+    Ratings are updated in memory and their changes are added to the stored
+    ratings in batches every flush interval. Only the deltas are stored, so
+    the processes rating matches concurrently do not overwrite each other,
+    and the stored ratings read back refresh the in-memory ones. Besides the
+    global rating leaderboard, the wins of the current month are ranked too,
+    the month board starts empty once read or rated in the next month.
+
+    >>> service = RatingService(1500, k_factor=32, flush_interval_seconds=1, max_tries=1)
+    >>> service.period_start = datetime.datetime(2026, 1, 1, tzinfo=times.UTC)
+    >>> service.period_wins.update(1, 3)
+    >>> month_end = datetime.datetime(2026, 1, 31, 23, 59, tzinfo=times.UTC)
+    >>> len(service.current_period_wins(now=month_end))
+    1
+    >>> len(service.current_period_wins(now=month_end + datetime.timedelta(minutes=1)))
+    0
+    >>> service.period_start.month
+    2
+    """
+
+    def __init__(
+        self,
+        default_rating: float,
+        k_factor: float,
+        flush_interval_seconds: float,
+        max_tries: int,
+    ):
+        self.default_rating = default_rating
+        self.k_factor = k_factor
+        self.flush_interval_seconds = flush_interval_seconds
+        self.ratings = Leaderboard()
+        self.period_wins = Leaderboard()
+        self.period_start = self._current_period_start()
+        self.games: typing.Dict[int, int] = {}
+        # Rating delta and games count of every player since the last flush
+        self._changes: typing.Dict[int, typing.List] = {}
+        self._add = backoff.on_exception(
+            backoff.expo, _TRANSIENT_ERRORS, max_tries=max_tries,
+        )(models.player_ratings_add)
+
+    @staticmethod
+    def _current_period_start(
+        now: typing.Optional[datetime.datetime] = None,
+    ) -> datetime.datetime:
+        if now is None:
+            now = times.utcnow()
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def current_period_wins(
+        self,
+        now: typing.Optional[datetime.datetime] = None,
+    ) -> Leaderboard:
+        """Return the wins board of the current month, started anew once the month is over."""
+        period_start = self._current_period_start(now)
+        if period_start != self.period_start:
+            self.period_start = period_start
+            self.period_wins = Leaderboard()
+
+        return self.period_wins
+
+    def rating(self, user_id: int) -> float:
+        score = self.ratings.score(user_id)
+        return self.default_rating if score is None else score
+
+    def rate_match(self, player_ids: typing.Iterable[int], winner_id: int):
+        ratings = elo_update(
+            {user_id: self.rating(user_id) for user_id in player_ids},
+            winner_id,
+            self.k_factor,
+        )
+
+        for user_id, rating in ratings.items():
+            self._add_change(user_id, rating - self.rating(user_id), 1)
+            self.ratings.update(user_id, rating)
+            self.games[user_id] = self.games.get(user_id, 0) + 1
+
+        period_wins = self.current_period_wins()
+        period_wins.update(winner_id, (period_wins.score(winner_id) or 0) + 1)
+
+    async def rebuild(self):
+        """Load the leaderboards from the stored ratings and matches."""
+        rows = await models.player_ratings_list()
+        self.ratings.load((user_id, rating) for user_id, rating, _ in rows)
+        self.games = {user_id: games for user_id, _, games in rows}
+
+        self.period_start = self._current_period_start()
+        self.period_wins.load(await models.match_wins_since(self.period_start))
+
+        logger.info(f'Leaderboard is rebuilt with {len(self.ratings)} players')
+
+    def _add_change(self, user_id: int, rating_delta: float, games: int):
+        change = self._changes.setdefault(user_id, [0.0, 0])
+        change[0] += rating_delta
+        change[1] += games
+
+    def _apply_stored(self, stored: typing.List[typing.Tuple[int, float, int]]):
+        for user_id, rating, games in stored:
+            # Changes made while flushing are not stored yet
+            rating_delta, games_delta = self._changes.get(user_id, (0.0, 0))
+            self.ratings.update(user_id, rating + rating_delta)
+            self.games[user_id] = games + games_delta
+
+    async def _flush_apart(self, rows: typing.List[dict]):
+        """Store the changes player by player, dropping only the failing ones."""
+        for row in rows:
+            try:
+                self._apply_stored(await models.player_ratings_add([row], self.default_rating))
+            except _TRANSIENT_ERRORS:
+                self._add_change(row['user_id'], row['rating_delta'], row['games'])
+            except sqlalchemy.exc.SQLAlchemyError as e:
+                # E.g. the user is deleted, so the player is not ranked anymore
+                logger.error(f'Discarding rating changes of {row["user_id"]}: {e!r}')
+                self.ratings.remove(row['user_id'])
+                self.games.pop(row['user_id'], None)
+
+    async def flush(self):
+        if not self._changes:
+            return
+
+        changes, self._changes = self._changes, {}
+        updated_at = times.utcnow()
+        rows = [
+            {
+                'user_id': user_id,
+                'rating_delta': rating_delta,
+                'games': games,
+                'updated_at': updated_at,
+            }
+            for user_id, (rating_delta, games) in changes.items()
+        ]
+
+        try:
+            stored = await self._add(rows, self.default_rating)
+        except _TRANSIENT_ERRORS as e:
+            logger.error(f'Failed to store {len(rows)} rating changes: {e!r}')
+            for row in rows:
+                self._add_change(row['user_id'], row['rating_delta'], row['games'])
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            logger.error(f'Failed to store {len(rows)} rating changes at once: {e!r}')
+            await self._flush_apart(rows)
+        else:
+            self._apply_stored(stored)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f'Ratings flush failed: {e!r}')
+
+
+service = RatingService(
+    default_rating=conf.leaderboard.default_rating,
+    k_factor=conf.leaderboard.k_factor,
+    flush_interval_seconds=conf.leaderboard.flush_interval_seconds,
+    max_tries=conf.leaderboard.max_tries,
+)
+
+
+def _on_game_finished(game: uno.UnoGame, **kwargs):
+    if game.winner is not None:
+        service.rate_match(game.players, game.winner.user_id)
+
+
+signals.game_finished.connect(_on_game_finished)
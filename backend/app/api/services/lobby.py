@@ -0,0 +1,130 @@
+import json
+import math
+import typing
+import uuid
+
+from ... import uno
+from ...core import conf
+from ...uno import signals
+
+
+def game_summary(game: uno.UnoGame) -> dict:
+    return {
+        'match_id': game.match_id,
+        'players': len(game.players),
+        'max_players': game.max_players,
+        'status': 'open' if game.is_open else 'running',
+    }
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check the entity tag against the `If-None-Match` list, weak tags compare as well.
+
+    >>> etag_matches('"a-1", W/"a-2"', '"a-2"')
+    True
+    >>> etag_matches('"a-12"', '"a-1"')
+    False
+    >>> etag_matches('*', '"a-1"')
+    True
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+
+        if candidate in ('*', etag):
+            return True
+
+    return False
+
+
+class LobbyIndex:
+    """Open and running matches maintained incrementally on game changes.
+
+    Pages are serialized once per index version and served as is until the
+    next change. The entity tag of the pages is the version prefixed with the
+    index instance id: versions start over in every process, the tag of
+    another process or a previous run must never match.
+
+    >>> index = LobbyIndex(page_size=1, instance_id='a1')
+    >>> index.upsert('a', {'match_id': 'a'})
+    >>> index.upsert('b', {'match_id': 'b'})
+    >>> index.version, index.pages_count
+    (2, 2)
+    >>> index.page(1)
+    b'{"version": 2, "page": 1, "pages": 2, "games": [{"match_id": "b"}]}'
+    >>> index.remove('a')
+    >>> index.etag
+    '"a1-3"'
+    """
+
+    def __init__(self, page_size: int, instance_id: typing.Optional[str] = None):
+        self.page_size = page_size
+        self.instance_id = instance_id or uuid.uuid4().hex[:12]
+        self.version = 0
+        self._summaries: typing.Dict[str, dict] = {}
+        self._pages: typing.Optional[typing.List[bytes]] = None
+
+    def __len__(self):
+        return len(self._summaries)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.instance_id}-{self.version}"'
+
+    @property
+    def pages_count(self) -> int:
+        return max(1, math.ceil(len(self._summaries) / self.page_size))
+
+    def upsert(self, match_id: str, summary: dict):
+        self._summaries[match_id] = summary
+        self._invalidate()
+
+    def remove(self, match_id: str):
+        if self._summaries.pop(match_id, None) is not None:
+            self._invalidate()
+
+    def _invalidate(self):
+        self.version += 1
+        self._pages = None
+
+    def _serialize_pages(self) -> typing.List[bytes]:
+        summaries = list(self._summaries.values())
+        pages_count = self.pages_count
+
+        return [
+            json.dumps({
+                'version': self.version,
+                'page': page,
+                'pages': pages_count,
+                'games': summaries[page * self.page_size:(page + 1) * self.page_size],
+            }).encode()
+            for page in range(pages_count)
+        ]
+
+    def page(self, page: int) -> typing.Optional[bytes]:
+        """Return the serialized page, or None if the page is out of range."""
+        if self._pages is None:
+            self._pages = self._serialize_pages()
+
+        if not 0 <= page < len(self._pages):
+            return None
+
+        return self._pages[page]
+
+
+index = LobbyIndex(page_size=conf.lobby.page_size)
+
+
+def _on_game_changed(game: uno.UnoGame, **kwargs):
+    index.upsert(game.match_id, game_summary(game))
+
+
+def _on_game_removed(game: uno.UnoGame, **kwargs):
+    index.remove(game.match_id)
+
+
+signals.game_created.connect(_on_game_changed)
+signals.player_joined.connect(_on_game_changed)
+signals.game_finished.connect(_on_game_removed)
+signals.game_evicted.connect(_on_game_removed)
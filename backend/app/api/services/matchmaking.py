@@ -0,0 +1,341 @@
+import asyncio
+import collections
+import dataclasses
+import heapq
+import logging
+import math
+import time
+import typing
+import uuid
+
+import cacheout
+import sortedcontainers
+
+from ... import uno
+from ...core import conf
+from ...uno import signals
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(order=True)
+class QueueEntry:
+    enqueued_at: float
+    user_id: int = dataclasses.field(compare=False)
+    rating: float = dataclasses.field(compare=False)
+    removed: bool = dataclasses.field(default=False, compare=False)
+
+
+def _rating_key(entry: QueueEntry) -> typing.Tuple[float, int]:
+    return entry.rating, entry.user_id
+
+
+class MatchmakingQueue:
+    """Waiting players kept in rating buckets backed by heaps.
+
+    Every bucket is a heap ordered by the enqueue time, so the longest waiting
+    player of the bucket is at its top, along with an index of its players
+    sorted by rating. Enqueue and dequeue are O(log n), a dequeued entry is
+    marked as removed and discarded from the heap once it reaches the top.
+
+    Pairing runs in batch passes: the oldest player of a bucket takes players
+    from the nearest buckets whose rating lies within the spread, the spread
+    widens as the player waits. Buckets lying within the spread as a whole
+    are taken from the top, for the others the rating index is walked out
+    from the rating of the oldest player, nearest ratings first, until enough
+    players are found.
+
+    >>> queue = MatchmakingQueue(max_players=2, spread_per_second=0)
+    >>> _ = queue.enqueue(1, 1500, now=0)
+    >>> _ = queue.enqueue(2, 1550, now=0)
+    >>> _ = queue.enqueue(3, 2500, now=0)
+    >>> [[entry.user_id for entry in group] for group in queue.form_matches(now=1)]
+    [[1, 2]]
+    >>> len(queue)
+    1
+    >>> queue = MatchmakingQueue(max_players=2, base_spread=50, spread_per_second=0)
+    >>> _ = queue.enqueue(1, 1500, now=0)
+    >>> _ = queue.enqueue(2, 1401, now=0)
+    >>> _ = queue.enqueue(3, 1460, now=1)
+    >>> [[entry.user_id for entry in group] for group in queue.form_matches(now=2)]
+    [[1, 3]]
+    """
+
+    def __init__(
+        self,
+        bucket_width: int = 100,
+        base_spread: float = 100,
+        spread_per_second: float = 10,
+        max_spread: float = 1000,
+        min_players: int = 2,
+        max_players: int = uno.UnoGame.max_players,
+        max_wait_seconds: float = 60,
+        assignment_ttl_seconds: int = 600,
+        assignment_cache_size: int = 100000,
+        queue_time_samples: int = 10000,
+    ):
+        self.bucket_width = bucket_width
+        self.base_spread = base_spread
+        self.spread_per_second = spread_per_second
+        self.max_spread = max_spread
+        self.min_players = min_players
+        self.max_players = max_players
+        self.max_wait_seconds = max_wait_seconds
+
+        # Match ids of the recently matched players, until they join the match
+        self.assignments = cacheout.Cache(
+            maxsize=assignment_cache_size, ttl=assignment_ttl_seconds,
+        )
+        self.queue_times = collections.deque(maxlen=queue_time_samples)
+
+        self._buckets: typing.Dict[int, typing.List[QueueEntry]] = {}
+        self._ratings: typing.Dict[int, sortedcontainers.SortedKeyList] = {}
+        self._entries: typing.Dict[int, QueueEntry] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id: int):
+        return user_id in self._entries
+
+    def _bucket_index(self, rating: float) -> int:
+        return int(rating // self.bucket_width)
+
+    def _push(self, entry: QueueEntry):
+        index = self._bucket_index(entry.rating)
+        heapq.heappush(self._buckets.setdefault(index, []), entry)
+        self._ratings.setdefault(
+            index, sortedcontainers.SortedKeyList(key=_rating_key),
+        ).add(entry)
+        self._entries[entry.user_id] = entry
+
+    def _discard(self, entry: QueueEntry):
+        # Leaves its heap once it reaches the top
+        entry.removed = True
+        del self._entries[entry.user_id]
+        self._ratings[self._bucket_index(entry.rating)].remove(entry)
+
+    def _peek(self, index: int) -> typing.Optional[QueueEntry]:
+        heap = self._buckets.get(index)
+
+        while heap and heap[0].removed:
+            heapq.heappop(heap)
+
+        if not heap:
+            self._buckets.pop(index, None)
+            self._ratings.pop(index, None)
+            return None
+
+        return heap[0]
+
+    def _pop(self, index: int) -> QueueEntry:
+        entry = heapq.heappop(self._buckets[index])
+        del self._entries[entry.user_id]
+        self._ratings[index].remove(entry)
+        return entry
+
+    def _take_fitting(
+        self,
+        index: int,
+        rating: float,
+        spread: float,
+        limit: int,
+    ) -> typing.List[QueueEntry]:
+        """Take up to limit players of the bucket within the spread, nearest rating first."""
+        taken = []
+        low, high = index * self.bucket_width, (index + 1) * self.bucket_width
+
+        if rating - spread <= low and high <= rating + spread:
+            while len(taken) < limit and self._peek(index) is not None:
+                taken.append(self._pop(index))
+            return taken
+
+        ratings = self._ratings.get(index)
+        if not ratings:
+            return taken
+
+        above = ratings.irange_key((rating, -math.inf), (rating + spread, math.inf))
+        below = ratings.irange_key(
+            (rating - spread, -math.inf), (rating, -math.inf),
+            inclusive=(True, False), reverse=True,
+        )
+        next_above, next_below = next(above, None), next(below, None)
+
+        # Visits the taken entries and one more at most each way, whatever the spread
+        while len(taken) < limit and (next_above is not None or next_below is not None):
+            take_above = next_below is None or (
+                next_above is not None and
+                next_above.rating - rating <= rating - next_below.rating
+            )
+            if take_above:
+                taken.append(next_above)
+                next_above = next(above, None)
+            else:
+                taken.append(next_below)
+                next_below = next(below, None)
+
+        # Discarded once the walk is over, the index can not change under its iterators
+        for entry in taken:
+            self._discard(entry)
+
+        return taken
+
+    def spread(self, waited: float) -> float:
+        """Rating spread acceptable for the player waiting for given seconds."""
+        return min(self.max_spread, self.base_spread + self.spread_per_second * waited)
+
+    def enqueue(
+        self,
+        user_id: int,
+        rating: float,
+        now: typing.Optional[float] = None,
+    ) -> QueueEntry:
+        if user_id in self._entries:
+            return self._entries[user_id]
+
+        self.assignments.delete(user_id)
+
+        entry = QueueEntry(
+            enqueued_at=time.monotonic() if now is None else now,
+            user_id=user_id,
+            rating=rating,
+        )
+        self._push(entry)
+
+        return entry
+
+    def dequeue(self, user_id: int) -> bool:
+        entry = self._entries.get(user_id)
+
+        if entry is None:
+            return False
+
+        self._discard(entry)
+        return True
+
+    def _gather_group(self, index: int, anchor: QueueEntry, spread: float):
+        group = [self._pop(index)]
+        reach = int(spread // self.bucket_width) + 1
+
+        for distance in range(reach + 1):
+            for neighbour in sorted({index - distance, index + distance}):
+                if len(group) < self.max_players:
+                    group.extend(self._take_fitting(
+                        neighbour, anchor.rating, spread, self.max_players - len(group),
+                    ))
+
+            if len(group) == self.max_players:
+                break
+
+        return group
+
+    def form_matches(
+        self,
+        now: typing.Optional[float] = None,
+    ) -> typing.List[typing.List[QueueEntry]]:
+        """Pair waiting players into groups, the groups are removed from the queue."""
+        if now is None:
+            now = time.monotonic()
+
+        groups = []
+
+        for index in sorted(self._buckets):
+            while True:
+                anchor = self._peek(index)
+                if anchor is None:
+                    break
+
+                waited = now - anchor.enqueued_at
+                group = self._gather_group(index, anchor, self.spread(waited))
+
+                if (len(group) == self.max_players or
+                        (len(group) >= self.min_players and waited >= self.max_wait_seconds)):
+                    groups.append(group)
+                    continue
+
+                # Not enough players for the longest waiting one, so neither for the rest.
+                # Entries taken from the middle are still in their heaps, push copies
+                for entry in group:
+                    self._push(dataclasses.replace(entry, removed=False))
+                break
+
+        return groups
+
+    def create_matches(
+        self,
+        groups: typing.List[typing.List[QueueEntry]],
+        now: typing.Optional[float] = None,
+    ) -> typing.List[uno.UnoGame]:
+        if now is None:
+            now = time.monotonic()
+
+        games = []
+
+        for group in groups:
+            match_id = uuid.uuid4().hex
+            games.append(uno.UnoGame([entry.user_id for entry in group], match_id))
+
+            for entry in group:
+                self.assignments.set(entry.user_id, match_id)
+                self.queue_times.append(now - entry.enqueued_at)
+
+        return games
+
+    def run_pass(self) -> typing.List[uno.UnoGame]:
+        now = time.monotonic()
+        games = self.create_matches(self.form_matches(now), now)
+
+        if games:
+            logger.debug(f'Matchmaking pass created {len(games)} matches, {len(self)} waiting')
+
+        return games
+
+    def queue_time_percentile(self, percentile: float) -> typing.Optional[float]:
+        """Return the queue time percentile in seconds among recently matched players."""
+        if not self.queue_times:
+            return None
+
+        queue_times = sorted(self.queue_times)
+        index = min(len(queue_times) - 1, int(len(queue_times) * percentile / 100))
+        return queue_times[index]
+
+
+class MatchmakingService:
+    """Runs the matchmaking passes periodically."""
+
+    def __init__(self, queue: MatchmakingQueue, pass_interval_seconds: float):
+        self.queue = queue
+        self.pass_interval_seconds = pass_interval_seconds
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.pass_interval_seconds)
+            try:
+                self.queue.run_pass()
+            except Exception as e:
+                logger.exception(f'Matchmaking pass failed: {e!r}')
+
+
+queue = MatchmakingQueue(
+    bucket_width=conf.matchmaking.bucket_width,
+    base_spread=conf.matchmaking.base_spread,
+    spread_per_second=conf.matchmaking.spread_per_second,
+    max_spread=conf.matchmaking.max_spread,
+    min_players=conf.matchmaking.min_players,
+    max_wait_seconds=conf.matchmaking.max_wait_seconds,
+    assignment_ttl_seconds=conf.matchmaking.assignment_ttl_seconds,
+    assignment_cache_size=conf.matchmaking.assignment_cache_size,
+    queue_time_samples=conf.matchmaking.queue_time_samples,
+)
+service = MatchmakingService(queue, conf.matchmaking.pass_interval_seconds)
+
+
+def _on_players_seated(game: uno.UnoGame, player_id: typing.Optional[int] = None, **kwargs):
+    # Seated some other way while waiting, e.g. joined an open match
+    for user_id in (game.players if player_id is None else [player_id]):
+        queue.dequeue(user_id)
+
+
+signals.game_created.connect(_on_players_seated)
+signals.player_joined.connect(_on_players_seated)
@@ -0,0 +1,153 @@
+import asyncio
+import collections
+import datetime
+import logging
+import typing
+
+import backoff
+import sqlalchemy.exc
+
+from ... import uno
+from ...core import conf
+from ...core import times
+from ...uno import signals
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """Write-behind persistence of the game history rows.
+
+    Rows are buffered in memory and inserted in batches, a batch is written
+    once the buffer holds `batch_size` rows or every flush interval,
+    whichever comes first. The buffer is bounded, the oldest rows are dropped
+    when the database can not keep up.
+
+    Failed batches are retried with exponential backoff and kept for the next
+    flush if still failing, inserts are idempotent so a retried batch which
+    was in fact written creates no duplicates.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_buffer_size: int,
+        max_tries: int,
+        insert: typing.Callable[[typing.List[dict]], typing.Awaitable],
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.buffer: typing.Deque[dict] = collections.deque(maxlen=max_buffer_size)
+        self.rows_written = 0
+        self.batches_written = 0
+        self.rows_dropped = 0
+        self._in_flight: typing.List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._insert = backoff.on_exception(
+            backoff.expo,
+            (sqlalchemy.exc.SQLAlchemyError, OSError),
+            max_tries=max_tries,
+        )(insert)
+
+    def record(self, row: dict):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.rows_dropped += 1
+            if self.rows_dropped % self.batch_size == 1:
+                logger.warning(f'Write buffer is full, {self.rows_dropped} rows dropped')
+
+        self.buffer.append(row)
+
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _requeue_in_flight(self):
+        self.buffer.extendleft(reversed(self._in_flight))
+        self._in_flight = []
+
+    async def flush(self):
+        """Write the buffered rows batch by batch."""
+        # The batch of the cancelled flush is written again
+        self._requeue_in_flight()
+
+        while self.buffer:
+            self._in_flight = [
+                self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))
+            ]
+
+            try:
+                await self._insert(self._in_flight)
+            except (sqlalchemy.exc.SQLAlchemyError, OSError) as e:
+                logger.error(f'Failed to write {len(self._in_flight)} rows: {e!r}')
+                self._requeue_in_flight()
+                return
+
+            self.rows_written += len(self._in_flight)
+            self.batches_written += 1
+            self._in_flight = []
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+
+writer = WriteBehindWriter(
+    batch_size=conf.moves.batch_size,
+    flush_interval_seconds=conf.moves.flush_interval_seconds,
+    max_buffer_size=conf.moves.max_buffer_size,
+    max_tries=conf.moves.max_tries,
+    insert=models.game_moves_insert,
+)
+matches_writer = WriteBehindWriter(
+    batch_size=conf.moves.batch_size,
+    flush_interval_seconds=conf.moves.flush_interval_seconds,
+    max_buffer_size=conf.moves.max_buffer_size,
+    max_tries=conf.moves.max_tries,
+    insert=models.matches_insert,
+)
+
+
+def _on_move_played(
+    game: uno.UnoGame,
+    move_number: int,
+    player_id: int,
+    card,
+    hand_size: int,
+    **kwargs,
+):
+    writer.record({
+        'match_id': game.match_id,
+        'move_number': move_number,
+        'player_id': player_id,
+        'card': card,
+        'hand_size': hand_size,
+        'played_at': times.utcnow(),
+    })
+
+
+def _on_game_finished(game: uno.UnoGame, **kwargs):
+    finished_at = times.utcnow()
+
+    matches_writer.record({
+        'match_id': game.match_id,
+        'player_ids': list(game.players),
+        'winner_id': game.winner.user_id if game.winner else None,
+        'moves_count': game.moves_count,
+        'started_at': (
+            datetime.datetime.fromtimestamp(game.started_at, times.UTC)
+            if game.started_at else finished_at
+        ),
+        'finished_at': finished_at,
+    })
+
+
+signals.move_played.connect(_on_move_played)
+signals.game_finished.connect(_on_game_finished)
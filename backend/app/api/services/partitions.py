@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import logging
+
+from ...core import conf
+from ...core import partitions
+from ...core import postgres
+
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionsMaintainer:
+    """Creates the monthly partitions of the history tables ahead of time.
+
+    Runs at the game host start and then every check interval, so the
+    writers never reach a month without its partition. Expiring the old
+    partitions is left to the `partitions` command, as it may drop data.
+    """
+
+    def __init__(self, months_ahead: int, check_interval_seconds: float):
+        self.months_ahead = months_ahead
+        self.check_interval_seconds = check_interval_seconds
+
+    async def ensure(self):
+        session = postgres.get_session()
+        current_month = partitions.month_start(datetime.date.today())
+
+        try:
+            names = await partitions.ensure_partitions(
+                session, current_month, self.months_ahead,
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+        logger.debug(f'Ensured partitions {", ".join(names)}')
+
+    async def run(self):
+        while True:
+            try:
+                await self.ensure()
+            except Exception as e:
+                logger.exception(f'Partitions maintenance failed: {e!r}')
+            finally:
+                await postgres.remove_session()
+
+            await asyncio.sleep(self.check_interval_seconds)
+
+
+maintainer = PartitionsMaintainer(
+    months_ahead=conf.partitions.months_ahead,
+    check_interval_seconds=conf.partitions.check_interval_seconds,
+)
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import time
+import typing
+
+from ... import uno
+from ...core import conf
+
+
+logger = logging.getLogger(__name__)
+
+
+class FinishedGamesJanitor:
+    """Evicts the finished games once the players had time to see the result."""
+
+    def __init__(self, finished_ttl_seconds: float, sweep_interval_seconds: float):
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+    def sweep(self, now: typing.Optional[float] = None) -> typing.List[str]:
+        if now is None:
+            now = time.monotonic()
+
+        evicted = []
+
+        for game in uno.list_games():
+            if game.finished_at is None or now - game.finished_at < self.finished_ttl_seconds:
+                continue
+
+            # Rooms of the API processes are closed by the evicted event
+            uno.evict_game(game.match_id)
+            evicted.append(game.match_id)
+
+        if evicted:
+            logger.debug(f'Evicted {len(evicted)} finished games')
+
+        return evicted
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.exception(f'Finished games sweep failed: {e!r}')
+
+
+janitor = FinishedGamesJanitor(
+    finished_ttl_seconds=conf.games.finished_ttl_seconds,
+    sweep_interval_seconds=conf.games.sweep_interval_seconds,
+)
@@ -0,0 +1,209 @@
+import asyncio
+import collections
+import logging
+import typing
+
+import backoff
+import sqlalchemy.exc
+
+from ... import uno
+from ...core import conf
+from ...core import postgres
+from ...core import times
+from ...uno import enums
+from ...uno import signals
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+_TRANSIENT_ERRORS = (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError, OSError)
+
+# UnoGame opens the match with a card played for the first player, it is not their move
+_OPENING_MOVE_NUMBER = 1
+
+
+class StatsCounters:
+    """Per-player counter increments accumulated since the last checkpoint.
+
+    >>> counters = StatsCounters()
+    >>> counters.add_move(1, {'color': 'RED', 'suit': 'FIVE'}, hand_size=6)
+    >>> counters.add_move(1, None, hand_size=7)
+    >>> counters.add_match([1, 2], winner_id=2)
+    >>> counters.get(1)['cards_drawn'], counters.get(1)['red_played'], counters.get(2)['wins']
+    (1, 1, 1)
+    """
+
+    def __init__(self):
+        self._counters: typing.Dict[int, typing.Counter[str]] = {}
+
+    def __len__(self):
+        return len(self._counters)
+
+    def get(self, user_id: int) -> typing.Optional[typing.Counter[str]]:
+        return self._counters.get(user_id)
+
+    def _player(self, user_id: int) -> typing.Counter[str]:
+        try:
+            return self._counters[user_id]
+        except KeyError:
+            counters = self._counters[user_id] = collections.Counter()
+            return counters
+
+    def add_move(self, player_id: int, card: typing.Optional[dict], hand_size: int):
+        counters = self._player(player_id)
+        counters['moves'] += 1
+        counters['hand_size_total'] += hand_size or 0
+
+        if card is None:
+            counters['cards_drawn'] += 1
+            return
+
+        counters['cards_played'] += 1
+        counters[f'{card["color"].lower()}_played'] += 1
+        if card['suit'] == enums.CardSuits.PLUS_FOUR.value:
+            counters['plus_fours_dealt'] += 1
+
+    def add_match(self, player_ids: typing.Iterable[int], winner_id: typing.Optional[int]):
+        for user_id in player_ids:
+            self._player(user_id)['games'] += 1
+
+        if winner_id is not None:
+            self._player(winner_id)['wins'] += 1
+
+    def drain(self) -> typing.List[dict]:
+        """Return the increments as the table rows and start over."""
+        counters, self._counters = self._counters, {}
+        updated_at = times.utcnow()
+
+        return [
+            {
+                'user_id': user_id,
+                **{counter: increments[counter] for counter in models.stats.COUNTERS},
+                'updated_at': updated_at,
+            }
+            for user_id, increments in counters.items()
+        ]
+
+    def merge(self, rows: typing.List[dict]):
+        """Put back the drained increments, e.g. after a failed checkpoint."""
+        for row in rows:
+            self._player(row['user_id']).update(
+                {counter: row[counter] for counter in models.stats.COUNTERS},
+            )
+
+
+class StatsAggregator:
+    """Maintains the player stats from the game events.
+
+    Increments are kept in memory and added to the stored counters every
+    checkpoint interval, so the profile reads are a primary key lookup.
+    Increments failing on a transient error are kept for the next checkpoint,
+    a batch failing otherwise is stored player by player to lose only the
+    failing ones.
+    """
+
+    def __init__(self, checkpoint_interval_seconds: float, max_tries: int):
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.counters = StatsCounters()
+        self._increment = backoff.on_exception(
+            backoff.expo, _TRANSIENT_ERRORS, max_tries=max_tries,
+        )(models.player_stats_increment)
+
+    async def checkpoint(self):
+        if not self.counters:
+            return
+
+        rows = self.counters.drain()
+
+        try:
+            await self._increment(rows)
+        except _TRANSIENT_ERRORS as e:
+            logger.error(f'Failed to checkpoint stats of {len(rows)} players: {e!r}')
+            self.counters.merge(rows)
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            logger.error(f'Failed to checkpoint stats of {len(rows)} players at once: {e!r}')
+            await self._checkpoint_apart(rows)
+
+    async def _checkpoint_apart(self, rows: typing.List[dict]):
+        for row in rows:
+            try:
+                await models.player_stats_increment([row])
+            except _TRANSIENT_ERRORS:
+                self.counters.merge([row])
+            except sqlalchemy.exc.SQLAlchemyError as e:
+                logger.error(f'Discarding stats increments of {row["user_id"]}: {e!r}')
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval_seconds)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.exception(f'Stats checkpoint failed: {e!r}')
+
+
+async def backfill(chunk_size: int, on_chunk: typing.Optional[typing.Callable] = None):
+    """Recompute the stats of every player from the stored moves and matches.
+
+    History is read in keyset paginated chunks and the increments of every
+    chunk are stored right away, so the memory is bounded by the chunk size.
+    Everything is done in a single transaction, readers see the old stats
+    until it is committed. Stop the game traffic meanwhile, the moves played
+    during the backfill would be counted twice.
+    """
+    session = postgres.get_session()
+    counters = StatsCounters()
+
+    await models.player_stats_reset(session)
+
+    after_id = 0
+    while moves := await models.game_moves_chunk(after_id, chunk_size):
+        for move in moves:
+            if move.move_number != _OPENING_MOVE_NUMBER:
+                counters.add_move(move.player_id, move.card, move.hand_size)
+
+        await models.player_stats_increment(counters.drain(), session=session)
+        after_id = moves[-1].id
+        if on_chunk is not None:
+            on_chunk('moves', len(moves))
+
+    after_match_id = ''
+    while matches := await models.matches_chunk(after_match_id, chunk_size):
+        for match in matches:
+            counters.add_match(match.player_ids, match.winner_id)
+
+        await models.player_stats_increment(counters.drain(), session=session)
+        after_match_id = matches[-1].match_id
+        if on_chunk is not None:
+            on_chunk('matches', len(matches))
+
+    await session.commit()
+
+
+aggregator = StatsAggregator(
+    checkpoint_interval_seconds=conf.stats.checkpoint_interval_seconds,
+    max_tries=conf.stats.max_tries,
+)
+
+
+def _on_move_played(
+    game: uno.UnoGame,
+    move_number: int,
+    player_id: int,
+    card: typing.Optional[dict],
+    hand_size: int,
+    **kwargs,
+):
+    if move_number != _OPENING_MOVE_NUMBER:
+        aggregator.counters.add_move(player_id, card, hand_size)
+
+
+def _on_game_finished(game: uno.UnoGame, **kwargs):
+    aggregator.counters.add_match(
+        game.players, game.winner.user_id if game.winner else None,
+    )
+
+
+signals.move_played.connect(_on_move_played)
+signals.game_finished.connect(_on_game_finished)
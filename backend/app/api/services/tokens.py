@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from ...core import conf
+from ...core import postgres
+from ...core import times
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenSweeper:
+    """Deletes expired and revoked tokens, so that the token tables stay bounded.
+
+    Tables are walked in small pages by the token, every page is deleted in a
+    short transaction of its own not to hold locks on the tables.
+    """
+
+    def __init__(self, batch_size: int, sweep_interval_seconds: float):
+        self.batch_size = batch_size
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+    async def sweep(self) -> int:
+        now = times.utcnow()
+        deleted = 0
+
+        after_token = ''
+        while after_token is not None:
+            after_token, count = await models.token_access_sweep(
+                after_token, self.batch_size, now,
+            )
+            deleted += count
+
+        after_token = ''
+        while after_token is not None:
+            after_token, count = await models.token_refresh_sweep(after_token, self.batch_size)
+            deleted += count
+
+        if deleted:
+            logger.debug(f'Swept {deleted} expired and revoked tokens')
+
+        return deleted
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f'Token sweep failed: {e!r}')
+            finally:
+                await postgres.remove_session()
+
+
+sweeper = TokenSweeper(
+    batch_size=conf.security.token_sweep_batch_size,
+    sweep_interval_seconds=conf.security.token_sweep_interval_seconds,
+)
@@ -0,0 +1,108 @@
+import typing
+
+import fastapi
+import starlette.status
+
+from ... import auth
+from ... import controllers
+from ... import responses
+from ... import schemas
+
+
+router = fastapi.APIRouter()
+
+
+@router.post(
+    '/games/{match_id}/ticket',
+    summary='Obtain game websocket ticket',
+    response_model=schemas.GameTicket,
+    response_description='Issued ticket',
+    responses=responses.gen_responses([
+        controllers.GameAPIResponseNotFound,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+)
+async def obtain_game_ticket(
+    match_id: str,
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Obtain short-lived ticket for the game websocket handshake.
+
+    Browsers can not set the `Authorization` header on websocket handshakes,
+    so pass the ticket as `ticket` query parameter instead.
+
+    The following status codes are defined for 404 response:
+
+    * `game_not_found` - Match is not found among the user matches
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.game_ticket_issue(current_user, match_id)
+
+
+@router.post(
+    '/games/{match_id}/join',
+    summary='Join open match',
+    response_model=schemas.GameTicket,
+    response_description='Issued ticket',
+    responses=responses.gen_responses([
+        controllers.GameJoinAPIResponseBadRequest,
+        controllers.GameAPIResponseNotFound,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+)
+async def join_game(
+    match_id: str,
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Take a free seat of the open match listed in the lobby.
+
+    Returns the game websocket ticket, joining the match already joined only
+    issues the ticket.
+
+    The following status codes are defined for 400 response:
+
+    * `game_not_open` - Match is full or finished
+
+    The following status codes are defined for 404 response:
+
+    * `game_not_found` - Match is not found
+
+    Responds with 503 while the server is restarting or the game host is unavailable.
+    """
+    return await controllers.game_join(current_user, match_id)
+
+
+@router.websocket('/games/{match_id}/ws')
+async def game_websocket(
+    websocket: fastapi.WebSocket,
+    match_id: str,
+    last_seq: typing.Optional[int] = None,
+):
+    """Play the match over websocket.
+
+    Handshake is authenticated once with either `ticket` query parameter or
+    bearer access token, the messages are passed to the game host. Closed with
+    1012 while the server is restarting or the game host is unavailable.
+
+    Reconnecting clients may pass `last_seq`, the last seen room event sequence
+    number, to receive only the missed events instead of the state snapshot.
+    """
+    user_id = await auth.authenticate_websocket(websocket, match_id)
+
+    if user_id is None:
+        await websocket.close(code=starlette.status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await controllers.game_session(websocket, match_id, user_id, last_seq=last_seq)
+
+
+@router.websocket('/games/{match_id}/spectate')
+async def spectate_game_websocket(websocket: fastapi.WebSocket, match_id: str):
+    """Watch the match over websocket.
+
+    Spectators receive `spectate` snapshots of the public game state only,
+    delayed by the configured spectator delay, older superseded snapshots
+    are skipped. Messages sent by spectators are ignored.
+    """
+    await controllers.game_spectate(websocket, match_id)
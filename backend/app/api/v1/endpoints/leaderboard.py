@@ -0,0 +1,57 @@
+import fastapi
+
+from ....core import conf
+from ... import controllers
+from ... import responses
+from ... import schemas
+
+
+router = fastapi.APIRouter()
+
+
+@router.get(
+    '/leaderboard',
+    summary='Get leaderboard page',
+    response_model=schemas.LeaderboardPage,
+    response_description='Leaderboard page',
+    responses=responses.gen_responses([responses.APIResponseTemprorarilyUnavailable]),
+)
+async def get_leaderboard(
+    period: schemas.LeaderboardPeriod = schemas.LeaderboardPeriod.ALL,
+    offset: int = fastapi.Query(0, ge=0),
+    limit: int = fastapi.Query(
+        conf.api.pagination.limit,
+        ge=conf.api.pagination.limit_min,
+        le=conf.api.pagination.limit_max,
+    ),
+):
+    """Get players ranked by rating (`all`) or by wins of the current month (`month`).
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.leaderboard_page(period, offset, limit)
+
+
+@router.get(
+    '/leaderboard/{user_id}',
+    summary='Get player leaderboard rank',
+    response_model=schemas.LeaderboardEntry,
+    response_description='Player rank',
+    responses=responses.gen_responses([
+        controllers.LeaderboardAPIResponseNotFound,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+)
+async def get_leaderboard_entry(
+    user_id: int,
+    period: schemas.LeaderboardPeriod = schemas.LeaderboardPeriod.ALL,
+):
+    """Get rank and score of the player.
+
+    The following status codes are defined for 404 response:
+
+    * `player_not_ranked` - Player has no finished matches in the period
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.leaderboard_entry(period, user_id)
@@ -0,0 +1,37 @@
+import typing
+
+import fastapi
+
+from ... import controllers
+from ... import responses
+from ... import schemas
+
+
+router = fastapi.APIRouter()
+
+
+@router.get(
+    '/lobby',
+    summary='List open and running matches',
+    response_model=schemas.LobbyPage,
+    response_description='Lobby page',
+    responses={
+        304: {'description': 'Lobby is not modified since the `If-None-Match` version'},
+        **responses.gen_responses([
+            responses.APIResponseNotFound,
+            responses.APIResponseTemprorarilyUnavailable,
+        ]),
+    },
+)
+async def get_lobby(
+    page: int = fastapi.Query(0, ge=0),
+    if_none_match: typing.Optional[str] = fastapi.Header(None),
+):
+    """List open and running matches, finished matches are not listed.
+
+    The response carries the lobby version as `ETag`, pass it back in the
+    `If-None-Match` header to receive `304 Not Modified` until the lobby changes.
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.lobby_page(page, if_none_match)
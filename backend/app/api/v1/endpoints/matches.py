@@ -0,0 +1,60 @@
+import datetime
+
+import fastapi
+
+from ... import auth
+from ... import controllers
+from ... import responses
+from ... import schemas
+
+
+router = fastapi.APIRouter()
+
+
+@router.get(
+    '/matches/replays',
+    summary='Export replays of the own finished matches',
+    response_description='Gzip compressed JSON lines',
+    responses=responses.gen_responses([
+        responses.APIResponseOctetStream,
+        controllers.ReplayExportAPIResponseBadRequest,
+    ]),
+)
+async def export_match_replays(
+    since: datetime.datetime,
+    until: datetime.datetime,
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Export replays of the matches the current user played and which finished
+    within `[since, until)` as one archive.
+
+    Every match is a `match` line followed by its `move` lines in the play order.
+
+    The following status codes are defined for 400 response:
+
+    * `export_period_invalid` - Period ends before it starts
+    * `export_period_too_long` - Period is longer than allowed for a single export
+    """
+    return await controllers.matches_replay_export(current_user.id, since, until)
+
+
+@router.get(
+    '/matches/{match_id}/replay',
+    summary='Get match replay',
+    response_description='Gzip compressed JSON lines',
+    responses=responses.gen_responses([
+        responses.APIResponseOctetStream,
+        controllers.ReplayAPIResponseNotFound,
+    ]),
+)
+async def get_match_replay(
+    match_id: str,
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Get moves of the match as `move` lines in the play order.
+
+    The following status codes are defined for 404 response:
+
+    * `replay_not_found` - Match has no recorded moves
+    """
+    return await controllers.match_replay(match_id)
@@ -0,0 +1,93 @@
+import fastapi
+
+from ... import auth
+from ... import controllers
+from ... import responses
+from ... import schemas
+
+
+router = fastapi.APIRouter()
+
+
+@router.post(
+    '/matchmaking/queue',
+    summary='Join matchmaking queue',
+    response_model=schemas.MatchmakingStatus,
+    response_description='Matchmaking status',
+    responses=responses.gen_responses([
+        controllers.MatchmakingAPIResponseBadRequest,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+)
+async def join_matchmaking_queue(
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Join the matchmaking queue.
+
+    Poll the queue status until the `matched` state is reported, then connect
+    to the game websocket of the reported `match_id`.
+
+    The following status codes are defined for 400 response:
+
+    * `already_in_match` - User is already seated in an active match
+
+    Responds with 503 while the server is restarting or the game host is unavailable.
+    """
+    return await controllers.matchmaking_enqueue(current_user)
+
+
+@router.get(
+    '/matchmaking/queue',
+    summary='Get matchmaking status',
+    response_model=schemas.MatchmakingStatus,
+    response_description='Matchmaking status',
+    responses=responses.gen_responses([responses.APIResponseTemprorarilyUnavailable]),
+)
+async def get_matchmaking_status(
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Get matchmaking status of the current user:
+
+    - `idle`: User is not queued
+    - `queued`: User is waiting for the match
+    - `matched`: Match `match_id` was created for the user
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.matchmaking_status(current_user)
+
+
+@router.delete(
+    '/matchmaking/queue',
+    summary='Leave matchmaking queue',
+    response_description='Left the queue successfully',
+    responses=responses.gen_responses([
+        responses.APIResponseNoContent,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+    status_code=204,
+    response_class=fastapi.Response,
+)
+async def leave_matchmaking_queue(
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Leave the matchmaking queue.
+
+    Responds with 503 while the game host is unavailable.
+    """
+    await controllers.matchmaking_dequeue(current_user)
+
+
+@router.get(
+    '/matchmaking/stats',
+    summary='Get matchmaking statistics',
+    response_model=schemas.MatchmakingStats,
+    response_description='Matchmaking statistics',
+    responses=responses.gen_responses([responses.APIResponseTemprorarilyUnavailable]),
+)
+async def get_matchmaking_stats():
+    """Get amount of waiting players and queue time percentiles in seconds.
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.matchmaking_stats()
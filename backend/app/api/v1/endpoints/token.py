@@ -19,7 +19,10 @@ logger = logging.getLogger(__name__)
     summary='Obtain OAuth2 token',
     response_model=schemas.TokenGet,
     response_description='Obtained token',
-    responses=responses.gen_responses([controllers.TokenObtainAPIResponseUnauthenticated]),
+    responses=responses.gen_responses([
+        controllers.TokenObtainAPIResponseUnauthenticated,
+        controllers.CredentialsAPIResponseTooManyRequests,
+    ]),
 )
 async def obtain_token(
     request: fastapi.Request,
@@ -41,6 +44,11 @@ async def obtain_token(
     The following status codes are defined for 401 response:
 
     * `token_invalid_credentials` - Invalid credentials were provided
+
+    The following status codes are defined for 429 response:
+
+    * `password_hashing_busy` - Too many passwords are being checked, retry later
+    * `rate_limited` - Too many attempts from the address or for the email
     """
 
     return await controllers.token_obtain(
@@ -125,3 +133,14 @@ async def revoke_token(
         token=token,
         token_type_hint=token_type_hint,
     )
+
+
+@router.get(
+    '/token/password-hashing/stats',
+    summary='Get password hashing statistics',
+    response_model=schemas.PasswordHashingStats,
+    response_description='Password hashing statistics',
+)
+async def get_password_hashing_stats():
+    """Get amount of pending password checks, wait and hash time percentiles in seconds."""
+    return await controllers.password_hashing_stats()
@@ -1,5 +1,6 @@
 import fastapi.security.oauth2
 
+from ... import auth
 from ... import controllers
 from ... import responses
 from ... import schemas
@@ -13,9 +14,13 @@ router = fastapi.APIRouter()
     summary='Register new user',
     response_model=schemas.UserGet,
     response_description='User registered',
-    responses=responses.gen_responses([controllers.UserInvalidResponse]),
+    responses=responses.gen_responses([
+        controllers.UserInvalidResponse,
+        controllers.CredentialsAPIResponseTooManyRequests,
+    ]),
 )
 async def register(
+    request: fastapi.Request,
     user_data: schemas.UserRegistration,
 ):
     """Register new user:
@@ -27,6 +32,48 @@ async def register(
     The following status codes are defined for 401 response:
 
     * `token_invalid_credentials` - Invalid credentials were provided
+
+    The following status codes are defined for 429 response:
+
+    * `password_hashing_busy` - Too many passwords are being checked, retry later
+    * `rate_limited` - Too many attempts from the address or for the email
     """
 
-    return await controllers.user_create(user_data)
+    return await controllers.user_create(user_data, client_ip=request.state.client_ip)
+
+
+@router.get(
+    '/users/{user_id}/stats',
+    summary='Get player stats',
+    response_model=schemas.PlayerStatsGet,
+    response_description='Player stats',
+    responses=responses.gen_responses([
+        controllers.PlayerStatsAPIResponseNotFound,
+        responses.APIResponseTemprorarilyUnavailable,
+    ]),
+)
+async def get_player_stats(user_id: int):
+    """Get game stats of the player.
+
+    The following status codes are defined for 404 response:
+
+    * `player_stats_not_found` - Player has not played yet
+
+    Responds with 503 while the game host is unavailable.
+    """
+    return await controllers.player_stats_get(user_id)
+
+
+@router.delete(
+    '/users/me',
+    summary='Deactivate current user',
+    response_description='User deactivated',
+    responses=responses.gen_responses([responses.APIResponseNoContent]),
+    status_code=204,
+    response_class=fastapi.Response,
+)
+async def deactivate_current_user(
+    current_user: schemas.UserCurrent = fastapi.Security(auth.get_current_user),
+):
+    """Deactivate the current user, its tokens are no longer accepted."""
+    await controllers.user_deactivate(current_user)
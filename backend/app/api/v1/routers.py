@@ -1,11 +1,21 @@
 import fastapi
 
 from .endpoints import dummies
+from .endpoints import games
+from .endpoints import leaderboard
+from .endpoints import lobby
+from .endpoints import matches
+from .endpoints import matchmaking
 from .endpoints import token
 from .endpoints import users
 
 
 api_router = fastapi.APIRouter()
 api_router.include_router(dummies.router, tags=['dummies'])
+api_router.include_router(games.router, tags=['games'])
+api_router.include_router(leaderboard.router, tags=['leaderboard'])
+api_router.include_router(lobby.router, tags=['lobby'])
+api_router.include_router(matches.router, tags=['matches'])
+api_router.include_router(matchmaking.router, tags=['matchmaking'])
 api_router.include_router(token.router, tags=['token'])
 api_router.include_router(users.router, tags=['users'])
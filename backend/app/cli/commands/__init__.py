@@ -1,6 +1,9 @@
 import click
 
 from . import alembic
+from . import compression
+from . import partitions
+from . import stats
 
 
 cli = click.Group(
@@ -9,3 +12,6 @@ cli = click.Group(
     },
 )
 cli.add_command(alembic.execute_alembic)
+cli.add_command(compression.train_dictionary)
+cli.add_command(partitions.maintain_partitions)
+cli.add_command(stats.backfill_stats)
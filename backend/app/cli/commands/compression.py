@@ -0,0 +1,42 @@
+import pathlib
+
+import click
+
+from ...websocket_manager import compression
+
+
+@click.command(
+    name='train-dictionary',
+    help='Train websocket compression dictionary from recorded game traffic',
+)
+@click.option(
+    '--corpus',
+    required=True,
+    type=click.Path(exists=True, path_type=pathlib.Path),
+    help='Replay file or directory of replay files, one frame per line',
+)
+@click.option(
+    '--output',
+    required=True,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help='Path to write the trained dictionary to',
+)
+@click.option(
+    '--size',
+    default=compression.DEFAULT_DICTIONARY_SIZE,
+    show_default=True,
+    help='Maximum dictionary size in bytes',
+)
+def train_dictionary(corpus: pathlib.Path, output: pathlib.Path, size: int):
+    frames = list(compression.iter_corpus_frames(corpus))
+    dictionary = compression.train_dictionary(frames, size=size)
+    output.write_bytes(dictionary)
+
+    compressor = compression.DictionaryCompressor(dictionary)
+    raw_size = sum(len(frame) for frame in frames)
+    compressed_size = sum(len(compressor.compress(frame)) for frame in frames)
+
+    click.echo(f'Trained {len(dictionary)} bytes dictionary on {len(frames)} frames')
+    click.echo(f'Dictionary id: {compressor.dictionary_id}')
+    if raw_size:
+        click.echo(f'Compression ratio: {compressed_size / raw_size:.3f}')
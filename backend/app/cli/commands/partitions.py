@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+
+import click
+
+from ...core import conf
+from ...core import partitions
+from ...core import postgres
+
+
+async def _maintain_partitions(ahead: int, retention: int, drop: bool):
+    await postgres.connect(conf.postgres.uri)
+    session = postgres.get_session()
+
+    current_month = partitions.month_start(datetime.date.today())
+    expire_before = partitions.add_months(current_month, -retention)
+
+    for name in await partitions.ensure_partitions(session, current_month, ahead):
+        click.echo(f'Ensured {name}')
+
+    for name in await partitions.expire_partitions(session, expire_before, drop):
+        click.echo(f'{"Dropped" if drop else "Detached"} {name}')
+
+    await session.commit()
+    await postgres.disconnect()
+
+
+@click.command(
+    name='partitions',
+    help=(
+        'Create future monthly partitions of the history tables and expire old ones. '
+        'The game host creates the future partitions on its own, '
+        'the command is needed to expire the old ones'
+    ),
+)
+@click.option(
+    '--ahead',
+    default=conf.partitions.months_ahead,
+    show_default=True,
+    help='Amount of future months to create partitions for',
+)
+@click.option(
+    '--retention',
+    default=conf.partitions.retention_months,
+    show_default=True,
+    help='Amount of past months to keep, older partitions are expired',
+)
+@click.option(
+    '--drop/--detach',
+    default=False,
+    show_default=True,
+    help='Drop the expired partitions instead of detaching them',
+)
+def maintain_partitions(ahead: int, retention: int, drop: bool):
+    asyncio.run(_maintain_partitions(ahead, retention, drop))
@@ -0,0 +1,34 @@
+import asyncio
+
+import click
+
+from ...api.services import stats
+from ...core import conf
+from ...core import postgres
+
+
+async def _backfill_stats(chunk_size: int):
+    await postgres.connect(conf.postgres.uri)
+
+    totals = {'moves': 0, 'matches': 0}
+
+    def on_chunk(kind: str, size: int):
+        totals[kind] += size
+        click.echo(f'Aggregated {totals[kind]} {kind}')
+
+    await stats.backfill(chunk_size, on_chunk=on_chunk)
+    await postgres.disconnect()
+
+
+@click.command(
+    name='backfill-stats',
+    help='Recompute player stats from the stored moves and matches',
+)
+@click.option(
+    '--chunk-size',
+    default=conf.stats.backfill_chunk_size,
+    show_default=True,
+    help='Amount of moves or matches read at once',
+)
+def backfill_stats(chunk_size: int):
+    asyncio.run(_backfill_stats(chunk_size))
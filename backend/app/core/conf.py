@@ -24,8 +24,58 @@ _DEFAULT_OPTIONS = {
     },
     'security': {
         'secret_key': 'secret_key',
+        # Former secret keys, still accepted while the issued tokens expire
+        'previous_secret_keys': [],
         'token_expires_in_seconds': 1800,
+        'ws_ticket_expires_in_seconds': 60,
         'min_password_length': 8,
+        # Bcrypt runs on a pool of its own, requests beyond the pending limit get 429
+        'password_hasher_workers': 2,
+        'password_hasher_max_pending': 32,
+        # Validated access tokens kept in process, entries never outlive the token
+        'auth_cache_size': 100000,
+        'auth_cache_ttl_seconds': 60,
+        # Access tokens carry the user revocation epoch and are not stored
+        'stateless_tokens': False,
+        # Epochs bumped by the other processes are picked up this often
+        'token_epochs_reload_seconds': 30,
+        # Expired and revoked tokens are deleted in pages of the batch size
+        'token_sweep_interval_seconds': 600,
+        'token_sweep_batch_size': 1000,
+    },
+    'redis': {
+        'host': 'redis',
+        'port': 6379,
+        'user': None,
+        'password': None,
+        'db': 0,
+        'uri': '_build_redis_uri:callable',
+    },
+    'ratelimit': {
+        # 'local' limits every worker on its own, 'redis' shares the limits
+        'backend': 'local',
+        # Login and registration attempts, a burst of capacity then the refill rate
+        'ip': {
+            'capacity': 20,
+            'refill_per_second': 0.2,
+        },
+        'email': {
+            'capacity': 5,
+            'refill_per_second': 0.05,
+        },
+        'sweep_interval_seconds': 60,
+    },
+    'revocations': {
+        # 'local' is enough for a single worker, 'redis' spreads to all of them
+        'channel': 'local',
+        'redis_channel': 'uno:revocations',
+        # Bloom filter in front of the revoked tokens set, 0 disables it
+        'bloom_capacity': 0,
+        'bloom_error_rate': 0.001,
+        'sweep_interval_seconds': 60,
+        # Lost channel is subscribed to again, the interval doubles up to the max
+        'reconnect_interval_seconds': 1,
+        'reconnect_max_interval_seconds': 30,
     },
     'log': {
         'internal': {
@@ -37,14 +87,111 @@ _DEFAULT_OPTIONS = {
         'host': '0.0.0.0',
         'port': 5001,
         'log_level': 'info',
+        # Client address headers are honoured from these peers only, addresses or networks
+        'trusted_proxies': [],
         'pagination': {
             'limit': 20,
             'limit_min': 10,
             'limit_max': 100,
         },
     },
-    'dummy': {
+    'gamehost': {
+        # 'local' hosts the games in the API process, which then must be the only one,
+        # 'host' reaches the separate game host process shared by every API worker
+        'mode': 'local',
         'log_level': 'info',
+        'socket_path': '/tmp/uno-gamehost.sock',
+        # API workers connect to the game host again this often while it is down
+        'reconnect_interval_seconds': 1,
+        # Players who do not move in time draw a card, zero disables the timers
+        'turn_timeout_seconds': 30,
+        'timer_interval_seconds': 0.5,
+    },
+    'matchmaking': {
+        'pass_interval_seconds': 1,
+        'bucket_width': 100,
+        # Acceptable rating difference, widens with the waiting time up to the max
+        'base_spread': 100,
+        'spread_per_second': 10,
+        'max_spread': 1000,
+        # Matches smaller than the max players are created after the max wait only
+        'min_players': 2,
+        'max_wait_seconds': 60,
+        'assignment_ttl_seconds': 600,
+        'assignment_cache_size': 100000,
+        'queue_time_samples': 10000,
+    },
+    'games': {
+        # Finished games are kept for the players to see the result, then evicted
+        'finished_ttl_seconds': 300,
+        'sweep_interval_seconds': 30,
+    },
+    'handoff': {
+        'enabled': True,
+        # Live games are saved here on shutdown and adopted by the next game host
+        'path': '/tmp/uno-handoff',
+        # Games saved longer ago are discarded, their players have left anyway
+        'adopt_budget_seconds': 60,
+        'drain_timeout_seconds': 5,
+    },
+    'moves': {
+        # Moves are written in batches of this size or every flush interval
+        'batch_size': 500,
+        'flush_interval_seconds': 1,
+        # Oldest moves are dropped above the limit while the database is unavailable
+        'max_buffer_size': 100000,
+        'max_tries': 5,
+    },
+    'partitions': {
+        # Monthly partitions of the move and match history
+        'months_ahead': 2,
+        'retention_months': 12,
+        # Game host creates the partitions ahead at start and then this often
+        'check_interval_seconds': 6 * 60 * 60,
+    },
+    'leaderboard': {
+        # Rating of the players without rated matches
+        'default_rating': 1500,
+        'k_factor': 32,
+        # Changed ratings are stored in batches every interval
+        'flush_interval_seconds': 10,
+        'max_tries': 5,
+    },
+    'stats': {
+        # Player stats increments are added to the stored counters every interval
+        'checkpoint_interval_seconds': 30,
+        'max_tries': 5,
+        'backfill_chunk_size': 10000,
+    },
+    'replays': {
+        # Rows fetched from the server side cursor at once while streaming
+        'yield_per': 1000,
+        'compression_level': 6,
+        # Longest period of finished matches exported by a single request
+        'export_max_days': 31,
+    },
+    'lobby': {
+        'page_size': 50,
+    },
+    'websocket': {
+        # Per-room coalescing window of broadcast events, zero disables coalescing
+        'flush_window_ms': 0,
+        # Amount of recent delivery latencies kept for percentile reporting
+        'latency_samples': 10000,
+        # Amount of recent room events kept for resuming dropped connections
+        'replay_buffer_size': 256,
+        # Spectators see the match this late, which also discourages ghosting
+        'spectator_delay_ms': 3000,
+        # Rooms left without connections are dropped along with their replay buffer
+        'room_idle_ttl_seconds': 120,
+        # Last sequence numbers of the dropped rooms, continued if a room comes back
+        'retired_rooms_size': 100000,
+        'compression': {
+            'enabled': False,
+            # Trained preset dictionary, the built-in card vocabulary is used if empty
+            'dictionary_path': '',
+            'level': 6,
+        },
     },
 }
 _IGNORED_OPTIONS = []
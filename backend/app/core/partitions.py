@@ -0,0 +1,122 @@
+"""Monthly range partitions of the append-only history tables."""
+import datetime
+import typing
+
+import sqlalchemy
+import sqlalchemy.ext.asyncio as sqlalchemy_async
+
+
+# Partitioned tables along with their partition key columns
+PARTITIONED_TABLES = {
+    'game_moves': 'played_at',
+    'matches': 'finished_at',
+}
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    """
+    >>> add_months(datetime.date(2026, 11, 1), 3)
+    datetime.date(2027, 2, 1)
+    >>> add_months(datetime.date(2026, 1, 1), -1)
+    datetime.date(2025, 12, 1)
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    """
+    >>> partition_name('game_moves', datetime.date(2026, 3, 1))
+    'game_moves_y2026m03'
+    """
+    return f'{table}_y{month.year}m{month.month:02d}'
+
+
+def partition_month(table: str, name: str) -> typing.Optional[datetime.date]:
+    """Return the month of the partition, None for the default or foreign tables.
+
+    >>> partition_month('game_moves', 'game_moves_y2026m03')
+    datetime.date(2026, 3, 1)
+    >>> partition_month('game_moves', 'game_moves_default') is None
+    True
+    """
+    prefix = f'{table}_y'
+    if not name.startswith(prefix):
+        return None
+
+    try:
+        year, month = name[len(prefix):].split('m')
+        return datetime.date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+def create_partition_sql(table: str, month: datetime.date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS {partition_name(table, month)} '
+        f'PARTITION OF {table} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def list_partitions_sql(table: str) -> str:
+    return (
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON pg_inherits.inhparent = parent.oid '
+        'JOIN pg_class child ON pg_inherits.inhrelid = child.oid '
+        f"WHERE parent.relname = '{table}'"
+    )
+
+
+def detach_partition_sql(table: str, name: str) -> str:
+    return f'ALTER TABLE {table} DETACH PARTITION {name}'
+
+
+def drop_partition_sql(name: str) -> str:
+    return f'DROP TABLE IF EXISTS {name}'
+
+
+async def ensure_partitions(
+    session: sqlalchemy_async.AsyncSession,
+    current_month: datetime.date,
+    ahead: int,
+) -> typing.List[str]:
+    """Create the partitions of the current and the following months, return their names."""
+    names = []
+
+    for table in PARTITIONED_TABLES:
+        for months in range(ahead + 1):
+            month = add_months(current_month, months)
+            await session.execute(sqlalchemy.text(create_partition_sql(table, month)))
+            names.append(partition_name(table, month))
+
+    return names
+
+
+async def expire_partitions(
+    session: sqlalchemy_async.AsyncSession,
+    expire_before: datetime.date,
+    drop: bool,
+) -> typing.List[str]:
+    """Detach or drop the partitions of the months before the given one, return their names."""
+    names = []
+
+    for table in PARTITIONED_TABLES:
+        result = await session.execute(sqlalchemy.text(list_partitions_sql(table)))
+
+        for name in sorted(result.scalars()):
+            month = partition_month(table, name)
+            if month is None or month >= expire_before:
+                continue
+
+            # Detaching is a metadata change, no rows are deleted one by one
+            await session.execute(sqlalchemy.text(detach_partition_sql(table, name)))
+            if drop:
+                await session.execute(sqlalchemy.text(drop_partition_sql(name)))
+            names.append(name)
+
+    return names
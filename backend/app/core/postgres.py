@@ -71,3 +71,21 @@ def get_session() -> sqlalchemy_async.AsyncSession:
         raise PostgresException('PostgreSQL session was not initialized properly')
 
     return _AsyncScopedSession()
+
+
+def new_session() -> sqlalchemy_async.AsyncSession:
+    """Return a session of its own, not bound to the current task.
+
+    Use it as a context manager where the scoped session does not fit, e.g.
+    in response streaming done by another task than the request handling.
+    """
+    if _session_factory is None:
+        raise PostgresException('PostgreSQL session was not initialized properly')
+
+    return _session_factory()
+
+
+async def remove_session():
+    """Close the session of the current task, returning its connection to the pool."""
+    if _AsyncScopedSession is not None:
+        await _AsyncScopedSession.remove()
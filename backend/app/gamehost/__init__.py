@@ -0,0 +1,5 @@
+from .client import GameHostClient  # noqa: F401
+from .client import LocalGameHostClient  # noqa: F401
+from .engine import GameEngines  # noqa: F401
+from .engine import GameHostError  # noqa: F401
+from .service import GameHostService  # noqa: F401
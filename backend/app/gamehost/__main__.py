@@ -0,0 +1,15 @@
+from ..api.services import games
+from ..core import conf
+from ..core import services
+from . import service
+
+
+def main():
+    services.Worker(
+        service.GameHostService(games.host, socket_path=conf.gamehost.socket_path),
+        loglevel=conf.gamehost.log_level,
+    ).execute_from_commandline()
+
+
+if __name__ == '__main__':
+    main()
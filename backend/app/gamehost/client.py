@@ -0,0 +1,210 @@
+import asyncio
+import collections
+import itertools
+import logging
+import typing
+
+from . import engine
+from . import protocol
+
+
+logger = logging.getLogger(__name__)
+
+EventHandler = typing.Callable[[str, typing.Any], typing.Any]
+
+
+class _EventDispatcher:
+    """Passes the host events to `on_event` in the emission order of every match.
+
+    Every match with events to deliver has a queue drained by a task of its
+    own, so a slow client holds up the events of its own room only.
+    """
+
+    on_event: typing.Optional[EventHandler]
+
+    def __init__(self):
+        self._match_events: typing.Dict[typing.Any, typing.Deque] = {}
+        self._dispatch_tasks: typing.Set[asyncio.Task] = set()
+
+    def _queue_event(self, event: str, data: typing.Any):
+        match_id = data.get('match_id') if isinstance(data, dict) else None
+
+        queue = self._match_events.get(match_id)
+        if queue is not None:
+            queue.append((event, data))
+            return
+
+        queue = self._match_events[match_id] = collections.deque([(event, data)])
+        task = asyncio.create_task(self._dispatch_match_events(match_id, queue))
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch_match_events(self, match_id: typing.Any, queue: typing.Deque):
+        try:
+            while queue:
+                event, data = queue.popleft()
+                await self._dispatch_event(event, data)
+        finally:
+            # Nothing is awaited after the queue is found empty, no event is left behind
+            del self._match_events[match_id]
+
+    async def _wait_dispatched(self):
+        while self._dispatch_tasks:
+            await asyncio.gather(*self._dispatch_tasks, return_exceptions=True)
+
+    async def _dispatch_event(self, event: str, data: typing.Any):
+        if self.on_event is None:
+            return
+
+        try:
+            result = self.on_event(event, data)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.exception(f'Game host event {event!r} handling failed: {e!r}')
+
+
+class GameHostClient(_EventDispatcher):
+    """Game host IPC client used by the API processes.
+
+    Requests are pipelined over the single connection and matched with the
+    responses by id. Events pushed by the host are passed to `on_event`.
+
+    The connection is kept in the background: a lost connection fails the
+    pending requests with ConnectionError and is established again, so the
+    game host may restart without the API processes noticing but a few
+    failed requests.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        on_event: typing.Optional[EventHandler] = None,
+        reconnect_interval_seconds: float = 1,
+    ):
+        super().__init__()
+        self.socket_path = socket_path
+        self.on_event = on_event
+        self.reconnect_interval_seconds = reconnect_interval_seconds
+        self._ids = itertools.count(1)
+        self._pending: typing.Dict[int, asyncio.Future] = {}
+        self._task: typing.Optional[asyncio.Task] = None
+        self._writer: typing.Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self._task = asyncio.create_task(self._keep_connected())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _keep_connected(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(
+                    self.socket_path, limit=protocol.STREAM_LIMIT,
+                )
+            except OSError as e:
+                logger.warning(f'Game host is not reachable: {e!r}')
+                await asyncio.sleep(self.reconnect_interval_seconds)
+                continue
+
+            logger.info(f'Connected to the game host at {self.socket_path}')
+
+            try:
+                await self._read(reader)
+            finally:
+                self._writer.close()
+                self._writer = None
+                self._fail_pending()
+
+            logger.warning('Game host connection is lost')
+            await asyncio.sleep(self.reconnect_interval_seconds)
+
+    def _fail_pending(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Game host connection is lost'))
+        self._pending.clear()
+
+    async def _read(self, reader: asyncio.StreamReader):
+        while True:
+            try:
+                message = await protocol.read_message(reader)
+            except protocol.ProtocolError as e:
+                logger.error(f'Game host sent a malformed message: {e!r}')
+                continue
+            except (ValueError, ConnectionError) as e:
+                logger.error(f'Game host connection failed: {e!r}')
+                return
+
+            if message is None:
+                return
+
+            message = protocol.restore_player_keys(message)
+
+            if 'event' in message:
+                self._queue_event(message['event'], message.get('data'))
+                continue
+
+            future = self._pending.pop(message.get('id'), None)
+            if future is None or future.done():
+                continue
+
+            if message.get('ok'):
+                future.set_result(message.get('result'))
+            else:
+                future.set_exception(
+                    engine.GameHostError(message.get('error'), code=message.get('code')),
+                )
+
+    async def call(self, op: str, **args) -> typing.Any:
+        if self._writer is None:
+            raise ConnectionError('Game host is not connected')
+
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+
+        self._writer.write(protocol.encode({'id': request_id, 'op': op, 'args': args}))
+        await self._writer.drain()
+
+        return await future
+
+
+class LocalGameHostClient(_EventDispatcher):
+    """Serves the game host operations in-process, for a single process setup.
+
+    Events are dispatched by the tasks of their matches, like the events read
+    from the game host connection.
+    """
+
+    def __init__(self, host, on_event: typing.Optional[EventHandler] = None):
+        super().__init__()
+        self.host = host
+        self.on_event = on_event
+        self._host_started = False
+
+    async def connect(self, start_host: bool = True):
+        """Start dispatching the events, the benchmarks leave the host services stopped."""
+        self.host.engines.on_event = self._queue_event
+
+        self._host_started = start_host
+        if start_host:
+            await self.host.start()
+
+    async def close(self):
+        if self._host_started:
+            await self.host.stop()
+
+        # Let the events emitted so far reach the rooms
+        await self._wait_dispatched()
+
+    async def call(self, op: str, **args) -> typing.Any:
+        try:
+            operation = self.host.operations[op]
+        except KeyError:
+            raise engine.GameHostError(f'Unsupported operation: {op!r}')
+
+        return operation(**args)
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import logging
+import time
+import typing
+
+from .. import uno
+from ..uno import signals
+
+
+logger = logging.getLogger(__name__)
+
+
+class GameHostError(Exception):
+    """Raises when the game host rejects the operation.
+
+    The code tells the callers apart the reasons they react to differently.
+    """
+
+    def __init__(self, detail: str, code: typing.Optional[str] = None):
+        super().__init__(detail)
+        self.code = code
+
+
+class GameEngines:
+    """Game engines owned by the game host along with their turn timers.
+
+    Every operation returns plain data ready to be sent over the IPC channel.
+    The turn timers are kept in a heap of `(deadline, match_id, turn)` entries,
+    the entry of a turn which has already passed is discarded when popped.
+
+    Changes of the games are passed to `on_event` as `state`, `move` and
+    `evicted` events. State changing events carry the match sequence number,
+    so every API process stamps the room events alike.
+    """
+
+    def __init__(
+        self,
+        turn_timeout_seconds: float,
+        timer_interval_seconds: float = 0.5,
+        on_event: typing.Optional[typing.Callable[[str, dict], typing.Any]] = None,
+    ):
+        self.turn_timeout_seconds = turn_timeout_seconds
+        self.timer_interval_seconds = timer_interval_seconds
+        self.on_event = on_event
+        self._turns: typing.Dict[str, int] = {}
+        self._seqs: typing.Dict[str, int] = {}
+        self._deadlines: typing.List[typing.Tuple[float, str, int]] = []
+
+        signals.game_created.connect(self._on_game_created)
+        signals.player_joined.connect(self._on_player_joined)
+        signals.game_evicted.connect(self._on_game_evicted)
+
+    def _get_game(self, match_id: str) -> uno.UnoGame:
+        game = uno.get_game(match_id)
+        if game is None:
+            raise GameHostError(f'Match {match_id} is not found', code='game_not_found')
+
+        return game
+
+    def _emit(self, event: str, data: dict):
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def _next_seq(self, match_id: str) -> int:
+        seq = self._seqs[match_id] = self._seqs.get(match_id, 0) + 1
+        return seq
+
+    def seq(self, match_id: str) -> int:
+        """Return the sequence number of the last event of the match."""
+        return self._seqs.get(match_id, 0)
+
+    def set_seq(self, match_id: str, seq: int):
+        """Continue the numbering of a match handed off by another host."""
+        self._seqs[match_id] = seq
+
+    def _start_turn(self, game: uno.UnoGame, now: typing.Optional[float] = None):
+        turn = self._turns[game.match_id] = self._turns.get(game.match_id, 0) + 1
+
+        if game.is_active and self.turn_timeout_seconds > 0:
+            if now is None:
+                now = time.monotonic()
+            heapq.heappush(
+                self._deadlines,
+                (now + self.turn_timeout_seconds, game.match_id, turn),
+            )
+
+    def _emit_state(self, game: uno.UnoGame):
+        self._emit('state', {
+            'match_id': game.match_id,
+            'seq': self._next_seq(game.match_id),
+            'state': game.public_state(),
+        })
+
+    def _on_game_created(self, game: uno.UnoGame, **kwargs):
+        self._start_turn(game)
+        self._emit_state(game)
+
+    def _on_player_joined(self, game: uno.UnoGame, **kwargs):
+        self._emit_state(game)
+
+    def _on_game_evicted(self, game: uno.UnoGame, **kwargs):
+        self._turns.pop(game.match_id, None)
+        self._seqs.pop(game.match_id, None)
+        self._emit('evicted', {'match_id': game.match_id})
+
+    def _move_result(self, game: uno.UnoGame, hand_sizes: dict) -> dict:
+        return {
+            'match_id': game.match_id,
+            'seq': self._next_seq(game.match_id),
+            'state': game.public_state(),
+            # Only the hands which have changed, keyed by the player id
+            'hands': {
+                player_id: player.get_hand()
+                for player_id, player in game.players.items()
+                if hand_sizes.get(player_id) != len(player.cards)
+            },
+        }
+
+    def create(self, match_id: str, player_ids: typing.List[int]) -> dict:
+        if uno.get_game(match_id) is not None:
+            raise GameHostError(f'Match {match_id} already exists', code='game_exists')
+
+        return uno.UnoGame(player_ids, match_id).public_state()
+
+    def join(self, match_id: str, user_id: int) -> dict:
+        game = self._get_game(match_id)
+
+        try:
+            game.join(user_id)
+        except ValueError as e:
+            raise GameHostError(str(e), code='game_not_open')
+
+        return game.public_state()
+
+    def play(
+        self,
+        match_id: str,
+        user_id: int,
+        card: typing.Optional[dict] = None,
+        new_color: typing.Optional[str] = None,
+    ) -> dict:
+        """Play the card, or draw one if no card is given."""
+        game = self._get_game(match_id)
+        hand_sizes = {
+            player_id: len(player.cards) for player_id, player in game.players.items()
+        }
+
+        try:
+            game.play_card(user_id, card_raw=card, new_color=new_color)
+        except (ValueError, TypeError) as e:
+            raise GameHostError(str(e), code='invalid_move')
+
+        self._start_turn(game)
+
+        result = self._move_result(game, hand_sizes)
+        self._emit('move', result)
+
+        return result
+
+    def state(self, match_id: str, user_id: typing.Optional[int] = None) -> dict:
+        game = self._get_game(match_id)
+        player = game.players.get(user_id)
+
+        return {
+            'seq': self.seq(match_id),
+            'state': game.public_state(),
+            'hand': player.get_hand() if player is not None else None,
+        }
+
+    def evict(self, match_id: str) -> bool:
+        return uno.evict_game(match_id) is not None
+
+    def expire_turns(self, now: typing.Optional[float] = None) -> typing.List[dict]:
+        """Make the players who ran out of time draw a card, return the move results."""
+        if now is None:
+            now = time.monotonic()
+
+        results = []
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, match_id, turn = heapq.heappop(self._deadlines)
+            game = uno.get_game(match_id)
+
+            if game is None or not game.is_active or self._turns.get(match_id) != turn:
+                continue
+
+            logger.debug(f'Turn of {game.current_player.user_id} timed out in {match_id!r}')
+            results.append(self.play(match_id, game.current_player.user_id))
+
+        return results
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.timer_interval_seconds)
+            try:
+                self.expire_turns()
+            except Exception as e:
+                logger.exception(f'Turn timers failed: {e!r}')
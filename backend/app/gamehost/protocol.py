@@ -0,0 +1,82 @@
+"""Game host IPC protocol.
+
+Messages are JSON objects delimited by newlines, exchanged over a unix
+socket. Requests carry the id echoed by the response:
+
+    {"id": 1, "op": "play", "args": {"match_id": "...", "user_id": 1, ...}}
+    {"id": 1, "ok": true, "result": {...}}
+    {"id": 1, "ok": false, "error": "Invalid player: not their turn", "code": "invalid_move"}
+
+The host also pushes events nobody has asked for (e.g. turn timeouts) to
+every connected client, events carry no id:
+
+    {"event": "move", "data": {...}}
+"""
+import asyncio
+import json
+import typing
+
+
+# Game states with many players and cards still fit well under the limit
+STREAM_LIMIT = 2 ** 20
+
+# Objects keyed by the player id, JSON turns their keys into strings
+PLAYER_KEYED = ('hands', 'hand_sizes')
+
+
+class ProtocolError(Exception):
+    """Raises when the peer sent a malformed message."""
+
+
+def encode(message: dict) -> bytes:
+    """
+    >>> encode({'id': 1, 'ok': True})
+    b'{"id":1,"ok":true}\\n'
+    """
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+def decode(line: bytes) -> dict:
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        raise ProtocolError(f'Malformed message: {e}')
+
+    if not isinstance(message, dict):
+        raise ProtocolError('Message should be an object')
+
+    return message
+
+
+def restore_player_keys(value: typing.Any) -> typing.Any:
+    """Turn the player ids keying the decoded hands back into ints.
+
+    >>> restore_player_keys({'state': {'hand_sizes': {'1': 7}}, 'hands': {'2': []}})
+    {'state': {'hand_sizes': {1: 7}}, 'hands': {2: []}}
+    """
+    if isinstance(value, list):
+        return [restore_player_keys(item) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    return {
+        key: (
+            {int(player_id): item for player_id, item in item.items()}
+            if key in PLAYER_KEYED and isinstance(item, dict) else restore_player_keys(item)
+        )
+        for key, item in value.items()
+    }
+
+
+async def read_message(reader: asyncio.StreamReader) -> typing.Optional[dict]:
+    """Read the next message, return None once the peer has closed the channel.
+
+    Lines longer than the stream limit raise ValueError, the rest of such a
+    line is left in the stream, so the channel should be closed.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+
+    return decode(line)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import typing
+
+import mode
+
+from ..core import conf
+from ..core import postgres
+from . import engine
+from . import protocol
+
+
+logger = logging.getLogger(__name__)
+
+
+class GameHostService(mode.Service):
+    """Serves the game host operations to the API processes over a unix socket.
+
+    Requests of every connection are handled one by one in the arrival
+    order, the operations are synchronous so no locking is needed. Events
+    of the engines are broadcast to every connection.
+    """
+
+    def __init__(self, host, socket_path: str, **kwargs):
+        self.host = host
+        self.socket_path = socket_path
+        self._server: typing.Optional[asyncio.AbstractServer] = None
+        self._writers: typing.Set[asyncio.StreamWriter] = set()
+        self._connection_tasks: typing.Set[asyncio.Task] = set()
+        super().__init__(**kwargs)
+
+    async def on_start(self) -> None:
+        await postgres.connect(conf.postgres.uri)
+
+        self.host.engines.on_event = self.broadcast
+        await self.host.start()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path, limit=protocol.STREAM_LIMIT,
+        )
+        logger.info(f'Game host is listening on {self.socket_path}')
+
+    async def on_stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        # Closed connections read the end of stream, so their handlers return
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        await self.host.stop()
+        await postgres.disconnect()
+
+    def handle_request(self, request: dict) -> dict:
+        response = {'id': request.get('id')}
+
+        try:
+            operation = self.host.operations[request.get('op')]
+        except (KeyError, TypeError):
+            response.update(ok=False, error=f'Unsupported operation: {request.get("op")!r}')
+            return response
+
+        try:
+            response['result'] = operation(**request.get('args', {}))
+            response['ok'] = True
+        except engine.GameHostError as e:
+            response.update(ok=False, error=str(e), code=e.code)
+        except TypeError as e:
+            response.update(ok=False, error=f'Invalid arguments: {e}')
+        except Exception as e:
+            logger.exception(f'Game host operation {request["op"]!r} failed: {e!r}')
+            response.update(ok=False, error='Internal error')
+
+        return response
+
+    async def _handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        self._writers.add(writer)
+
+        try:
+            while True:
+                try:
+                    request = await protocol.read_message(reader)
+                except protocol.ProtocolError as e:
+                    writer.write(protocol.encode({'id': None, 'ok': False, 'error': str(e)}))
+                    continue
+                except ValueError as e:
+                    # Over the stream limit, the rest of the line is still to be read
+                    logger.error(f'Closing game host connection: {e!r}')
+                    break
+
+                if request is None:
+                    break
+
+                writer.write(protocol.encode(self.handle_request(request)))
+                await writer.drain()
+        except ConnectionError as e:
+            logger.debug(f'Game host connection is lost: {e!r}')
+        finally:
+            self._connection_tasks.discard(task)
+            self._writers.discard(writer)
+            writer.close()
+
+    def broadcast(self, event: str, data: typing.Any):
+        message = protocol.encode({'event': event, 'data': data})
+
+        for writer in list(self._writers):
+            writer.write(message)
@@ -0,0 +1,35 @@
+"""add game moves
+
+Revision ID: 3b9e5f1c7a20
+Revises: f0aa41eded25
+Create Date: 2026-10-19 09:12:41.503217+00:00
+"""
+
+import alembic.op as op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '3b9e5f1c7a20'
+down_revision = 'f0aa41eded25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_moves',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('match_id', sa.Text(), nullable=False),
+        sa.Column('move_number', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('card', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('played_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'match_id', 'move_number', name='uq_game_moves_match_id_move_number',
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table('game_moves')
@@ -0,0 +1,30 @@
+"""add player ratings
+
+Revision ID: 5e8a2c4d9f13
+Revises: 9c41d7e2b865
+Create Date: 2026-10-19 13:05:27.640915+00:00
+"""
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+revision = '5e8a2c4d9f13'
+down_revision = '9c41d7e2b865'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('player_ratings',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Float(), nullable=False),
+        sa.Column('games', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('player_ratings')
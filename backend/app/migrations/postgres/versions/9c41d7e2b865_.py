@@ -0,0 +1,135 @@
+"""partition move history by month
+
+Revision ID: 9c41d7e2b865
+Revises: 3b9e5f1c7a20
+Create Date: 2026-10-19 11:40:03.118529+00:00
+
+Moves and finished matches are range partitioned by month, so expired
+months are detached or dropped as a whole (see `app.cli partitions`)
+instead of being deleted row by row. Time columns are indexed with BRIN,
+which stays tiny for append-only data inserted in time order.
+"""
+import datetime
+
+import alembic.op as op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '9c41d7e2b865'
+down_revision = '3b9e5f1c7a20'
+branch_labels = None
+depends_on = None
+
+# Partitions created up front, later ones are created by the partitions command
+MONTHS_AHEAD = 2
+
+
+def _months():
+    today = datetime.date.today()
+    for offset in range(MONTHS_AHEAD + 1):
+        index = today.year * 12 + today.month - 1 + offset
+        yield datetime.date(index // 12, index % 12 + 1, 1), datetime.date(
+            (index + 1) // 12, (index + 1) % 12 + 1, 1,
+        )
+
+
+def _create_partitions(table):
+    # Rows outside of the created months land here instead of failing the insert
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    for month, next_month in _months():
+        op.execute(
+            f'CREATE TABLE {table}_y{month.year}m{month.month:02d} PARTITION OF {table} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')",
+        )
+
+
+def _rename_relations(table):
+    # Free the names of the constraints and the sequence for the new table
+    op.execute(
+        f'ALTER TABLE {table} '
+        f'RENAME CONSTRAINT uq_game_moves_match_id_move_number TO uq_{table}',
+    )
+    op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT game_moves_pkey TO {table}_pkey')
+    op.execute(f'ALTER SEQUENCE game_moves_id_seq RENAME TO {table}_id_seq')
+
+
+def upgrade():
+    op.rename_table('game_moves', 'game_moves_unpartitioned')
+    _rename_relations('game_moves_unpartitioned')
+    op.execute('CREATE SEQUENCE game_moves_id_seq AS bigint')
+
+    op.create_table('game_moves',
+        sa.Column('id', sa.BigInteger(), server_default=sa.text("nextval('game_moves_id_seq')"), nullable=False),
+        sa.Column('match_id', sa.Text(), nullable=False),
+        sa.Column('move_number', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('card', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('played_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id', 'played_at'),
+        sa.UniqueConstraint(
+            'match_id', 'move_number', 'played_at', name='uq_game_moves_match_id_move_number',
+        ),
+        postgresql_partition_by='RANGE (played_at)',
+    )
+    op.execute('ALTER SEQUENCE game_moves_id_seq OWNED BY game_moves.id')
+    op.create_index(
+        'ix_game_moves_played_at',
+        'game_moves',
+        ['played_at'],
+        unique=False,
+        postgresql_using='brin',
+    )
+    _create_partitions('game_moves')
+
+    op.execute(
+        'INSERT INTO game_moves (match_id, move_number, player_id, card, played_at) '
+        'SELECT match_id, move_number, player_id, card, played_at '
+        'FROM game_moves_unpartitioned ORDER BY id',
+    )
+    op.drop_table('game_moves_unpartitioned')
+
+    op.create_table('matches',
+        sa.Column('match_id', sa.Text(), nullable=False),
+        sa.Column('player_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('winner_id', sa.Integer(), nullable=True),
+        sa.Column('moves_count', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('match_id', 'finished_at'),
+        postgresql_partition_by='RANGE (finished_at)',
+    )
+    op.create_index(
+        'ix_matches_finished_at',
+        'matches',
+        ['finished_at'],
+        unique=False,
+        postgresql_using='brin',
+    )
+    _create_partitions('matches')
+
+
+def downgrade():
+    op.drop_table('matches')
+
+    op.rename_table('game_moves', 'game_moves_partitioned')
+    _rename_relations('game_moves_partitioned')
+    op.create_table('game_moves',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('match_id', sa.Text(), nullable=False),
+        sa.Column('move_number', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('card', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('played_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'match_id', 'move_number', name='uq_game_moves_match_id_move_number',
+        ),
+    )
+    op.execute(
+        'INSERT INTO game_moves (match_id, move_number, player_id, card, played_at) '
+        'SELECT DISTINCT ON (match_id, move_number) match_id, move_number, player_id, '
+        'card, played_at FROM game_moves_partitioned ORDER BY match_id, move_number, id',
+    )
+    op.drop_table('game_moves_partitioned')
@@ -0,0 +1,49 @@
+"""add player stats
+
+Revision ID: a17f3e6b2d48
+Revises: 5e8a2c4d9f13
+Create Date: 2026-10-19 14:21:52.907406+00:00
+"""
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+revision = 'a17f3e6b2d48'
+down_revision = '5e8a2c4d9f13'
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    'games',
+    'wins',
+    'moves',
+    'cards_played',
+    'cards_drawn',
+    'plus_fours_dealt',
+    'hand_size_total',
+    'blue_played',
+    'green_played',
+    'red_played',
+    'yellow_played',
+    'black_played',
+]
+
+
+def upgrade():
+    op.add_column('game_moves', sa.Column('hand_size', sa.Integer(), nullable=True))
+
+    op.create_table('player_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        *(
+            sa.Column(counter, sa.BigInteger(), server_default='0', nullable=False)
+            for counter in COUNTERS
+        ),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('player_stats')
+    op.drop_column('game_moves', 'hand_size')
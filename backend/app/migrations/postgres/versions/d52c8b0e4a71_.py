@@ -0,0 +1,23 @@
+"""add user token epochs
+
+Revision ID: d52c8b0e4a71
+Revises: a17f3e6b2d48
+Create Date: 2026-10-19 16:05:12.518730+00:00
+"""
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+revision = 'd52c8b0e4a71'
+down_revision = 'a17f3e6b2d48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('token_epoch', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('users', 'token_epoch')
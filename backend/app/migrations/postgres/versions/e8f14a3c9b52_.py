@@ -0,0 +1,30 @@
+"""add access tokens user index
+
+Revision ID: e8f14a3c9b52
+Revises: d52c8b0e4a71
+Create Date: 2026-10-19 17:12:40.226184+00:00
+"""
+
+import alembic.op as op
+
+
+revision = 'e8f14a3c9b52'
+down_revision = 'd52c8b0e4a71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        op.f('ix_accesstokens_user_id'),
+        'accesstokens',
+        ['user_id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f('ix_accesstokens_user_id'),
+        table_name='accesstokens',
+    )
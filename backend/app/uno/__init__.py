@@ -1,2 +1,6 @@
 from .client import UnoDriver  # noqa: F401
-from .client import UnoGame  # noqa: F401
\ No newline at end of file
+from .client import UnoGame  # noqa: F401
+from .client import evict_game  # noqa: F401
+from .client import get_game  # noqa: F401
+from .client import get_player_game  # noqa: F401
+from .client import list_games  # noqa: F401
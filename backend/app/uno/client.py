@@ -5,19 +5,24 @@ from __future__ import annotations
 
 import logging
 import random
+import time
 from itertools import chain, product, repeat
 from typing import Optional
 from . import enums
 from . import schemas
+from . import signals
 
 
 _game_sessions = {}
+# Match ids of the games every player is seated in, until the game is over
+_player_games: dict[int, set[str]] = {}
 logger = logging.getLogger(__name__)
 
 
 class UnoCard:
     color: enums.CardColors
     suit: enums.CardSuits
+    temp_color: Optional[enums.CardColors] = None
 
     def __init__(self, color: enums.CardColors, suit: enums.CardSuits):
         self.color = color
@@ -44,6 +49,25 @@ class UnoCard:
     def __str__(self):
         return f'{self.color}:{str(self.suit)}'
 
+    @property
+    def effective_color(self) -> enums.CardColors:
+        """Color the next card has to match, chosen color for black cards."""
+        return self.temp_color or self.color
+
+    def to_dict(self) -> dict:
+        return {
+            'color': self.color.value,
+            'suit': self.suit.value,
+            'new_color': self.temp_color.value if self.temp_color else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> UnoCard:
+        card = cls(enums.CardColors(data['color']), enums.CardSuits(data['suit']))
+        if data.get('new_color'):
+            card.temp_color = enums.CardColors(data['new_color'])
+        return card
+
 
 class UNOPlayer:
     user_id = None
@@ -72,12 +96,16 @@ class UNOPlayer:
 
         return [str(card) for card in self.cards]
 
+    def get_hand(self) -> list[dict]:
+        return [card.to_dict() for card in self.cards]
+
 
 class CardDeck:
     _cards: list[UnoCard] = None
-    _played_cards: list[UnoCard] = []
+    _played_cards: list[UnoCard] = None
 
     def __init__(self):
+        self._played_cards = []
         self.build_deck()
 
     def build_deck(self):
@@ -94,7 +122,7 @@ class CardDeck:
         if self._cards:
             return self._cards.pop()
         else:
-            new_deck = self._played_cards[-2:-1]
+            new_deck = self._played_cards[:-1]
             random.shuffle(new_deck)
             self._cards = new_deck
             self._played_cards = self._played_cards[-1:]
@@ -122,8 +150,9 @@ class CardDeck:
         try:
             return any([
                 self.last_played_card is None,
+                card.color == enums.CardColors.BLACK,
                 self.last_played_card.suit == card.suit,
-                self.last_played_card.color == card.color,
+                self.last_played_card.effective_color == card.color,
             ])
         except AttributeError:
             return True
@@ -177,6 +206,12 @@ class UNOGameCycle:
         """
         self._reverse = not self._reverse
 
+    def append(self, item):
+        """
+        Add the item to the end of the cycle.
+        """
+        self._items.append(item)
+
 
 class UnoGame:
     players: dict[int, UNOPlayer] = None
@@ -184,10 +219,15 @@ class UnoGame:
     _deck: CardDeck
     _winner = None
     max_players: int = 4
+    finished_at: Optional[float] = None
+    moves_count: int = 0
+    # Wall clock time, unlike the monotonic finished_at it is valid across processes
+    started_at: Optional[float] = None
     _current_player: UNOPlayer
 
     def __init__(self, player_ids, match_id: str):
         self.match_id = match_id
+        self.started_at = time.time()
         self._deck = CardDeck()
         self.players = dict()
 
@@ -197,13 +237,18 @@ class UnoGame:
         self._player_cycle = UNOGameCycle(self.players.values())
         self._current_player = next(self._player_cycle)
         temp_card = self._current_player.cards[-1]
-        self.play_card(self._current_player.user_id, card_raw={
-            'suit': temp_card.suit,
-            'color': temp_card.color,
-            'new_color': random.choice(list(enums.CardColors)),
-        })
+        self.play_card(
+            self._current_player.user_id,
+            card_raw={
+                'suit': temp_card.suit,
+                'color': temp_card.color,
+            },
+            new_color=random.choice(enums.CardColors.playable()),
+        )
         self._winner = None
         _game_sessions[match_id] = self
+        _seat_players(self)
+        signals.game_created.send(self)
 
     def __next__(self):
         """
@@ -223,10 +268,93 @@ class UnoGame:
     def is_active(self):
         return all(len(player.cards) > 0 for player in self.players.values())
 
+    @property
+    def is_open(self):
+        return self.is_active and len(self.players) < self.max_players
+
+    def join(self, player_id: int) -> UNOPlayer:
+        """Deal the hand to the new player, taking the last seat of the cycle."""
+        self._validate_player_id(player_id)
+
+        if player_id in self.players:
+            return self.players[player_id]
+
+        if not self.is_open:
+            raise ValueError(f'Match {self.match_id} is not open for joining')
+
+        player = self.players[player_id] = UNOPlayer(player_id, self._deck.deal_hand())
+        self._player_cycle.append(player)
+        _seat_players(self)
+        signals.player_joined.send(self, player_id=player_id)
+
+        return player
+
     @property
     def current_player(self):
         return self._current_player
 
+    def to_dict(self) -> dict:
+        """Full game state including the hands and the deck, for handing the game off."""
+        return {
+            'match_id': self.match_id,
+            'players': [
+                {'user_id': player.user_id, 'cards': player.get_hand()}
+                for player in self._player_cycle._items
+            ],
+            'cycle': {'pos': self._player_cycle.pos, 'reverse': self._player_cycle._reverse},
+            'current_player': self._current_player.user_id,
+            'cards': [card.to_dict() for card in self._deck._cards],
+            'played_cards': [card.to_dict() for card in self._deck._played_cards],
+            'winner': self._winner.user_id if self._winner else None,
+            'moves_count': self.moves_count,
+            'started_at': self.started_at,
+        }
+
+    @classmethod
+    def restore(cls, data: dict) -> UnoGame:
+        """Register the game handed off by another process, see `to_dict`."""
+        game = cls.__new__(cls)
+        game.match_id = data['match_id']
+
+        game._deck = CardDeck.__new__(CardDeck)
+        game._deck._cards = [UnoCard.from_dict(card) for card in data['cards']]
+        game._deck._played_cards = [UnoCard.from_dict(card) for card in data['played_cards']]
+
+        game.players = {
+            player['user_id']: UNOPlayer(
+                player['user_id'], [UnoCard.from_dict(card) for card in player['cards']],
+            )
+            for player in data['players']
+        }
+        game._player_cycle = UNOGameCycle(game.players.values())
+        game._player_cycle._reverse = data['cycle']['reverse']
+        if data['cycle']['pos'] is not None:
+            game._player_cycle.pos = data['cycle']['pos']
+
+        game._current_player = game.players[data['current_player']]
+        game._winner = game.players.get(data['winner'])
+        game.moves_count = data.get('moves_count', 0)
+        game.started_at = data.get('started_at')
+
+        _game_sessions[game.match_id] = game
+        if game.is_active:
+            _seat_players(game)
+        signals.game_created.send(game)
+
+        return game
+
+    def public_state(self) -> dict:
+        """Game state visible to every participant, hands are not disclosed."""
+        return {
+            'match_id': self.match_id,
+            'current_player': self.current_player.user_id,
+            'current_card': self.current_card.to_dict() if self.current_card else None,
+            'hand_sizes': {
+                player_id: len(player.cards) for player_id, player in self.players.items()
+            },
+            'winner': self._winner.user_id if self._winner else None,
+        }
+
     def validate_player_turn(self, player: UNOPlayer):
         if self.current_player != player:
             raise ValueError('Invalid player: not their turn')
@@ -248,7 +376,7 @@ class UnoGame:
             )
 
     def match_card(self, card) -> Optional[UnoCard]:
-        validated_data =  schemas.UnoCardModel(**card)
+        validated_data = schemas.UnoCardModel(**(card or {}))
 
         if not validated_data.color and not validated_data.suit:
             return None
@@ -278,13 +406,14 @@ class UnoGame:
 
         if card is None:
             self._pick_up(_player, 1)
+            self._record_move(_player, None)
             next(self)
             return
 
         if not _player.has_card(card):
             logger.warning(
                 'Exception during player\'s card validation, '
-                f'attempted card {card.color}: {card.suit}',
+                f'attempted card {card.color}: {card.suit}, '
                 f'user cards {[str(user_card) for user_card in self.current_player.cards]}',
             )
             raise ValueError(
@@ -302,7 +431,12 @@ class UnoGame:
             if not new_color:
                 raise ValueError(f'New color is not passed to a function {new_color = }')
 
-            if new_color not in enums.CardColors:
+            try:
+                new_color = enums.CardColors(new_color)
+            except ValueError:
+                new_color = None
+
+            if new_color not in enums.CardColors.playable():
                 raise ValueError(
                     'Invalid new_color: must be red, yellow, green or blue'
                 )
@@ -313,28 +447,44 @@ class UnoGame:
         card_color = played_card.color
         card_type = played_card.suit
 
-        if card_color == 'black':
+        if card_color == enums.CardColors.BLACK:
             self.current_card.temp_color = new_color
 
-            if card_type == '+4':
+            if card_type == enums.CardSuits.PLUS_FOUR:
                 next(self)
                 self._pick_up(self.current_player, 4)
 
-        elif card_type == 'reverse':
+        elif card_type == enums.CardSuits.REVERSE:
             self._player_cycle.reverse()
 
-        elif card_type == 'skip':
+        elif card_type == enums.CardSuits.SKIP:
             next(self)
 
-        elif card_type == '+2':
+        elif card_type == enums.CardSuits.PLUS_TWO:
             next(self)
             self._pick_up(self.current_player, 2)
 
+        self._record_move(_player, played_card)
+
         if self.is_active:
             next(self)
         else:
             self._winner = _player
+            self.finished_at = time.monotonic()
+            _unseat_players(self)
             self._print_winner()
+            signals.game_finished.send(self)
+
+    def _record_move(self, player: UNOPlayer, card: Optional[UnoCard]):
+        """Count the move and announce it, card is None for drawing a card."""
+        self.moves_count += 1
+        signals.move_played.send(
+            self,
+            move_number=self.moves_count,
+            player_id=player.user_id,
+            card=card.to_dict() if card is not None else None,
+            hand_size=len(player.cards),
+        )
 
     def _pick_up(self, player: UNOPlayer, n: int):
         """Take n cards from the bottom of the deck and add it to the player's hand.
@@ -354,6 +504,52 @@ class UnoGame:
         print(self._winner)
 
 
+def _seat_players(game: UnoGame):
+    for player_id in game.players:
+        _player_games.setdefault(player_id, set()).add(game.match_id)
+
+
+def _unseat_players(game: UnoGame):
+    for player_id in game.players:
+        match_ids = _player_games.get(player_id)
+        if match_ids is None:
+            continue
+
+        match_ids.discard(game.match_id)
+        if not match_ids:
+            del _player_games[player_id]
+
+
+def get_player_game(player_id: int) -> Optional[UnoGame]:
+    """Return an active game the player is seated in."""
+    for match_id in _player_games.get(player_id, ()):
+        game = _game_sessions.get(match_id)
+        if game is not None and game.is_active:
+            return game
+
+    return None
+
+
+def get_game(match_id: str) -> Optional[UnoGame]:
+    """Return the game session of the match hosted by this process."""
+    return _game_sessions.get(match_id)
+
+
+def list_games() -> list[UnoGame]:
+    return list(_game_sessions.values())
+
+
+def evict_game(match_id: str) -> Optional[UnoGame]:
+    """Forget the game session of the match."""
+    game = _game_sessions.pop(match_id, None)
+
+    if game is not None:
+        _unseat_players(game)
+        signals.game_evicted.send(game)
+
+    return game
+
+
 class UnoDriver:
     game: UnoGame = None
 
@@ -53,3 +53,8 @@ class CardColors(enum.Enum):
     RED = 'RED'
     YELLOW = 'YELLOW'
     BLACK = 'BLACK'
+
+    @classmethod
+    def playable(cls):
+        """Colors which may be chosen when a black card is played."""
+        return [cls.BLUE, cls.GREEN, cls.RED, cls.YELLOW]
@@ -0,0 +1,15 @@
+"""Game lifecycle signals.
+
+Receivers are called synchronously with the game as the sender, so they
+should only record the change and leave any I/O to background services.
+"""
+import blinker
+
+
+_signals = blinker.Namespace()
+
+game_created = _signals.signal('game-created')
+player_joined = _signals.signal('player-joined')
+move_played = _signals.signal('move-played')
+game_finished = _signals.signal('game-finished')
+game_evicted = _signals.signal('game-evicted')
@@ -1,55 +1,493 @@
-from collections import defaultdict
+import asyncio
+import collections
+import dataclasses
+import json
+import logging
+import time
+import typing
 
+import cacheout
 from starlette.websockets import WebSocket
 
+from ..core import conf
+from . import compression
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(eq=False)
+class Connection:
+    """Room member connection along with its negotiated options."""
+
+    websocket: WebSocket
+    compressed: bool = False
+    user_id: typing.Optional[int] = None
+    # Set when the missed events were replayed on connect, so no snapshot is needed
+    resumed: bool = False
+
+
+class Room:
+    """Room members along with the events waiting for the coalesced delivery.
+
+    Recently pushed events are kept in the bounded replay buffer, so the
+    reconnecting clients may receive only the events they have missed.
+    """
+
+    def __init__(self, flush_window: float = 0, replay_buffer_size: int = 0, seq: int = 0):
+        self.members: typing.List[Connection] = []
+        self.flush_window = flush_window
+        self.pending: typing.List[str] = []
+        self.pending_pushed_at: typing.List[float] = []
+        self.flush_handle: typing.Optional[asyncio.TimerHandle] = None
+        # Set while the room has no connections, the room is dropped when it fires
+        self.expire_handle: typing.Optional[asyncio.TimerHandle] = None
+        self.seq = seq
+        self.history: typing.Deque[typing.Tuple[int, str]] = collections.deque(
+            maxlen=replay_buffer_size,
+        )
+
+        # Spectator tier, fed with delayed snapshots instead of the room events
+        self.spectators: typing.List[Connection] = []
+        self.spectator_backlog: typing.Deque[typing.Tuple[float, typing.Any]] = (
+            collections.deque()
+        )
+        self.spectator_frame: typing.Optional[str] = None
+        self.spectator_handle: typing.Optional[asyncio.TimerHandle] = None
+
+    def due_spectator_state(self, now: float, delay: float) -> typing.Optional[typing.Any]:
+        """Pop the snapshots published at least delay seconds ago, return the latest one.
+
+        >>> room = Room()
+        >>> room.spectator_backlog.extend([(0, 'a'), (1, 'b'), (5, 'c')])
+        >>> room.due_spectator_state(now=3, delay=2)
+        'b'
+        >>> room.due_spectator_state(now=3, delay=2) is None
+        True
+        >>> len(room.spectator_backlog)
+        1
+        """
+        state = None
+
+        while self.spectator_backlog and self.spectator_backlog[0][0] <= now - delay:
+            _, state = self.spectator_backlog.popleft()
+
+        return state
+
+    def missed_events(self, last_seq: int) -> typing.Optional[typing.List[str]]:
+        """Return the events pushed after the sequence number.
+
+        Return None if the events were already evicted from the replay buffer.
+
+        >>> room = Room(replay_buffer_size=2)
+        >>> for seq in range(1, 4):
+        ...     room.history.append((seq, str(seq)))
+        >>> room.seq = 3
+        >>> room.missed_events(2)
+        ['3']
+        >>> room.missed_events(0) is None
+        True
+        >>> room.missed_events(5) is None
+        True
+        """
+        if last_seq == self.seq:
+            return []
+
+        # Sequence numbers of another room incarnation, e.g. before a restart
+        if last_seq > self.seq:
+            return None
+
+        if not self.history or self.history[0][0] > last_seq + 1:
+            return None
+
+        return [event for seq, event in self.history if seq > last_seq]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.members and not self.spectators
+
 
 class GameSessionsManager:
     """
-        Manages chat room sessions and members along with message routing
+        Manages game room sessions and members along with message routing.
+
+        Every pushed event is stamped with the room sequence number, JSON
+        encoded once and delivered to room members as a JSON array of events.
+        When the room has a non-zero flush window, events pushed within the
+        window are coalesced into a single frame per recipient, urgent events
+        flush the room immediately.
+
+        Connections which negotiated the preset dictionary subprotocol receive
+        the frame compressed, compression is done once per broadcast.
+
+        Spectators are kept apart from the room members: they receive only the
+        published spectator snapshots, delayed by the spectator delay and
+        coalesced so that one frame carries the latest due snapshot. The frame
+        is encoded once and shared by every spectator of the room.
+
+        Rooms left without connections are dropped after the idle TTL. Their
+        last sequence numbers are remembered, so a room created again for the
+        same match continues the numbering and stale resumes get a snapshot.
     """
 
-    def __init__(self):
-        self.connections: dict = defaultdict(dict)
-        self.generator = self.get_notification_generator()
+    def __init__(
+        self,
+        flush_window_ms: typing.Optional[int] = None,
+        latency_samples: typing.Optional[int] = None,
+        compressor: typing.Optional[compression.DictionaryCompressor] = None,
+        replay_buffer_size: typing.Optional[int] = None,
+        spectator_delay_ms: typing.Optional[int] = None,
+        room_idle_ttl_seconds: typing.Optional[float] = None,
+    ):
+        if flush_window_ms is None:
+            flush_window_ms = conf.websocket.flush_window_ms
+        if latency_samples is None:
+            latency_samples = conf.websocket.latency_samples
+        if replay_buffer_size is None:
+            replay_buffer_size = conf.websocket.replay_buffer_size
+        if spectator_delay_ms is None:
+            spectator_delay_ms = conf.websocket.spectator_delay_ms
+        if room_idle_ttl_seconds is None:
+            room_idle_ttl_seconds = conf.websocket.room_idle_ttl_seconds
+
+        self.rooms: typing.Dict[str, Room] = {}
+        self.default_flush_window = flush_window_ms / 1000
+        self.delivery_latencies = collections.deque(maxlen=latency_samples)
+        self.frames_sent = 0
+        self.compressor = compressor
+        self.replay_buffer_size = replay_buffer_size
+        self.spectator_delay = spectator_delay_ms / 1000
+        self.room_idle_ttl_seconds = room_idle_ttl_seconds
+        self._retired_seqs = cacheout.Cache(maxsize=conf.websocket.retired_rooms_size, ttl=0)
+        self._flush_tasks: typing.Set[asyncio.Task] = set()
+
+    def get_room(self, room_name: str) -> Room:
+        try:
+            return self.rooms[room_name]
+        except KeyError:
+            room = self.rooms[room_name] = Room(
+                self.default_flush_window,
+                self.replay_buffer_size,
+                seq=self._retired_seqs.get(room_name, 0),
+            )
+            # Rooms are created by the pushes too, nobody may ever connect to them
+            self._schedule_expiry(room_name, room)
+            return room
+
+    def _schedule_expiry(self, room_name: str, room: Room):
+        if room.expire_handle is None and room.is_empty:
+            room.expire_handle = asyncio.get_running_loop().call_later(
+                self.room_idle_ttl_seconds, self._expire_room, room_name,
+            )
+
+    def _cancel_expiry(self, room: Room):
+        if room.expire_handle is not None:
+            room.expire_handle.cancel()
+            room.expire_handle = None
+
+    def _expire_room(self, room_name: str):
+        room = self.rooms.get(room_name)
+        if room is None:
+            return
 
-    async def get_notification_generator(self):
-        while True:
-            message = yield
-            msg = message["message"]
-            room_name = message["room_name"]
-            await self._notify(msg, room_name)
+        room.expire_handle = None
+        if room.is_empty:
+            logger.debug(f'Dropping idle room {room_name!r}')
+            self.close_room(room_name)
 
-    def get_members(self, room_name):
+    def get_members(self, room_name: str) -> typing.List[Connection]:
         try:
-            return self.connections[room_name]
-        except Exception:
+            return self.rooms[room_name].members
+        except KeyError:
+            return []
+
+    def last_seq(self, room_name: str) -> int:
+        """Return the sequence number of the last event pushed to the room."""
+        try:
+            return self.rooms[room_name].seq
+        except KeyError:
+            return 0
+
+    def advance_seq(self, room_name: str, seq: int):
+        """Catch the room up with the sequence number of the snapshot sent to a member."""
+        room = self.rooms.get(room_name)
+        if room is not None and room.seq < seq:
+            room.seq = seq
+
+    def set_flush_window(self, room_name: str, flush_window_ms: int):
+        """Configure the coalescing window of the room, zero disables coalescing."""
+        self.get_room(room_name).flush_window = flush_window_ms / 1000
+
+    async def push(
+        self,
+        msg: typing.Any,
+        room_name: str,
+        urgent: bool = False,
+        seq: typing.Optional[int] = None,
+    ):
+        """Deliver the event to the room members.
+
+        Latency-critical events (e.g. the turn passing to a player) should be
+        pushed as urgent, flushing them along with everything pending. Events
+        numbered by the game host carry their sequence number, the others get
+        the next one of the room.
+        """
+        room = self.get_room(room_name)
+        room.seq = room.seq + 1 if seq is None else seq
+
+        if isinstance(msg, dict):
+            event = json.dumps({'seq': room.seq, **msg})
+        else:
+            event = json.dumps({'seq': room.seq, 'data': msg})
+
+        room.history.append((room.seq, event))
+        room.pending.append(event)
+        room.pending_pushed_at.append(time.perf_counter())
+
+        if urgent or room.flush_window <= 0:
+            await self.flush(room_name)
+        elif room.flush_handle is None:
+            room.flush_handle = asyncio.get_running_loop().call_later(
+                room.flush_window, self._schedule_flush, room_name,
+            )
+
+    async def flush(self, room_name: str):
+        """Send all the pending room events within a single frame."""
+        room = self.rooms.get(room_name)
+        if room is None or not room.pending:
+            return
+
+        if room.flush_handle is not None:
+            room.flush_handle.cancel()
+            room.flush_handle = None
+
+        frame = f'[{",".join(room.pending)}]'
+        pushed_at = room.pending_pushed_at
+        room.pending = []
+        room.pending_pushed_at = []
+
+        await self._notify(frame, room.members)
+
+        delivered_at = time.perf_counter()
+        self.delivery_latencies.extend(delivered_at - ts for ts in pushed_at)
+
+    def latency_percentile(self, percentile: float) -> typing.Optional[float]:
+        """Return the delivery latency percentile in seconds among recent events."""
+        if not self.delivery_latencies:
             return None
 
-    async def push(self, msg: str, room_name: str = None):
-        message_body = {"message": msg, "room_name": room_name}
-        await self.generator.asend(message_body)
-
-    async def connect(self, websocket: WebSocket, room_name: str):
-        await websocket.accept()
-        if self.connections[room_name] == {} or len(self.connections[room_name]) == 0:
-            self.connections[room_name] = []
-        self.connections[room_name].append(websocket)
-        print(f"CONNECTIONS : {self.connections[room_name]}")
-
-    def remove(self, websocket: WebSocket, room_name: str):
-        self.connections[room_name].remove(websocket)
-        print(
-            f"CONNECTION REMOVED\nREMAINING CONNECTIONS : {self.connections[room_name]}"
+        latencies = sorted(self.delivery_latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    def _schedule_flush(self, room_name: str):
+        room = self.rooms.get(room_name)
+        if room is not None:
+            room.flush_handle = None
+
+        self._spawn(self.flush(room_name))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def publish_spectator_state(self, room_name: str, state: typing.Any):
+        """Queue the spectator-safe snapshot for the delayed spectator delivery.
+
+        Nothing is encoded until the snapshot is due, snapshots superseded in
+        the meantime are dropped. Rooms without spectators skip the snapshot,
+        a joining spectator is published a snapshot of its own.
+        """
+        room = self.rooms.get(room_name)
+        if room is None or not room.spectators:
+            return
+
+        room.spectator_backlog.append((time.monotonic(), state))
+
+        if room.spectator_handle is None:
+            room.spectator_handle = asyncio.get_running_loop().call_later(
+                self.spectator_delay, self._schedule_spectator_flush, room_name,
+            )
+
+    def _schedule_spectator_flush(self, room_name: str):
+        room = self.rooms.get(room_name)
+        if room is None:
+            return
+
+        room.spectator_handle = None
+        now = time.monotonic()
+        state = room.due_spectator_state(now, self.spectator_delay)
+
+        if room.spectator_backlog:
+            room.spectator_handle = asyncio.get_running_loop().call_later(
+                max(0, room.spectator_backlog[0][0] + self.spectator_delay - now),
+                self._schedule_spectator_flush,
+                room_name,
+            )
+
+        if state is not None:
+            room.spectator_frame = f'[{json.dumps({"type": "spectate", "data": state})}]'
+            if room.spectators:
+                self._spawn(self._notify(room.spectator_frame, room.spectators))
+
+    def negotiate_compression(self, websocket: WebSocket) -> bool:
+        """Check whether the client offered the preset dictionary subprotocol."""
+        if self.compressor is None:
+            return False
+
+        return self.compressor.subprotocol in websocket.scope.get('subprotocols', [])
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room_name: str,
+        user_id: typing.Optional[int] = None,
+        last_seq: typing.Optional[int] = None,
+    ) -> Connection:
+        """Add the connection to the room.
+
+        If the client passes its last seen sequence number and the replay
+        buffer still holds every event after it, the missed events are
+        replayed and the connection is marked as resumed. Otherwise the
+        caller is expected to send the state snapshot.
+        """
+        compressed = self.negotiate_compression(websocket)
+        await websocket.accept(
+            subprotocol=self.compressor.subprotocol if compressed else None,
+        )
+
+        # Deliver the pending events first, so the new member receives them by replay only
+        await self.flush(room_name)
+
+        room = self.get_room(room_name)
+        self._cancel_expiry(room)
+        missed_events = None if last_seq is None else room.missed_events(last_seq)
+
+        connection = Connection(
+            websocket,
+            compressed=compressed,
+            user_id=user_id,
+            resumed=missed_events is not None,
+        )
+        room.members.append(connection)
+        logger.debug(f'Connection added to {room_name!r}: {connection!r}')
+
+        if missed_events:
+            await self._send_frame(connection, f'[{",".join(missed_events)}]')
+
+        return connection
+
+    async def connect_spectator(self, websocket: WebSocket, room_name: str) -> Connection:
+        """Add the spectator to the room, sending the latest delivered snapshot."""
+        compressed = self.negotiate_compression(websocket)
+        await websocket.accept(
+            subprotocol=self.compressor.subprotocol if compressed else None,
+        )
+
+        room = self.get_room(room_name)
+        self._cancel_expiry(room)
+        connection = Connection(websocket, compressed=compressed)
+        room.spectators.append(connection)
+        logger.debug(f'Spectator added to {room_name!r}: {connection!r}')
+
+        if room.spectator_frame is not None:
+            await self._send_frame(connection, room.spectator_frame)
+
+        return connection
+
+    def remove_spectator(self, connection: Connection, room_name: str):
+        room = self.rooms.get(room_name)
+        if room is None:
+            return
+
+        # Dead connections may have been dropped by the delivery already
+        if connection in room.spectators:
+            room.spectators.remove(connection)
+            logger.debug(f'Spectator removed from {room_name!r}: {connection!r}')
+
+        # Snapshots are not published meanwhile, the frame would only get staler
+        if not room.spectators:
+            room.spectator_frame = None
+
+        self._schedule_expiry(room_name, room)
+
+    def remove(self, connection: Connection, room_name: str):
+        room = self.rooms.get(room_name)
+        if room is None:
+            return
+
+        # Dead connections may have been dropped by the delivery already
+        if connection in room.members:
+            room.members.remove(connection)
+            logger.debug(f'Connection removed from {room_name!r}: {connection!r}')
+
+        self._schedule_expiry(room_name, room)
+
+    def close_room(self, room_name: str):
+        """Forget the room along with its replay buffer."""
+        room = self.rooms.pop(room_name, None)
+        if room is None:
+            return
+
+        self._retired_seqs.set(room_name, room.seq)
+
+        for handle in (room.flush_handle, room.spectator_handle, room.expire_handle):
+            if handle is not None:
+                handle.cancel()
+
+    async def close_connections(self, code: int):
+        """Close every member and spectator connection with the code."""
+        connections = [
+            connection
+            for room in self.rooms.values()
+            for connection in (*room.members, *room.spectators)
+        ]
+
+        await asyncio.gather(
+            *(connection.websocket.close(code=code) for connection in connections),
+            return_exceptions=True,
         )
 
-    async def _notify(self, message: str, room_name: str):
-        living_connections = []
-        while len(self.connections[room_name]) > 0:
+    async def send(self, connection: Connection, msg: typing.Any):
+        """Deliver the event to the single connection, bypassing the room."""
+        await self._send_frame(connection, f'[{json.dumps(msg)}]')
+
+    async def _send_frame(self, connection: Connection, frame: str):
+        if connection.compressed:
+            await connection.websocket.send_bytes(self.compressor.compress(frame.encode()))
+        else:
+            await connection.websocket.send_text(frame)
+        self.frames_sent += 1
+
+    async def send_to_user(self, room_name: str, user_id: int, msg: typing.Any):
+        """Deliver the event to every room connection of the user."""
+        for connection in self.get_members(room_name):
+            if connection.user_id == user_id:
+                await self.send(connection, msg)
+
+    async def _notify(self, frame: str, connections: typing.List[Connection]):
+        members = list(connections)
+        compressed_frame = None
+
+        if self.compressor is not None and any(c.compressed for c in members):
+            compressed_frame = self.compressor.compress(frame.encode())
+
+        results = await asyncio.gather(
+            *(
+                connection.websocket.send_bytes(compressed_frame)
+                if connection.compressed else connection.websocket.send_text(frame)
+                for connection in members
+            ),
+            return_exceptions=True,
+        )
+        self.frames_sent += len(members)
 
-            websocket = self.connections[room_name].pop()
-            await websocket.send_text(message)
-            living_connections.append(websocket)
-        self.connections[room_name] = living_connections
+        for connection, result in zip(members, results):
+            if isinstance(result, Exception):
+                logger.debug(f'Dropping dead connection {connection!r}: {result!r}')
+                if connection in connections:
+                    connections.remove(connection)
 
 
-notifier = GameSessionsManager()
+notifier = GameSessionsManager(compressor=compression.get_compressor())
@@ -0,0 +1,299 @@
+"""End-to-end throughput benchmark of the auth endpoints.
+
+Runs the ASGI app in-process using `async-asgi-testclient`, against a
+throwaway database created on the configured PostgreSQL server (see the
+`postgres` options, e.g. `APP_POSTGRES_HOST`) and migrated to the head.
+Concurrent clients go through the auth lifecycle endpoint by endpoint:
+register, obtain token, refresh it and revoke it. For every endpoint
+requests/s, latency percentiles, response statuses and database queries
+per request are reported.
+
+Rate limits are lifted unless `--rate-limit` is given, as all the clients
+share a single address. The in-process game host does not hand its games
+off, so the run neither adopts nor leaves behind the games of a server
+running on the same machine.
+
+    python -m benchmarks.auth_throughput --users 500 --concurrency 50
+
+Pass a previously written results file as `--baseline` to print the
+changes against it.
+"""
+import asyncio
+import collections
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+import typing
+import uuid
+
+import asyncpg
+import click
+import sqlalchemy
+import sqlalchemy.engine
+
+from app.core import conf
+
+from . import utils
+
+
+class QueryCounter:
+    """Counts statements executed by every engine of the process."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, 'before_cursor_execute', self._on_execute,
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        sqlalchemy.event.remove(
+            sqlalchemy.engine.Engine, 'before_cursor_execute', self._on_execute,
+        )
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+class BenchUser:
+    def __init__(self, index: int):
+        suffix = uuid.uuid4().hex[:12]
+        self.email = f'bench-{index}-{suffix}@example.com'
+        self.phone = f'+1{index:06d}{suffix[:4]}'
+        self.password = f'Bench-{suffix}-Passw0rd'
+        self.access_token: typing.Optional[str] = None
+        self.refresh_token: typing.Optional[str] = None
+
+
+async def _admin_execute(statement: str):
+    connection = await asyncpg.connect(
+        host=conf.postgres.host,
+        port=conf.postgres.port,
+        user=conf.postgres.user,
+        password=conf.postgres.password,
+        database=conf.postgres.db,
+    )
+    try:
+        await connection.execute(statement)
+    finally:
+        await connection.close()
+
+
+def _migrate(db: str):
+    subprocess.run(
+        [sys.executable, '-m', 'app.cli.__main__', 'alembic', 'upgrade', 'head'],
+        env={**os.environ, 'APP_POSTGRES_DB': db},
+        check=True,
+    )
+
+
+async def register(client, user: BenchUser):
+    return await client.post('/api/v1/register', json={
+        'email': user.email,
+        'phone': user.phone,
+        'password': user.password,
+    })
+
+
+async def obtain(client, user: BenchUser):
+    response = await client.post('/api/v1/token', form={
+        'grant_type': 'password',
+        'username': user.email,
+        'password': user.password,
+    })
+    if response.status_code == 200:
+        user.access_token = response.json()['access_token']
+        user.refresh_token = response.json()['refresh_token']
+    return response
+
+
+async def refresh(client, user: BenchUser):
+    response = await client.post(
+        '/api/v1/token/refresh',
+        form={'grant_type': 'refresh_token', 'refresh_token': user.refresh_token},
+        headers={'Authorization': f'Bearer {user.access_token}'},
+    )
+    if response.status_code == 200:
+        user.access_token = response.json()['access_token']
+    return response
+
+
+async def revoke(client, user: BenchUser):
+    return await client.post(
+        '/api/v1/token/revoke',
+        form={'token': user.access_token, 'token_type_hint': 'access_token'},
+        headers={'Authorization': f'Bearer {user.access_token}'},
+    )
+
+
+ENDPOINTS = {
+    'register': register,
+    'token': obtain,
+    'token_refresh': refresh,
+    'token_revoke': revoke,
+}
+
+
+async def _run_endpoint(
+    client,
+    call: typing.Callable,
+    users: typing.List[BenchUser],
+    concurrency: int,
+) -> dict:
+    pending = collections.deque(users)
+    latencies = []
+    statuses = collections.Counter()
+
+    async def worker():
+        while pending:
+            user = pending.popleft()
+            started_at = time.perf_counter()
+            response = await call(client, user)
+            latencies.append(time.perf_counter() - started_at)
+            statuses[response.status_code] += 1
+
+    with QueryCounter() as queries:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    return {
+        'requests': len(users),
+        'requests_per_second': round(len(users) / elapsed, 1),
+        'latency_ms': utils.latency_summary(latencies),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'queries_per_request': round(queries.count / len(users), 2),
+    }
+
+
+async def run(
+    users: int,
+    concurrency: int,
+    bcrypt_rounds: int,
+    rate_limit: bool,
+    stateless_tokens: bool,
+    keep_db: bool,
+) -> dict:
+    import async_asgi_testclient
+
+    from app.api import app
+    from app.api import ratelimit
+    from app.api import security
+
+    bench_db = f'uno_bench_{uuid.uuid4().hex[:8]}'
+    await _admin_execute(f'CREATE DATABASE "{bench_db}"')
+
+    try:
+        await asyncio.to_thread(_migrate, bench_db)
+
+        conf.postgres.db = bench_db
+        conf.security.stateless_tokens = stateless_tokens
+        conf.handoff.enabled = False
+        security._BCRYPT_SALT_ROUNDS = bcrypt_rounds
+        if not rate_limit:
+            unlimited = ratelimit.Rule(capacity=1e9, refill_per_second=1e9)
+            ratelimit.credentials.rules = dict.fromkeys(ratelimit.credentials.rules, unlimited)
+
+        bench_users = [BenchUser(index) for index in range(users)]
+        endpoints = {}
+
+        async with async_asgi_testclient.TestClient(app) as client:
+            for name, call in ENDPOINTS.items():
+                endpoints[name] = await _run_endpoint(client, call, bench_users, concurrency)
+    finally:
+        if not keep_db:
+            await _admin_execute(f'DROP DATABASE IF EXISTS "{bench_db}" WITH (FORCE)')
+
+    return {
+        'config': {
+            'users': users,
+            'concurrency': concurrency,
+            'bcrypt_rounds': bcrypt_rounds,
+            'rate_limit': rate_limit,
+            'stateless_tokens': stateless_tokens,
+            'pool_size': conf.postgres.pool_size,
+            'password_hasher_workers': conf.security.password_hasher_workers,
+        },
+        'endpoints': endpoints,
+    }
+
+
+def compare(results: dict, baseline: dict) -> typing.Dict[str, dict]:
+    """Return relative changes of the endpoints metrics against the baseline."""
+    changes = {}
+
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+
+        metrics = {
+            'requests_per_second': (
+                current['requests_per_second'], previous['requests_per_second'],
+            ),
+            'latency_p99_ms': (
+                current['latency_ms']['p99'], previous['latency_ms']['p99'],
+            ),
+            'queries_per_request': (
+                current['queries_per_request'], previous['queries_per_request'],
+            ),
+        }
+        changes[name] = {
+            metric: f'{previous_value} -> {value}' + (
+                f' ({(value - previous_value) / previous_value:+.1%})'
+                if value is not None and previous_value else ''
+            )
+            for metric, (value, previous_value) in metrics.items()
+        }
+
+    return changes
+
+
+@click.command(help='Benchmark auth endpoints throughput against a throwaway database')
+@click.option('--users', default=200, show_default=True, help='Requests per endpoint')
+@click.option('--concurrency', default=20, show_default=True, help='Concurrent clients')
+@click.option(
+    '--bcrypt-rounds',
+    default=12,
+    show_default=True,
+    help='Lower it to measure the database path rather than bcrypt',
+)
+@click.option('--rate-limit/--no-rate-limit', default=False, show_default=True)
+@click.option('--stateless-tokens/--stored-tokens', default=False, show_default=True)
+@click.option('--keep-db', is_flag=True, help='Keep the throwaway database for inspection')
+@click.option('--output', type=click.Path(dir_okay=False, path_type=pathlib.Path))
+@click.option(
+    '--baseline',
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    help='Results of a previous run to compare with',
+)
+def main(
+    users, concurrency, bcrypt_rounds, rate_limit, stateless_tokens, keep_db, output,
+    baseline,
+):
+    results = asyncio.run(run(
+        users=users,
+        concurrency=concurrency,
+        bcrypt_rounds=bcrypt_rounds,
+        rate_limit=rate_limit,
+        stateless_tokens=stateless_tokens,
+        keep_db=keep_db,
+    ))
+
+    output = utils.write_results('auth_throughput', results, output)
+    click.echo(json.dumps(results, indent=2))
+    click.echo(f'Results written to {output}')
+
+    if baseline is not None:
+        changes = compare(results, json.loads(baseline.read_text()))
+        click.echo(f'Changes against {baseline}:')
+        click.echo(json.dumps(changes, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import datetime
+import json
+import pathlib
+import platform
+import subprocess
+import typing
+
+
+RESULTS_DIR = pathlib.Path(__file__).resolve().parent / 'results'
+
+
+def percentile(values: typing.Sequence[float], q: float) -> typing.Optional[float]:
+    """Return the nearest-rank percentile of the values.
+
+    >>> percentile([1, 2, 3, 4], 50)
+    2
+    >>> percentile([], 99) is None
+    True
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def latency_summary(latencies: typing.Sequence[float]) -> dict:
+    """Summarize latencies given in seconds as milliseconds percentiles."""
+    summary = {'count': len(latencies)}
+    for name, q in (('p50', 50), ('p99', 99), ('p999', 99.9)):
+        value = percentile(latencies, q)
+        summary[name] = None if value is None else round(value * 1000, 3)
+    return summary
+
+
+def git_revision() -> typing.Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(
+    name: str,
+    results: dict,
+    output: typing.Optional[pathlib.Path] = None,
+) -> pathlib.Path:
+    """Write benchmark results as JSON, so the runs can be compared over time."""
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    if output is None:
+        output = RESULTS_DIR / f'{name}-{now:%Y%m%dT%H%M%SZ}.json'
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'benchmark': name,
+        'timestamp': now.isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        **results,
+    }, indent=2))
+
+    return output
@@ -0,0 +1,348 @@
+"""Websocket fan-out benchmark of the game rooms.
+
+Simulates many rooms with many members each, plays the moves at the given
+rate and reports connect rate, broadcast latency percentiles, CPU time per
+delivered message and memory per connection. Latency of the members without
+a delay is reported apart: slow members of some rooms must not hold up the
+rest, `--max-fast-p50-ms` fails the run when they do.
+
+Games are hosted in-process by the local game host client, its database
+backed services are left stopped. Two transports are available: `fake`
+drives `GameSessionsManager` with fake sockets and dispatches the moves with
+the game controller directly, `asgi`
+connects every member through the game websocket endpoint of the ASGI app
+in-process using `async-asgi-testclient` (room members are then limited to
+the match players).
+
+    python -m benchmarks.websocket_fanout --rooms 1000 --members 4 --duration 10
+"""
+import asyncio
+import itertools
+import json
+import pathlib
+import random
+import time
+import tracemalloc
+import typing
+
+import click
+
+from app import uno
+from app.api import controllers
+from app.api import security
+from app.api.services import games
+from app.uno import enums
+from app.websocket_manager import managers
+
+from . import utils
+
+
+class Client:
+    """Simulated room member collecting received frames along with receive times."""
+
+    def __init__(self, user_id: typing.Optional[int], delay: float):
+        self.user_id = user_id
+        self.delay = delay
+        self.received: typing.List[typing.Tuple[float, typing.Union[str, bytes]]] = []
+        self.connection: typing.Optional[managers.Connection] = None
+        self.session = None
+        self.reader: typing.Optional[asyncio.Task] = None
+
+
+class FakeWebSocket:
+    def __init__(self, client: Client):
+        self.client = client
+        self.scope = {'subprotocols': []}
+
+    async def accept(self, subprotocol: typing.Optional[str] = None):
+        pass
+
+    async def send_text(self, frame: str):
+        if self.client.delay:
+            await asyncio.sleep(self.client.delay)
+        self.client.received.append((time.perf_counter(), frame))
+
+    send_bytes = send_text
+
+
+class FakeTransport:
+    def __init__(self, notifier: managers.GameSessionsManager):
+        self.notifier = notifier
+
+    async def connect(self, match_id: str, client: Client):
+        client.connection = await self.notifier.connect(
+            FakeWebSocket(client), match_id, user_id=client.user_id,
+        )
+
+    async def send(self, match_id: str, client: Client, message: str):
+        await controllers.game_dispatch(match_id, client.connection, message, self.notifier)
+
+    async def reconnect(self, match_id: str, clients: typing.Iterable[Client]):
+        # Moves are dispatched to the current game of the match, nothing to do
+        pass
+
+    async def close(self):
+        pass
+
+
+class ASGITransport:
+    def __init__(self, notifier: managers.GameSessionsManager):
+        import async_asgi_testclient
+
+        from app.api import app
+
+        self.notifier = notifier
+        self.client = async_asgi_testclient.TestClient(app)
+        self.clients: typing.List[Client] = []
+
+    async def connect(self, match_id: str, client: Client):
+        ticket = security.issue_ws_ticket(client.user_id, match_id)
+        client.session = self.client.websocket_connect(
+            f'/api/v1/games/{match_id}/ws?ticket={ticket}',
+        )
+        await client.session.connect()
+        client.reader = asyncio.create_task(self._read(client))
+        self.clients.append(client)
+
+    async def reconnect(self, match_id: str, clients: typing.Iterable[Client]):
+        """Connect the clients again, the sessions are bound to the finished game."""
+        for client in clients:
+            client.reader.cancel()
+            await client.session.close()
+            self.clients.remove(client)
+            await self.connect(match_id, client)
+
+    async def _read(self, client: Client):
+        while True:
+            message = await client.session._receive()
+            if message['type'] != 'websocket.send':
+                return
+            if client.delay:
+                await asyncio.sleep(client.delay)
+            client.received.append(
+                (time.perf_counter(), message.get('text') or message.get('bytes')),
+            )
+
+    async def send(self, match_id: str, client: Client, message: str):
+        expected_seq = self.notifier.last_seq(match_id) + 1
+        await client.session.send_text(message)
+
+        # Moves of the room are sequential, wait for the move to be broadcast
+        timeout_at = time.perf_counter() + 1
+        while (self.notifier.last_seq(match_id) < expected_seq
+               and time.perf_counter() < timeout_at):
+            await asyncio.sleep(0)
+
+    async def close(self):
+        for client in self.clients:
+            client.reader.cancel()
+            await client.session.close()
+
+
+def _next_move(game: uno.UnoGame) -> str:
+    player = game.current_player
+
+    for card in player.cards:
+        if game._deck.playable(card):
+            return json.dumps({
+                'action': 'play',
+                'card': card.to_dict(),
+                'new_color': random.choice(enums.CardColors.playable()).value,
+            })
+
+    return json.dumps({'action': 'draw'})
+
+
+async def _play_room(
+    transport,
+    match_id: str,
+    players: typing.Dict[int, Client],
+    move_rate: float,
+    deadline: float,
+    pushed_at: typing.Dict[typing.Tuple[str, int], float],
+    notifier: managers.GameSessionsManager,
+):
+    interval = 1 / move_rate
+    # Spread the rooms moves evenly instead of bursting them at once
+    await asyncio.sleep(random.uniform(0, interval))
+
+    while time.perf_counter() < deadline:
+        game = uno.get_game(match_id)
+        if not game.is_active:
+            game = uno.UnoGame(list(players), match_id)
+            await transport.reconnect(match_id, players.values())
+
+        message = _next_move(game)
+        started_at = time.perf_counter()
+        pushed_at[(match_id, notifier.last_seq(match_id) + 1)] = started_at
+        await transport.send(match_id, players[game.current_player.user_id], message)
+
+        await asyncio.sleep(max(0, interval - (time.perf_counter() - started_at)))
+
+
+def _delivery_latencies(
+    clients: typing.Iterable[Client],
+    pushed_at: typing.Dict[typing.Tuple[str, int], float],
+    match_ids: typing.Dict[Client, str],
+) -> typing.Tuple[typing.List[float], int]:
+    latencies = []
+    delivered = 0
+
+    for client in clients:
+        match_id = match_ids[client]
+        for received_at, frame in client.received:
+            for event in json.loads(frame):
+                delivered += 1
+                seq = event.get('seq')
+                if seq is not None and (match_id, seq) in pushed_at:
+                    latencies.append(received_at - pushed_at[(match_id, seq)])
+
+    return latencies, delivered
+
+
+async def run(
+    rooms: int,
+    members: int,
+    duration: float,
+    move_rate: float,
+    slow_fraction: float,
+    slow_delay: float,
+    flush_window_ms: int,
+    transport_name: str,
+) -> dict:
+    # Game host events are delivered to the rooms of the default notifier
+    notifier = managers.notifier
+    notifier.default_flush_window = flush_window_ms / 1000
+    await games.client.connect(start_host=False)
+
+    if transport_name == 'asgi':
+        members = min(members, uno.UnoGame.max_players)
+        transport = ASGITransport(notifier)
+    else:
+        transport = FakeTransport(notifier)
+
+    user_ids = itertools.count(1)
+    rooms_players: typing.Dict[str, typing.Dict[int, Client]] = {}
+    match_ids: typing.Dict[Client, str] = {}
+
+    tracemalloc.start()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    connect_started_at = time.perf_counter()
+
+    for room in range(rooms):
+        match_id = f'bench-{room}'
+        clients = []
+        for member in range(members):
+            delay = slow_delay if random.random() < slow_fraction else 0
+            is_player = member < uno.UnoGame.max_players
+            clients.append(Client(next(user_ids) if is_player else None, delay))
+
+        players = {client.user_id: client for client in clients if client.user_id}
+        uno.UnoGame(list(players), match_id)
+        rooms_players[match_id] = players
+
+        for client in clients:
+            await transport.connect(match_id, client)
+            match_ids[client] = match_id
+
+    connect_elapsed = time.perf_counter() - connect_started_at
+    memory_after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    connections = rooms * members
+    for client in match_ids:
+        client.received.clear()
+
+    pushed_at: typing.Dict[typing.Tuple[str, int], float] = {}
+    frames_before = notifier.frames_sent
+    cpu_started_at = time.process_time()
+    deadline = time.perf_counter() + duration
+
+    await asyncio.gather(*(
+        _play_room(transport, match_id, players, move_rate, deadline, pushed_at, notifier)
+        for match_id, players in rooms_players.items()
+    ))
+    # Let the coalesced and slow deliveries land
+    await asyncio.sleep(flush_window_ms / 1000 + slow_delay + 0.1)
+
+    cpu_elapsed = time.process_time() - cpu_started_at
+    await transport.close()
+    await games.client.close()
+
+    latencies, delivered = _delivery_latencies(match_ids, pushed_at, match_ids)
+    fast_latencies, _ = _delivery_latencies(
+        (client for client in match_ids if not client.delay), pushed_at, match_ids,
+    )
+
+    return {
+        'config': {
+            'rooms': rooms,
+            'members': members,
+            'duration': duration,
+            'move_rate': move_rate,
+            'slow_fraction': slow_fraction,
+            'slow_delay_ms': slow_delay * 1000,
+            'flush_window_ms': flush_window_ms,
+            'transport': transport_name,
+        },
+        'connections': connections,
+        'connect_rate': round(connections / connect_elapsed, 1),
+        'memory_per_connection_bytes': round((memory_after - memory_before) / connections),
+        'moves': len(pushed_at),
+        'messages_delivered': delivered,
+        'frames_sent': notifier.frames_sent - frames_before,
+        'broadcast_latency_ms': utils.latency_summary(latencies),
+        'fast_broadcast_latency_ms': utils.latency_summary(fast_latencies),
+        'cpu_us_per_message': round(cpu_elapsed / max(delivered, 1) * 1e6, 3),
+    }
+
+
+@click.command(help='Benchmark websocket fan-out of the game rooms')
+@click.option('--rooms', default=1000, show_default=True)
+@click.option('--members', default=4, show_default=True, help='Members per room')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds to play')
+@click.option('--move-rate', default=2.0, show_default=True, help='Moves/s per room')
+@click.option('--slow-fraction', default=0.0, show_default=True)
+@click.option('--slow-delay-ms', default=50, show_default=True)
+@click.option('--flush-window-ms', default=0, show_default=True)
+@click.option(
+    '--transport',
+    type=click.Choice(['fake', 'asgi']),
+    default='fake',
+    show_default=True,
+)
+@click.option(
+    '--max-fast-p50-ms',
+    type=float,
+    help='Fail when p50 latency of the members without a delay exceeds it',
+)
+@click.option('--output', type=click.Path(dir_okay=False, path_type=pathlib.Path))
+def main(
+    rooms, members, duration, move_rate, slow_fraction, slow_delay_ms,
+    flush_window_ms, transport, max_fast_p50_ms, output,
+):
+    results = asyncio.run(run(
+        rooms=rooms,
+        members=members,
+        duration=duration,
+        move_rate=move_rate,
+        slow_fraction=slow_fraction,
+        slow_delay=slow_delay_ms / 1000,
+        flush_window_ms=flush_window_ms,
+        transport_name=transport,
+    ))
+
+    output = utils.write_results('websocket_fanout', results, output)
+    click.echo(json.dumps(results, indent=2))
+    click.echo(f'Results written to {output}')
+
+    fast_p50 = results['fast_broadcast_latency_ms']['p50']
+    if max_fast_p50_ms is not None and (fast_p50 is None or fast_p50 > max_fast_p50_ms):
+        raise click.ClickException(
+            f'p50 latency of the members without a delay is {fast_p50} ms, '
+            f'over {max_fast_p50_ms} ms',
+        )
+
+
+if __name__ == '__main__':
+    main()